@@ -0,0 +1,289 @@
+"""
+Offline benchmark of the trigger matching path, without a Discord connection.
+
+Builds a `TriggerCog` against a temporary SQLite database, fills it with synthetic triggers of all four modes
+and feeds it stub messages, reporting throughput, latency percentiles and allocations per message, along with the
+hit rate of the shared pattern cache and the share of searches saved by deduplicating the patterns.
+
+Usage: python -m benchmarks.on_message [--sizes 10 100 1000 10000] [--messages 2000] [--corpus FILE]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cofdb import db, open_database, async_db  # noqa: E402
+from triggers import trigger_manager  # noqa: E402
+from triggers.trigger_manager import TriggerCog  # noqa: E402
+from triggers.message_context import MessageContext  # noqa: E402
+from triggers.patterns import PATTERNS  # noqa: E402
+from triggers.entities import TriggerEntity, TriggerSettingsEntity  # noqa: E402
+
+GUILD_ID = 1
+
+WORDS = [
+    "hello", "hi", "hey", "there", "friend", "friends", "end", "quack", "duck", "good", "morning", "night",
+    "bot", "what", "why", "how", "lol", "lmao", "yes", "no", "maybe", "cool", "nice", "game", "play", "win",
+    "lose", "food", "pizza", "coffee", "tea", "cat", "dog", "music", "song", "love", "hate", "okay", "sure"
+]
+
+FILLER = [
+    "the", "a", "is", "it", "to", "and", "of", "in", "that", "this", "for", "you", "with", "on", "was", "be",
+    "are", "have", "not", "we", "they", "do", "at", "but", "from", "or", "an", "just", "so", "all", "about"
+]
+
+LINKS = ["https://example.com/hello", "https://www.youtube.com/watch?v=friend", "http://cof.bot/end?quack=1"]
+EMOTES = ["<:hello:123456789012345678>", "<a:quack:234567890123456789>", "<:end:345678901234567890>"]
+
+REGEX_TEMPLATES = [r"\b{0}+\b", r"({0}|{1}) \w+", r"^{0}\d*", r"{0}\s+{1}", r"(?:{0})+!*", r"[A-Za-z]+{0}"]
+
+
+class StubChannel:
+    id = 1
+
+    async def send(self, content):
+        return content
+
+
+def make_author():
+    return SimpleNamespace(
+        id=1234, bot=False, name="user", display_name="User", nick="Nick", mention="<@1234>"
+    )
+
+
+def make_message(content, author, channel):
+    return SimpleNamespace(id=1, content=content, author=author, channel=channel, guild=SimpleNamespace(id=GUILD_ID))
+
+
+def generate_triggers(count, rng):
+    modes = ["plain", "word", "full", "regex"]
+    rows = []
+
+    for position in range(count):
+        mode = modes[position % len(modes)]
+        first, second = rng.sample(WORDS, 2)
+
+        if mode == "regex":
+            pattern = rng.choice(REGEX_TEMPLATES).format(first, second)
+        elif mode == "full":
+            pattern = f"{first} {second}"
+        else:
+            pattern = first if rng.random() < 0.5 else f"{first}{rng.randrange(count)}"
+
+        case_sensitive = rng.choice([None, True, False])
+        start = rng.random() < 0.1
+        end = rng.random() < 0.1
+
+        rows.append(dict(
+            guild_id=GUILD_ID,
+            mode=mode,
+            user_pattern=pattern,
+            response=f"{first}! {{author_username}};{second}, {{@author_display}}",
+            cooldown=0,
+            case_sensitive=case_sensitive,
+            avoid_links=rng.choice([None, True, False]),
+            avoid_emotes=rng.choice([None, True, False]),
+            start=start,
+            end=end,
+            regex_pattern=TriggerCog.compute(mode, pattern, case_sensitive, start, end, False),
+            position=position
+        ))
+
+    return rows
+
+
+def generate_corpus(count, rng):
+    messages = []
+
+    for _ in range(count):
+        words = rng.choices(FILLER, k=rng.randint(2, 15))
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(WORDS))
+
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(LINKS))
+
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(EMOTES))
+
+        messages.append(" ".join(words))
+
+    return messages
+
+
+def load_corpus(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def fill_database(rows):
+    db.drop_tables([TriggerEntity, TriggerSettingsEntity])
+    db.create_tables([TriggerEntity, TriggerSettingsEntity])
+    TriggerSettingsEntity.create(guild_id=GUILD_ID)
+
+    with db.atomic():
+        for index in range(0, len(rows), 500):
+            TriggerEntity.insert_many(rows[index:index + 500]).execute()
+
+
+async def build_cog(trigger_count, rng):
+    await async_db.run(fill_database, generate_triggers(trigger_count, rng))
+
+    cog = TriggerCog(SimpleNamespace(dispatch=lambda event, *args: None))
+    await cog.cog_load()
+    cog.flush_last_triggered.cancel()  # keep the database out of the measurements
+
+    # load the guild's triggers outside the measurements
+    await cog.guild_cache.get(GUILD_ID)
+    return cog
+
+
+async def measure(cog, messages):
+    latencies = []
+
+    start = time.perf_counter()
+    for message in messages:
+        message_start = time.perf_counter()
+        await cog.on_message(message)
+        latencies.append(time.perf_counter() - message_start)
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    return len(messages) / total, percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+
+async def measure_allocations(cog, messages):
+    """
+    Returns the average number of bytes and memory blocks allocated while handling a message.
+    Run separately, since tracing allocations slows everything down.
+    """
+    total_peak = 0
+    total_blocks = 0
+
+    tracemalloc.start()
+    for message in messages:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        blocks = len(tracemalloc.take_snapshot().traces)
+
+        await cog.on_message(message)
+
+        _, peak = tracemalloc.get_traced_memory()
+        total_peak += peak - baseline
+        total_blocks += max(0, len(tracemalloc.take_snapshot().traces) - blocks)
+    tracemalloc.stop()
+
+    return total_peak / len(messages), total_blocks / len(messages)
+
+
+def measure_helpers(cog, messages):
+    """
+    Times `test_valid_match` and the rendering of a response on the matches found for the corpus.
+    """
+    guild_triggers = cog.guild_cache.guilds[GUILD_ID]
+    matches = []
+    for message in messages:
+        for trigger in guild_triggers.triggers:
+            match = trigger.pattern.search(message.content)
+            if match is not None:
+                matches.append((message, match, trigger))
+                break
+
+    if not matches:
+        return None, None
+
+    start = time.perf_counter()
+    for message, match, trigger in matches:
+        cog.test_valid_match(MessageContext(message.content), match, trigger)
+    valid_time = (time.perf_counter() - start) / len(matches)
+
+    start = time.perf_counter()
+    for message, match, trigger in matches:
+        trigger.templates[0].render(message, match)
+    format_time = (time.perf_counter() - start) / len(matches)
+
+    return valid_time, format_time
+
+
+async def run(args):
+    trigger_manager.USE_REGEX_SANDBOX = args.sandbox
+
+    rng = random.Random(args.seed)
+    contents = load_corpus(args.corpus) if args.corpus else generate_corpus(args.messages, rng)
+
+    author = make_author()
+    channel = StubChannel()
+    messages = [make_message(content, author, channel) for content in contents]
+    allocation_messages = messages[:args.allocation_messages]
+
+    print(f"{len(messages)} messages, sandbox {'on' if args.sandbox else 'off'}")
+    print(
+        f"{'triggers':>8} | {'msg/s':>10} | {'p50 (us)':>9} | {'p99 (us)':>9} | "
+        f"{'KiB/msg':>8} | {'blocks/msg':>10} | {'valid (us)':>10} | {'format (us)':>11} | "
+        f"{'hit rate':>8} | {'dedupe':>6}"
+    )
+
+    for size in args.sizes:
+        before = PATTERNS.stats()
+        cog = await build_cog(size, rng)
+
+        # warm up caches and lazily built structures
+        for message in messages[:100]:
+            await cog.on_message(message)
+
+        throughput, p50, p99 = await measure(cog, messages)
+        allocated, blocks = await measure_allocations(cog, allocation_messages)
+        valid_time, format_time = measure_helpers(cog, messages)
+        after = PATTERNS.stats()
+
+        def micros(value):
+            return "-" if value is None else f"{value * 1e6:.1f}"
+
+        def ratio(part, total):
+            return "-" if not total else f"{part / total:.1%}"
+
+        hits = after["hits"] - before["hits"]
+        compiles = hits + after["misses"] - before["misses"]
+        searches = after["searches"] - before["searches"]
+        saved = searches - (after["evaluations"] - before["evaluations"])
+
+        print(
+            f"{size:>8} | {throughput:>10.0f} | {p50 * 1e6:>9.1f} | {p99 * 1e6:>9.1f} | "
+            f"{allocated / 1024:>8.1f} | {blocks:>10.1f} | {micros(valid_time):>10} | {micros(format_time):>11} | "
+            f"{ratio(hits, compiles):>8} | {ratio(saved, searches):>6}"
+        )
+
+        await cog.cog_unload()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the trigger matching path")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--messages", type=int, default=2000, help="number of synthetic messages")
+    parser.add_argument("--corpus", help="file with one recorded message per line, instead of synthetic ones")
+    parser.add_argument("--allocation-messages", type=int, default=200, help="messages traced for allocations")
+    parser.add_argument("--sandbox", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        open_database(os.path.join(directory, "benchmark.db"))
+        try:
+            asyncio.run(run(args))
+        finally:
+            async_db.stop()
+
+
+if __name__ == "__main__":
+    main()
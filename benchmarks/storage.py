@@ -0,0 +1,176 @@
+"""
+Offline benchmark of the SQLite storage profiles, comparing write and read throughput before and after tuning.
+
+"before" uses SQLite's default pragmas without the `(guild_id, position)` index, "after" uses the configured
+storage profile with all the model indexes. Each configuration runs against its own temporary database file.
+
+Usage: python -m benchmarks.storage [--guilds 50] [--triggers 200] [--operations 1000] [--duration 3]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cofdb import db, open_database, create_schema, bulk_update_field  # noqa: E402
+from cofdb.db_manager import STORAGE_PROFILE  # noqa: E402
+from triggers.entities import TriggerEntity, TriggerSettingsEntity  # noqa: E402
+
+CONFIGURATIONS = [
+    ("before", "default", False),
+    ("after", STORAGE_PROFILE, True),
+]
+
+
+def make_row(guild_id, position):
+    return dict(
+        guild_id=guild_id, mode="plain", user_pattern=f"pattern {position}", response="response",
+        start=False, end=False, regex_pattern=f"(?i)pattern {position}", position=position
+    )
+
+
+def prepare(path, profile, indexed, guild_count, trigger_count):
+    open_database(path, profile)
+    create_schema(TriggerEntity, TriggerSettingsEntity)
+
+    if not indexed:
+        db.execute_sql('DROP INDEX IF EXISTS "triggerentity_guild_id_position"')
+
+    rows = [make_row(guild_id, position) for position in range(trigger_count) for guild_id in range(guild_count)]
+
+    start = time.perf_counter()
+    with db.atomic():
+        for index in range(0, len(rows), 500):
+            TriggerEntity.insert_many(rows[index:index + 500]).execute()
+
+    return len(rows) / (time.perf_counter() - start)
+
+
+def measure_inserts(guild_count, operations, rng):
+    start = time.perf_counter()
+    for position in range(operations):
+        with db.atomic():
+            TriggerEntity.create(**make_row(rng.randrange(guild_count), -position))
+
+    return operations / (time.perf_counter() - start)
+
+
+def measure_updates(row_ids, operations, rng):
+    start = time.perf_counter()
+    for _ in range(operations):
+        with db.atomic():
+            TriggerEntity.update(last_triggered=datetime.now()) \
+                .where(TriggerEntity.id == rng.choice(row_ids)) \
+                .execute()
+
+    return operations / (time.perf_counter() - start)
+
+
+def measure_flushes(row_ids, operations, rng):
+    batch = {row_id: datetime.now() for row_id in rng.sample(row_ids, min(len(row_ids), operations))}
+
+    start = time.perf_counter()
+    bulk_update_field(TriggerEntity, TriggerEntity.last_triggered, batch)
+
+    return len(batch) / (time.perf_counter() - start)
+
+
+def load_guild(guild_id):
+    return list(
+        TriggerEntity.select()
+        .where(TriggerEntity.guild_id == guild_id)
+        .order_by(TriggerEntity.position, TriggerEntity.id)
+    )
+
+
+def measure_loads(guild_count, operations, rng):
+    start = time.perf_counter()
+    for _ in range(operations):
+        load_guild(rng.randrange(guild_count))
+
+    return operations / (time.perf_counter() - start)
+
+
+def measure_mixed(guild_count, row_ids, duration, seed):
+    """
+    Loads guilds on this thread while another thread keeps committing single updates.
+    Returns the loads and writes per second.
+    """
+    stop = threading.Event()
+    writes = [0]
+
+    def write():
+        rng = random.Random(seed)
+        try:
+            while not stop.is_set():
+                with db.atomic():
+                    TriggerEntity.update(last_triggered=datetime.now()) \
+                        .where(TriggerEntity.id == rng.choice(row_ids)) \
+                        .execute()
+                writes[0] += 1
+        finally:
+            db.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+
+    rng = random.Random(seed + 1)
+    loads = 0
+    start = time.perf_counter()
+    try:
+        while time.perf_counter() - start < duration:
+            load_guild(rng.randrange(guild_count))
+            loads += 1
+    finally:
+        stop.set()
+        writer.join()
+
+    elapsed = time.perf_counter() - start
+    return loads / elapsed, writes[0] / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite storage profiles")
+    parser.add_argument("--guilds", type=int, default=50)
+    parser.add_argument("--triggers", type=int, default=200, help="triggers per guild")
+    parser.add_argument("--operations", type=int, default=1000, help="operations per measurement")
+    parser.add_argument("--duration", type=float, default=3, help="seconds of the mixed read/write measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.guilds} guilds, {args.triggers} triggers each, {args.operations} operations per measurement")
+    print(
+        f"{'':>6} | {'profile':>11} | {'bulk rows/s':>11} | {'inserts/s':>9} | {'updates/s':>9} | "
+        f"{'flush rows/s':>12} | {'loads/s':>8} | {'mixed loads/s':>13} | {'mixed writes/s':>14}"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, profile, indexed in CONFIGURATIONS:
+            rng = random.Random(args.seed)
+            path = os.path.join(directory, f"{name}.db")
+
+            try:
+                bulk = prepare(path, profile, indexed, args.guilds, args.triggers)
+                row_ids = [row.id for row in TriggerEntity.select(TriggerEntity.id)]
+
+                inserts = measure_inserts(args.guilds, args.operations, rng)
+                updates = measure_updates(row_ids, args.operations, rng)
+                flushes = measure_flushes(row_ids, args.operations, rng)
+                loads = measure_loads(args.guilds, args.operations, rng)
+                mixed_loads, mixed_writes = measure_mixed(args.guilds, row_ids, args.duration, args.seed)
+            finally:
+                db.close()
+
+            print(
+                f"{name:>6} | {profile:>11} | {bulk:>11.0f} | {inserts:>9.0f} | {updates:>9.0f} | "
+                f"{flushes:>12.0f} | {loads:>8.0f} | {mixed_loads:>13.0f} | {mixed_writes:>14.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Runs the bot as a cluster of worker processes, each owning a contiguous range of shards.
+
+Every worker keeps its own cache of the guilds it serves and reads the shared SQLite database, whose WAL journal lets
+them all read while one of them writes. The launcher relays the `triggers_changed` events of each worker to the
+others, so that a guild changed by one worker is loaded again by any other worker still holding it.
+"""
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+# seconds between the start of two workers, so that they do not all identify their first shard at once
+WORKER_START_INTERVAL = 5.0
+
+
+def shard_ranges(shard_count: int, process_count: int) -> list:
+    """
+    Splits the shards into at most `process_count` contiguous ranges whose sizes differ by at most one.
+    """
+    size, extra = divmod(shard_count, process_count)
+    ranges = []
+    start = 0
+
+    for index in range(process_count):
+        end = start + size + (index < extra)
+        if end > start:
+            ranges.append(list(range(start, end)))
+
+        start = end
+
+    return ranges
+
+
+async def fetch_shard_count(token: str) -> int:
+    """
+    Asks Discord for the recommended number of shards.
+    """
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shard_count, _, _ = await http.get_bot_gateway()
+        return shard_count
+    finally:
+        await http.close()
+
+
+class ClusterLink:
+    """
+    A worker's end of the pipe to the launcher. Messages are `(event, guild_id)` tuples: the worker's own
+    `triggers_changed` events are sent, and those of the other workers are dispatched as `cluster_triggers_changed`.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.send_lock = threading.Lock()
+
+    def attach(self, bot):
+        """
+        Starts relaying the bot's events, must be called from its event loop.
+        """
+        bot.add_listener(self.on_triggers_changed)
+
+        loop = asyncio.get_running_loop()
+        threading.Thread(target=self.receive, args=(bot, loop), name="cluster-link", daemon=True).start()
+
+    async def on_triggers_changed(self, guild_id: int):
+        try:
+            with self.send_lock:
+                self.connection.send(("triggers_changed", guild_id))
+        except (OSError, EOFError):
+            logger.warning("Lost the connection to the cluster launcher")
+
+    def receive(self, bot, loop):
+        while True:
+            try:
+                event, guild_id = self.connection.recv()
+            except (OSError, EOFError):
+                return  # the launcher exited
+
+            try:
+                loop.call_soon_threadsafe(bot.dispatch, f"cluster_{event}", guild_id)
+            except RuntimeError:
+                return  # the bot's loop was closed
+
+
+class ClusterLauncher:
+    """
+    Starts one process per shard range running `target(token, shard_ids, shard_count, connection, index)`,
+    then relays the events between them until they have all exited.
+    """
+
+    def __init__(self, target, token: str, shard_count: int, process_count: int):
+        self.target = target
+        self.token = token
+        self.shard_count = shard_count
+        self.process_count = process_count
+
+        self.workers = {}  # connection -> process
+
+    def run(self):
+        context = multiprocessing.get_context("spawn")
+
+        try:
+            for index, shard_ids in enumerate(shard_ranges(self.shard_count, self.process_count)):
+                if index:
+                    time.sleep(WORKER_START_INTERVAL)
+
+                connection, worker_connection = context.Pipe()
+                process = context.Process(
+                    target=self.target, args=(self.token, shard_ids, self.shard_count, worker_connection, index),
+                    name=f"cofbot-worker-{index}"
+                )
+                process.start()
+                worker_connection.close()
+
+                self.workers[connection] = process
+                logger.info("Started worker %d with shards %d-%d", index, shard_ids[0], shard_ids[-1])
+
+            self.relay()
+        finally:
+            for process in self.workers.values():
+                if process.is_alive():
+                    process.terminate()
+
+            for process in self.workers.values():
+                process.join()
+
+    def relay(self):
+        while self.workers:
+            for connection in wait(list(self.workers)):
+                try:
+                    message = connection.recv()
+                except (OSError, EOFError):
+                    process = self.workers.pop(connection)
+                    process.join()
+
+                    log = logger.warning if process.exitcode else logger.info
+                    log("Worker %s exited with code %s", process.name, process.exitcode)
+                    continue
+
+                for other in self.workers:
+                    if other is not connection:
+                        try:
+                            other.send(message)
+                        except (OSError, EOFError):
+                            pass  # the worker exited, which is noticed on its next read
@@ -1 +1,5 @@
-from .db_manager import db, BaseModel
+from .db_manager import db, open_database, BaseModel
+from .bulk import bulk_update_field, bulk_update_rows, bulk_delete
+from .migrations import create_schema, add_missing_columns
+from .write_behind import WriteBehindBuffer
+from .async_db import AsyncDatabase, async_db
@@ -0,0 +1,132 @@
+import queue
+import asyncio
+import threading
+import time
+from collections import deque
+
+from .db_manager import db
+
+# number of most recent requests kept to compute the latency percentiles
+LATENCY_SAMPLE_SIZE = 1024
+
+
+class AsyncDatabase:
+    """
+    Runs every database call on a single dedicated thread, one request at a time, so that the event loop never
+    waits on SQLite. Requests are queued in order and their results are handed back as awaitables.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.requests = queue.SimpleQueue()
+        self.thread = None
+        self.thread_lock = threading.Lock()
+
+        self.stats_lock = threading.Lock()
+        self.executed = 0
+        self.failures = 0
+        self.total_wait = 0.0
+        self.total_execution = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLE_SIZE)
+
+    @property
+    def queue_depth(self):
+        return self.requests.qsize()
+
+    def start(self):
+        with self.thread_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.work, name="cofdb-writer", daemon=True)
+                self.thread.start()
+
+    def stop(self):
+        """
+        Lets the queued requests finish, then stops the thread. Blocking.
+        """
+        with self.thread_lock:
+            thread, self.thread = self.thread, None
+
+        if thread is not None:
+            self.requests.put(None)
+            thread.join()
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Queues a call of the function on the database thread and waits for its result.
+        """
+        self.start()
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.requests.put((loop, future, function, args, kwargs, time.perf_counter()))
+
+        return await future
+
+    async def atomic(self, function, *args, **kwargs):
+        """
+        Same as `run`, inside a transaction which is rolled back if the function raises.
+        """
+        return await self.run(self.in_transaction, function, args, kwargs)
+
+    def in_transaction(self, function, args, kwargs):
+        with self.database.atomic():
+            return function(*args, **kwargs)
+
+    def work(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+
+            loop, future, function, args, kwargs, queued = request
+            started = time.perf_counter()
+
+            try:
+                outcome, value, failed = future.set_result, function(*args, **kwargs), False
+            except BaseException as e:
+                outcome, value, failed = future.set_exception, e, True
+
+            finished = time.perf_counter()
+            self.record(started - queued, finished - started, failed)
+
+            try:
+                loop.call_soon_threadsafe(self.resolve, future, outcome, value)
+            except RuntimeError:
+                pass  # the loop was closed while the request was running, nobody is waiting for it
+
+        if not self.database.is_closed():
+            self.database.close()
+
+    @staticmethod
+    def resolve(future, outcome, value):
+        if not future.done():
+            outcome(value)
+
+    def record(self, wait, execution, failed):
+        with self.stats_lock:
+            self.executed += 1
+            self.failures += failed
+            self.total_wait += wait
+            self.total_execution += execution
+            self.latencies.append(wait + execution)
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            executed = self.executed
+            latencies = sorted(self.latencies)
+
+            stats = {
+                "queue_depth": self.queue_depth,
+                "executed": executed,
+                "failures": self.failures,
+                "average_wait": self.total_wait / executed if executed else 0.0,
+                "average_execution": self.total_execution / executed if executed else 0.0,
+            }
+
+        for name, fraction in [("p50_latency", 0.5), ("p99_latency", 0.99)]:
+            stats[name] = latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] if latencies else 0.0
+
+        return stats
+
+
+async_db = AsyncDatabase(db)
@@ -0,0 +1,47 @@
+import peewee
+
+from .db_manager import db
+
+# rows per statement, keeping each one below sqlite's limit of bound parameters
+BULK_UPDATE_CHUNK_SIZE = 400
+
+
+def bulk_update_field(model, field: peewee.Field, values: dict):
+    """
+    Sets a different value of the field for each given row, using one `UPDATE ... CASE` statement
+    per chunk of rows, all inside a single transaction.
+    """
+    primary_key = model._meta.primary_key
+    items = list(values.items())
+
+    with db.atomic():
+        for index in range(0, len(items), BULK_UPDATE_CHUNK_SIZE):
+            chunk = items[index:index + BULK_UPDATE_CHUNK_SIZE]
+            value = peewee.Case(primary_key, [(row_id, field.db_value(row_value)) for row_id, row_value in chunk])
+            model.update({field: value}).where(primary_key.in_([row_id for row_id, _ in chunk])).execute()
+
+
+def bulk_update_rows(model, row_ids, values: dict):
+    """
+    Sets the same field values on all the given rows, using one `UPDATE ... WHERE id IN` statement per chunk
+    of rows, all inside a single transaction.
+    """
+    primary_key = model._meta.primary_key
+    row_ids = list(row_ids)
+
+    with db.atomic():
+        for index in range(0, len(row_ids), BULK_UPDATE_CHUNK_SIZE):
+            model.update(values).where(primary_key.in_(row_ids[index:index + BULK_UPDATE_CHUNK_SIZE])).execute()
+
+
+def bulk_delete(model, row_ids):
+    """
+    Deletes the given rows, using one `DELETE ... WHERE id IN` statement per chunk of rows, all inside a single
+    transaction.
+    """
+    primary_key = model._meta.primary_key
+    row_ids = list(row_ids)
+
+    with db.atomic():
+        for index in range(0, len(row_ids), BULK_UPDATE_CHUNK_SIZE):
+            model.delete().where(primary_key.in_(row_ids[index:index + BULK_UPDATE_CHUNK_SIZE])).execute()
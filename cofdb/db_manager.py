@@ -1,7 +1,36 @@
 import peewee
 
+DATABASE_PATH = 'cofbot.db'
 
-db = peewee.SqliteDatabase('cofbot.db')
+# pragmas applied to every connection when it is opened, by name
+STORAGE_PROFILES = {
+    # SQLite's own defaults: rollback journal, full sync, no memory mapping and a 2 MiB page cache
+    "default": {},
+    "performance": {
+        # readers no longer wait on the writer, and commits only append to the log
+        "journal_mode": "wal",
+        # with WAL, a power loss may only lose the last commits, never corrupt the database
+        "synchronous": "normal",
+        "mmap_size": 256 * 1024 * 1024,
+        # negative sizes are in KiB
+        "cache_size": -64 * 1024,
+        "temp_store": "memory",
+        # milliseconds to wait for a lock before failing with "database is locked"
+        "busy_timeout": 5000,
+    },
+}
+
+STORAGE_PROFILE = "performance"
+
+
+db = peewee.SqliteDatabase(DATABASE_PATH, pragmas=STORAGE_PROFILES[STORAGE_PROFILE])
+
+
+def open_database(path: str, profile: str = STORAGE_PROFILE):
+    """
+    Points `db` to another database file, with the pragmas of the given storage profile.
+    """
+    db.init(path, pragmas=STORAGE_PROFILES[profile])
 
 
 class BaseModel(peewee.Model):
@@ -0,0 +1,46 @@
+from playhouse.migrate import SqliteMigrator, make_index_name, migrate
+
+from .db_manager import db
+
+
+def create_schema(*models):
+    """
+    Creates the missing tables, columns and indexes of the given models.
+    Indexes come last, since SQLite accepts an index on a column which does not exist yet, indexing a constant.
+    """
+    for model in models:
+        model._schema.create_table(safe=True)
+
+    add_missing_columns(*models)
+
+    for model in models:
+        model._schema.create_indexes(safe=True)
+
+
+def add_missing_columns(*models):
+    """
+    Adds the columns declared on the given models which are missing from their existing tables.
+    New columns must either be nullable or have a default value for the rows already present.
+    """
+    migrator = SqliteMigrator(db)
+    operations = []
+    stale_indexes = []
+
+    for model in models:
+        table = model._meta.table_name
+        existing = {column.name for column in db.get_columns(table)}
+
+        for field in model._meta.sorted_fields:
+            if field.column_name not in existing:
+                operations.append(migrator.add_column(table, field.column_name, field))
+
+                # an index created before its column exists is indexing a constant, it is created again
+                if field.index or field.unique:
+                    stale_indexes.append(make_index_name(table, [field.column_name]))
+
+    if operations:
+        with db.atomic():
+            for index in stale_indexes:
+                db.execute_sql(f'DROP INDEX IF EXISTS "{index}"')
+
+            migrate(*operations)
@@ -0,0 +1,75 @@
+import logging
+import threading
+
+import peewee
+
+from .bulk import bulk_update_field
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Keeps the latest value of a single field per row in memory and writes all pending rows with batched
+    `UPDATE` statements when flushed. Several updates of the same row between two flushes are coalesced
+    into one write.
+    """
+
+    def __init__(self, model, field: peewee.Field):
+        self.model = model
+        self.field = field
+        self.pending = {}
+        self.lock = threading.Lock()
+
+        self.coalesced = 0
+        self.written = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def mark(self, row_id, value):
+        with self.lock:
+            if row_id in self.pending:
+                self.coalesced += 1
+
+            self.pending[row_id] = value
+
+    def discard(self, row_id):
+        with self.lock:
+            self.pending.pop(row_id, None)
+
+    def flush(self) -> int:
+        """
+        Writes every pending row. Blocking, meant to be run outside the event loop.
+        """
+        with self.lock:
+            batch, self.pending = self.pending, {}
+
+        if not batch:
+            return 0
+
+        try:
+            bulk_update_field(self.model, self.field, batch)
+        except Exception:
+            # keep the failed rows for the next flush, unless they were marked again in the meantime
+            with self.lock:
+                for row_id, value in batch.items():
+                    self.pending.setdefault(row_id, value)
+
+            raise
+
+        self.written += len(batch)
+        logger.debug(
+            "Flushed %d row(s) of %s.%s (%d update(s) coalesced so far)",
+            len(batch), self.model.__name__, self.field.name, self.coalesced
+        )
+
+        return len(batch)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "pending": len(self.pending),
+                "written": self.written,
+                "coalesced": self.coalesced,
+            }
@@ -1,26 +1,63 @@
 import asyncio
 import logging
+import argparse
 import traceback
 
 import discord
 from discord.ext import commands
 from typing import Literal, Optional
 
-bot = commands.Bot(command_prefix='cof?', intents=discord.Intents(messages=True, message_content=True))
-log_handler = logging.FileHandler(filename='cofbot.log', encoding='utf-8', mode='w')
+from cluster import ClusterLauncher, ClusterLink, fetch_shard_count
+
+# whether a single process connects through all the shards Discord recommends, instead of a single connection
+SHARDED = False
+
+# seconds of a rate limit the library waits out by itself, the least it accepts, longer ones raising
+# `discord.RateLimited` for the response dispatcher to pause the channel instead
+MAX_RATELIMIT_TIMEOUT = 30.0
+
+
+def create_bot(
+        shard_ids: Optional[list] = None, shard_count: Optional[int] = None, cluster_link=None, sharded: bool = SHARDED
+):
+    """
+    Creates the bot, sharded if requested or if it is given the shards to run.
+    """
+    options = dict(
+        command_prefix='cof?', intents=discord.Intents(messages=True, message_content=True),
+        max_ratelimit_timeout=MAX_RATELIMIT_TIMEOUT
+    )
+
+    if sharded or shard_ids is not None or shard_count is not None:
+        bot = commands.AutoShardedBot(shard_ids=shard_ids, shard_count=shard_count, **options)
+    else:
+        bot = commands.Bot(**options)
+
+    async def setup_hook():
+        await load_extensions(bot)
+        if cluster_link is not None:
+            cluster_link.attach(bot)
+
+    # the extensions are loaded in the bot's own event loop, which their tasks and workers run on
+    bot.setup_hook = setup_hook
+
+    bot.add_listener(on_ready)
+    bot.add_command(ping)
+    bot.add_command(sync)
+
+    return bot
 
 
-@bot.event
 async def on_ready():
     print('Bot is ready.')
 
 
-@bot.command()
+@commands.command()
 async def ping(ctx):
     await ctx.send('Quack!')
 
 
-@bot.command()
+@commands.command()
 @commands.guild_only()
 @commands.is_owner()
 async def sync(
@@ -58,7 +95,7 @@ async def sync(
     await ctx.send(f"Synced the tree to {ret}/{len(guilds)}.")
 
 
-async def load_extensions():
+async def load_extensions(bot):
     try:
         await bot.load_extension('triggers')
     except Exception as e:
@@ -67,9 +104,52 @@ async def load_extensions():
         exit(1)
 
 
-async def main():
-    await load_extensions()
+def read_token() -> str:
+    with open('cofbot_token', 'r') as f:
+        return f.read().strip()
+
+
+def run_worker(token: str, shard_ids: list, shard_count: int, connection, index: int):
+    """
+    Entry point of a cluster worker process.
+    """
+    log_handler = logging.FileHandler(filename=f'cofbot-{index}.log', encoding='utf-8', mode='w')
+
+    bot = create_bot(shard_ids, shard_count, ClusterLink(connection))
+    bot.run(token, log_handler=log_handler)
+
+
+def run_cluster(token: str, process_count: int, shard_count: Optional[int]):
+    from cofdb import db
+    from triggers import TriggerCog
+
+    if shard_count is None:
+        shard_count = asyncio.run(fetch_shard_count(token))
+
+    # migrated once, before the workers open the database
+    TriggerCog.create_tables()
+    db.close()
+
+    logging.basicConfig(level=logging.INFO)
+    ClusterLauncher(run_worker, token, shard_count, process_count).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Cofbot")
+    parser.add_argument("--sharded", action="store_true", help="connect through all the recommended shards")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes, each running a range of shards")
+    parser.add_argument("--shards", type=int, help="total number of shards, recommended by Discord if omitted")
+    args = parser.parse_args()
+
+    token = read_token()
+
+    if args.processes > 1:
+        return run_cluster(token, args.processes, args.shards)
+
+    log_handler = logging.FileHandler(filename='cofbot.log', encoding='utf-8', mode='w')
+    bot = create_bot(shard_count=args.shards, sharded=SHARDED or args.sharded)
+    bot.run(token, log_handler=log_handler)
+
 
-asyncio.run(main())
-with open('cofbot_token', 'r') as f:
-    bot.run(f.read().strip(), log_handler=log_handler)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from triggers.compiled import CompiledTrigger, compute_regex_pattern  # noqa: E402
+
+
+def make_settings(**overrides):
+    settings = dict(cooldown=None, cooldown_scope="trigger", case_sensitive=False, avoid_links=False, avoid_emotes=False)
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+
+def make_trigger(trigger_id, mode, pattern, settings=None, position=None, **fields):
+    settings = settings if settings is not None else make_settings()
+
+    values = dict(
+        id=trigger_id, position=position if position is not None else trigger_id, mode=mode, user_pattern=pattern,
+        response="response", cooldown=None, cooldown_scope=None, case_sensitive=None, avoid_links=None,
+        avoid_emotes=None, start=False, end=False, disabled=False
+    )
+    values.update(fields)
+    values["regex_pattern"] = compute_regex_pattern(
+        mode, pattern, values["case_sensitive"], values["start"], values["end"], settings.case_sensitive
+    )
+
+    return CompiledTrigger(values, settings)
+
+
+@pytest.fixture
+def settings():
+    return make_settings()
+
+
+@pytest.fixture
+def database(tmp_path):
+    from cofdb import db, open_database, create_schema
+    from triggers.entities import TriggerEntity, TriggerSettingsEntity
+
+    open_database(str(tmp_path / "test.db"), "default")
+    create_schema(TriggerEntity, TriggerSettingsEntity)
+
+    yield db
+
+    db.close()
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+
+from cofdb import AsyncDatabase
+from triggers.entities import TriggerSettingsEntity
+
+
+def test_calls_run_in_order_on_a_single_thread(database):
+    async_db = AsyncDatabase(database)
+    calls = []
+
+    def call(index):
+        calls.append((index, threading.get_ident()))
+        return index
+
+    async def main():
+        return await asyncio.gather(*[async_db.run(call, index) for index in range(20)])
+
+    try:
+        assert asyncio.run(main()) == list(range(20))
+    finally:
+        async_db.stop()
+
+    assert [index for index, _ in calls] == list(range(20))
+    assert len({thread for _, thread in calls}) == 1
+    assert threading.get_ident() not in {thread for _, thread in calls}
+    assert async_db.stats()["executed"] == 20
+
+
+def test_atomic_rolls_back_and_raises(database):
+    async_db = AsyncDatabase(database)
+
+    def failing_write():
+        TriggerSettingsEntity.create(guild_id=1)
+        raise ValueError("failed")
+
+    async def main():
+        with pytest.raises(ValueError):
+            await async_db.atomic(failing_write)
+
+        return await async_db.run(TriggerSettingsEntity.select().count)
+
+    try:
+        assert asyncio.run(main()) == 0
+    finally:
+        async_db.stop()
+
+    stats = async_db.stats()
+    assert (stats["executed"], stats["failures"]) == (2, 1)
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import multiprocessing
+from types import SimpleNamespace
+
+import pytest
+
+from cluster import ClusterLauncher, ClusterLink, shard_ranges
+
+
+@pytest.mark.parametrize("shard_count, process_count, expected", [
+    (4, 2, [[0, 1], [2, 3]]),
+    (5, 2, [[0, 1, 2], [3, 4]]),
+    (7, 3, [[0, 1, 2], [3, 4], [5, 6]]),
+    (2, 4, [[0], [1]]),
+    (1, 1, [[0]]),
+])
+def test_shard_ranges(shard_count, process_count, expected):
+    assert shard_ranges(shard_count, process_count) == expected
+
+
+class FakeBot:
+    def __init__(self):
+        self.listeners = []
+        self.dispatched = asyncio.Queue()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def dispatch(self, event, *args):
+        self.dispatched.put_nowait((event, *args))
+
+
+def test_link_relays_events_both_ways():
+    launcher_end, worker_end = multiprocessing.Pipe()
+
+    async def main():
+        bot = FakeBot()
+        link = ClusterLink(worker_end)
+        link.attach(bot)
+
+        [listener] = bot.listeners
+        await listener(42)
+        sent = launcher_end.recv()
+
+        launcher_end.send(("triggers_changed", 7))
+        dispatched = await asyncio.wait_for(bot.dispatched.get(), 5)
+
+        launcher_end.close()
+        return sent, dispatched
+
+    assert asyncio.run(main()) == (("triggers_changed", 42), ("cluster_triggers_changed", 7))
+
+
+def test_launcher_relays_events_to_the_other_workers():
+    pipes = [multiprocessing.Pipe() for _ in range(3)]
+    launcher = ClusterLauncher(None, "token", shard_count=3, process_count=3)
+    launcher.workers = {
+        launcher_end: SimpleNamespace(name=f"worker-{index}", exitcode=0, join=lambda: None)
+        for index, (launcher_end, _) in enumerate(pipes)
+    }
+
+    relay = threading.Thread(target=launcher.relay, daemon=True)
+    relay.start()
+
+    worker_ends = [worker_end for _, worker_end in pipes]
+    worker_ends[0].send(("triggers_changed", 5))
+
+    assert [worker_end.poll(5) for worker_end in worker_ends[1:]] == [True, True]
+    assert [worker_end.recv() for worker_end in worker_ends[1:]] == [("triggers_changed", 5)] * 2
+    assert not worker_ends[0].poll(0.1)
+
+    for worker_end in worker_ends:
+        worker_end.close()
+
+    relay.join(5)
+    assert not relay.is_alive()
+    assert launcher.workers == {}
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import pytest
+
+from triggers.cooldowns import CooldownTracker, cooldown_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_message(channel_id=10, author_id=20):
+    return SimpleNamespace(channel=SimpleNamespace(id=channel_id), author=SimpleNamespace(id=author_id))
+
+
+@pytest.mark.parametrize("scope, expected", [("trigger", (1, None)), ("channel", (1, 10)), ("user", (1, 20))])
+def test_cooldown_key_scopes(scope, expected):
+    trigger = SimpleNamespace(id=1, effective_cooldown=5, effective_cooldown_scope=scope)
+    assert cooldown_key(trigger, make_message()) == expected
+
+
+def test_no_cooldown_has_no_key():
+    trigger = SimpleNamespace(id=1, effective_cooldown=0, effective_cooldown_scope="user")
+    assert cooldown_key(trigger, make_message()) is None
+
+
+def test_cooldowns_expire():
+    clock = FakeClock()
+    cooldowns = CooldownTracker(clock=clock)
+
+    cooldowns.start((1, None), 5)
+    assert cooldowns.is_active((1, None))
+    assert not cooldowns.is_active((2, None))
+
+    clock.now = 5
+    assert not cooldowns.is_active((1, None))
+
+    cooldowns.start((2, None), 5)
+    assert len(cooldowns) == 1
+    assert cooldowns.stats()["expirations"] == 1
+
+
+def test_closest_cooldowns_are_evicted_first():
+    cooldowns = CooldownTracker(max_entries=2, clock=FakeClock())
+
+    cooldowns.start((1, None), 3)
+    cooldowns.start((2, None), 1)
+    cooldowns.start((3, None), 2)
+
+    assert [cooldowns.is_active((trigger_id, None)) for trigger_id in (1, 2, 3)] == [True, False, True]
+    assert cooldowns.stats()["evictions"] == 1
+
+
+def test_extend_never_shortens_a_running_cooldown():
+    clock = FakeClock()
+    cooldowns = CooldownTracker(clock=clock)
+
+    cooldowns.start((1, None), 10)
+    cooldowns.extend((1, None), 2)
+    clock.now = 5
+    assert cooldowns.is_active((1, None))
+
+    cooldowns.extend((1, None), 20)
+    clock.now = 15
+    assert cooldowns.is_active((1, None))
+
+    cooldowns.extend((2, None), 1)
+    assert cooldowns.is_active((2, None))
+
+
+def test_discarded_triggers_lose_every_scope():
+    cooldowns = CooldownTracker(clock=FakeClock())
+    for key in [(1, None), (1, 10), (1, 20), (2, 10)]:
+        cooldowns.start(key, 5)
+
+    cooldowns.discard_trigger(1)
+
+    assert len(cooldowns) == 1
+    assert cooldowns.is_active((2, 10))
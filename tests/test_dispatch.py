@@ -0,0 +1,111 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from triggers.dispatch import TokenBucket, ResponseDispatcher, ChannelQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeChannel:
+    def __init__(self, channel_id=1, failures=()):
+        self.id = channel_id
+        self.sent = []
+        self.failures = list(failures)
+
+    async def send(self, content):
+        if self.failures:
+            raise self.failures.pop(0)
+
+        self.sent.append(content)
+
+
+def test_token_bucket_allows_bursts_then_the_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=5, period=5.0, clock=clock)
+
+    for _ in range(5):
+        assert bucket.delay() == 0
+        bucket.take()
+
+    assert bucket.delay() == pytest.approx(1.0)
+
+    clock.now = 1.0
+    assert bucket.delay() == 0
+
+
+def test_blocked_bucket_waits_for_the_rate_limit():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=5, period=5.0, clock=clock)
+
+    bucket.block(3.0)
+    assert bucket.delay() == pytest.approx(3.0)
+
+    clock.now = 3.0
+    assert bucket.delay() == 0
+
+
+def test_responses_are_coalesced_and_dropped_under_overload():
+    async def main():
+        dispatcher = ResponseDispatcher(max_queued=3)
+        channel = FakeChannel()
+
+        for index in range(3):
+            dispatcher.submit(channel, f"trigger {index}", key=index)
+        dispatcher.submit(channel, "trigger 1 again", key=1)
+        dispatcher.submit(channel, "unique")
+
+        # nothing was sent yet, since the worker only runs once the event loop gets back to it
+        pending = [content for content, _ in dispatcher.queues[channel.id].pending.values()]
+
+        await asyncio.sleep(0.01)
+        await dispatcher.stop()
+
+        return dispatcher, channel, pending
+
+    dispatcher, channel, pending = asyncio.run(main())
+
+    assert pending == ["trigger 1 again", "trigger 2", "unique"]
+    assert channel.sent == pending
+    assert (dispatcher.coalesced, dispatcher.dropped, dispatcher.sent) == (1, 1, 3)
+
+
+def test_rate_limited_responses_are_queued_again_first():
+    async def main():
+        dispatcher = ResponseDispatcher()
+        channel = FakeChannel(failures=[discord.RateLimited(10.0)])
+        queue = ChannelQueue(channel)
+        queue.pending["next"] = ("next", 0.0)
+
+        await dispatcher.send(queue, "first", "first", 0.0)
+        return dispatcher, queue
+
+    dispatcher, queue = asyncio.run(main())
+
+    assert list(queue.pending) == ["first", "next"]
+    assert queue.bucket.delay() > 9
+    assert (dispatcher.sent, dispatcher.failures) == (0, 0)
+
+
+def test_failed_sends_are_counted():
+    async def main():
+        dispatcher = ResponseDispatcher()
+        channel = FakeChannel(failures=[discord.HTTPException(SimpleNamespace(status=403, reason="Forbidden"), "")])
+        dispatcher.submit(channel, "response")
+
+        await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        return dispatcher, channel
+
+    dispatcher, channel = asyncio.run(main())
+
+    assert channel.sent == []
+    assert dispatcher.failures == 1
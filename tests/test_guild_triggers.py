@@ -0,0 +1,165 @@
+import asyncio
+
+from conftest import make_settings
+from triggers.compiled import compute_regex_pattern
+from triggers.entities import TriggerEntity, TriggerSettingsEntity
+from triggers.guild_triggers import GuildTriggers, count_unassigned, adopt_unassigned
+
+
+def save_trigger(guild_id, position, pattern, case_sensitive=None):
+    return TriggerEntity.create(
+        guild_id=guild_id, mode="plain", user_pattern=pattern, response="response", case_sensitive=case_sensitive,
+        start=False, end=False, regex_pattern=pattern, position=position
+    )
+
+
+def save_explicit_trigger(guild_id, position, pattern, case_sensitive, **fields):
+    # a trigger with its own `case_sensitive`, whose stored pattern does not depend on the guild's
+    return TriggerEntity.create(
+        guild_id=guild_id, mode="plain", user_pattern=pattern, response="response", case_sensitive=case_sensitive,
+        start=False, end=False, position=position,
+        regex_pattern=compute_regex_pattern("plain", pattern, case_sensitive, False, False, False), **fields
+    )
+
+
+def test_adopted_triggers_follow_the_guild_ones(database):
+    save_trigger(1, 0, "own")
+    save_trigger(None, 0, "legacy a")
+    save_trigger(None, 10, "legacy b")
+    TriggerSettingsEntity.create(guild_id=None, cooldown=7)
+
+    assert count_unassigned() == 3
+    assert [trigger.user_pattern for trigger in GuildTriggers(1).triggers] == ["own"]
+
+    assert adopt_unassigned(1) == (2, False)  # the guild's settings were created by loading it
+
+    assert count_unassigned() == 1
+    assert [trigger.user_pattern for trigger in GuildTriggers(1).triggers] == ["own", "legacy a", "legacy b"]
+
+
+def test_settings_are_adopted_by_a_guild_without_any(database):
+    save_trigger(None, 0, "legacy")
+    TriggerSettingsEntity.create(guild_id=None, cooldown=7, case_sensitive=True)
+
+    assert adopt_unassigned(2) == (1, True)
+    assert count_unassigned() == 0
+
+    guild_triggers = GuildTriggers(2)
+    assert guild_triggers.globals.cooldown == 7
+    assert guild_triggers.triggers[0].effective_cooldown == 7
+
+
+def test_adopted_patterns_follow_the_guild_settings(database):
+    TriggerSettingsEntity.create(guild_id=3, case_sensitive=False)
+    save_trigger(None, 0, "Legacy")
+    TriggerSettingsEntity.create(guild_id=None, case_sensitive=True)
+
+    adopt_unassigned(3)
+
+    trigger = GuildTriggers(3).triggers[0]
+    assert trigger.pattern.search("legacy") is not None
+
+
+def test_ranks_follow_the_changes(database):
+    entities = [save_trigger(1, position, pattern) for position, pattern in enumerate(["a", "b", "c"])]
+    guild_triggers = GuildTriggers(1)
+
+    assert guild_triggers.get_ranks() == {entity.id: rank for rank, entity in enumerate(entities)}
+
+    guild_triggers.remove_many([guild_triggers.triggers[1]])
+
+    assert guild_triggers.get_ranks() == {entities[0].id: 0, entities[2].id: 1}
+
+
+def test_triggers_which_no_longer_compile_are_skipped(database):
+    save_trigger(1, 0, "before")
+    broken = TriggerEntity.create(
+        guild_id=1, mode="regex", user_pattern="a(?i)b", response="response", case_sensitive=True, start=False,
+        end=False, regex_pattern="a(?i)b", position=1
+    )
+    save_trigger(1, 2, "after")
+
+    guild_triggers = GuildTriggers(1)
+
+    assert [trigger.user_pattern for trigger in guild_triggers.triggers] == ["before", "after"]
+    assert guild_triggers.invalid == [broken.id]
+    assert TriggerEntity.get_by_id(broken.id).regex_pattern == "a(?i)b"
+
+
+def test_only_the_inheriting_triggers_are_recompiled(database):
+    inheriting = save_trigger(1, 0, "Hello")
+    save_explicit_trigger(1, 1, "Hello", False, cooldown=5)
+    guild_triggers = GuildTriggers(1)
+
+    guild_triggers.globals.case_sensitive = True
+    guild_triggers.globals.cooldown = 9
+    replacements = guild_triggers.recompile_dependents(["case_sensitive"])
+
+    assert [trigger.id for trigger, _ in replacements] == [inheriting.id]
+    assert replacements[0][1].pattern.search("hello") is None
+    assert replacements[0][1].effective_cooldown == 9
+
+    # nothing changes before the replacements are applied
+    assert guild_triggers.triggers[0].pattern.search("hello") is not None
+
+    guild_triggers.replace_many(replacements)
+
+    assert guild_triggers.triggers[0].pattern.search("hello") is None
+    assert guild_triggers.triggers[1].pattern.search("hello") is not None
+    assert guild_triggers.triggers[1].effective_cooldown == 5
+
+
+def test_cooldown_changes_only_reach_the_inheriting_triggers(database):
+    inheriting = save_trigger(1, 0, "a")
+    save_trigger(1, 1, "b")
+    TriggerEntity.update(cooldown=5).where(TriggerEntity.position == 1).execute()
+    guild_triggers = GuildTriggers(1)
+
+    replacements = guild_triggers.recompile_dependents(["cooldown"], make_settings(cooldown=3))
+
+    assert [(trigger.id, new_trigger.effective_cooldown) for trigger, new_trigger in replacements] == [
+        (inheriting.id, 3)
+    ]
+    assert replacements[0][1].regex_pattern == replacements[0][0].regex_pattern
+
+
+def test_setglobal_saves_the_recompiled_patterns(database, monkeypatch):
+    from types import SimpleNamespace
+
+    from cofdb import async_db
+    from triggers import trigger_manager
+
+    monkeypatch.setattr(trigger_manager, "USE_REGEX_SANDBOX", False)
+    monkeypatch.setattr(trigger_manager, "SHADOW_EVALUATION", False)
+
+    inheriting = save_trigger(1, 0, "Hello")
+    explicit = save_explicit_trigger(1, 1, "Hello", False)
+
+    events = []
+    cog = trigger_manager.TriggerCog(SimpleNamespace(dispatch=lambda *args: events.append(args)))
+
+    sent = []
+
+    async def send_message(content):
+        sent.append(content)
+
+    interaction = SimpleNamespace(guild_id=1, response=SimpleNamespace(send_message=send_message))
+
+    async def run():
+        await cog.setglobal.callback(cog, interaction, case_sensitive=True)
+        return await cog.guild_cache.get(1)
+
+    try:
+        guild_triggers = asyncio.run(run())
+    finally:
+        async_db.stop()
+
+    assert sent == ["Global settings updated successfully."]
+    assert events == [("triggers_changed", 1)]
+    assert guild_triggers.triggers[0].pattern.search("hello") is None
+    assert guild_triggers.triggers[1].pattern.search("hello") is not None
+
+    # the stored rows agree with the cached ones
+    assert TriggerEntity.get_by_id(inheriting.id).regex_pattern == guild_triggers.triggers[0].regex_pattern
+    assert TriggerEntity.get_by_id(explicit.id).regex_pattern == guild_triggers.triggers[1].regex_pattern
+    assert TriggerSettingsEntity.get(guild_id=1).case_sensitive is True
@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from triggers.matching import TriggerMatcher, fold_ascii
+from triggers.shadow import reference_find
+from triggers.ordering import position_of
+
+from conftest import make_trigger
+
+
+def always_valid(match, trigger):
+    return match is not None
+
+
+def span_of(result):
+    return None if result is None else (result[0].id, result[1].span())
+
+
+def assert_same_as_reference(triggers, content):
+    matcher = TriggerMatcher(trigger for trigger in triggers if not trigger.disabled)
+    expected = reference_find(
+        sorted((trigger for trigger in triggers if not trigger.disabled), key=position_of), content, always_valid
+    )
+
+    assert span_of(matcher.find(content, always_valid)) == span_of(expected), content
+
+
+def test_mixed_sensitivity_shares_no_result():
+    triggers = [
+        make_trigger(1, "plain", "Hello"),
+        make_trigger(2, "plain", "hello", case_sensitive=True),
+    ]
+    matcher = TriggerMatcher(triggers)
+
+    # the insensitive trigger does not match, so the sensitive one must search the original text itself
+    result = matcher.find("HELLO hello", lambda match, trigger: match is not None and trigger.id == 2)
+    assert span_of(result) == (2, (6, 11))
+
+
+def test_mixed_sensitivity_with_anchors():
+    triggers = [
+        make_trigger(4, "word", "hello", end=True, case_sensitive=True),
+        make_trigger(5, "word", "hello", end=True),
+    ]
+
+    assert_same_as_reference(triggers, "hello Hello")
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_reference_loop(seed):
+    rng = random.Random(seed)
+    alphabet = "aAbBiIkKsSİıſKß .*-_é1("
+
+    def text(low, high):
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(low, high)))
+
+    triggers = []
+    for trigger_id in range(150):
+        mode = rng.choice(["plain", "word", "full", "regex"])
+        pattern = text(1, 3) if mode != "regex" else rng.choice(["a+b", "(?:ab|ba)", "s.k", "[ik]+", "(a)b", "ı"])
+        triggers.append(make_trigger(
+            trigger_id, mode, pattern, position=rng.randrange(10_000),
+            case_sensitive=rng.choice([None, True, False]), start=rng.random() < 0.2, end=rng.random() < 0.2,
+            disabled=rng.random() < 0.05
+        ))
+
+    for _ in range(300):
+        assert_same_as_reference(triggers, text(0, 12))
+
+
+def test_fold_keeps_positions():
+    text = "İıſKß HELLO"
+    assert len(fold_ascii(text)) == len(text)
+
+
+@pytest.mark.parametrize("pattern, case_sensitive", [
+    ("(?i)ab|cd", None), ("(?i)ab|cd", True), ("(?u)ab|cd", True), ("(?s)a.c|x.z", False), ("(?x) a b | c d ", True),
+    ("(?a)\\w\\d", True),
+])
+def test_global_flags_in_combined_regexes(pattern, case_sensitive):
+    triggers = [make_trigger(1, "regex", "zz|yy")]
+    triggers += [make_trigger(trigger_id, "regex", pattern, case_sensitive=case_sensitive) for trigger_id in (2, 3)]
+    matcher = TriggerMatcher(triggers)
+
+    assert all(combined is not None for _, combined in matcher.chunks)
+    for content in ["AB", "ab", "a\nc", "cd", "zz", "x3", "é1", "nothing"]:
+        assert_same_as_reference(triggers, content)
+
+
+def test_uncombinable_chunk_keeps_every_trigger_a_candidate():
+    triggers = [make_trigger(trigger_id, "regex", f"[a-c]{trigger_id}?") for trigger_id in range(3)]
+    matcher = TriggerMatcher(triggers)
+    matcher.chunks[0][1] = None
+
+    assert {trigger.id for trigger in matcher.candidates("b", "b")} == {0, 1, 2}
@@ -0,0 +1,40 @@
+import pytest
+
+from triggers.message_context import SpanIndex, MessageContext
+from triggers.trigger_manager import TriggerCog
+
+from conftest import make_settings, make_trigger
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    (0, 2, False), (2, 4, True), (3, 5, True), (4, 6, False), (10, 12, True), (12, 13, False), (20, 21, False)
+])
+def test_span_index_contains(start, end, expected):
+    spans = SpanIndex([(2, 5), (10, 12)])
+    assert spans.contains(start, end) is expected
+
+
+def test_links_and_emotes_are_found_once():
+    context = MessageContext("see https://example.com/cat and <:cat:123> or <a:dog:456>")
+
+    assert len(context.link_spans) == 1
+    assert len(context.emote_spans) == 2
+    assert context.link_spans is context.link_spans
+
+
+@pytest.mark.parametrize("avoid_links, avoid_emotes, expected", [
+    (False, False, [None, None, None]),
+    (True, False, [None, "inside a link", None]),
+    (False, True, [None, None, "inside an emote"]),
+])
+def test_match_exclusion(avoid_links, avoid_emotes, expected):
+    settings = make_settings(avoid_links=avoid_links, avoid_emotes=avoid_emotes)
+    trigger = make_trigger(1, "plain", "cat", settings)
+
+    content = "cat https://example.com/cat <:cat:123>"
+    context = MessageContext(content)
+
+    exclusions = [
+        TriggerCog.match_exclusion(context, match, trigger) for match in trigger.pattern.finditer(content)
+    ]
+    assert exclusions == expected
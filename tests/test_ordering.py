@@ -0,0 +1,55 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from triggers.ordering import OrderedTriggers, BLOCK_SIZE
+
+
+def make_entry(entry_id, position):
+    return SimpleNamespace(id=entry_id, position=position)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_ordered_triggers_match_a_sorted_list(seed):
+    rng = random.Random(seed)
+    positions = rng.sample(range(100_000), BLOCK_SIZE * 6)
+
+    entries = [make_entry(entry_id, position) for entry_id, position in enumerate(positions[:BLOCK_SIZE * 3])]
+    ordered = OrderedTriggers(entries)
+    expected = sorted(entries, key=lambda entry: entry.position)
+
+    for entry_id, position in enumerate(positions[BLOCK_SIZE * 3:], len(entries)):
+        if expected and rng.random() < 0.3:
+            removed = expected.pop(rng.randrange(len(expected)))
+            assert ordered.remove(removed) is removed
+        else:
+            entry = make_entry(entry_id, position)
+            ordered.add(entry)
+            expected.append(entry)
+            expected.sort(key=lambda entry: entry.position)
+
+    assert len(ordered) == len(expected)
+    assert list(ordered) == expected
+
+    for rank in rng.sample(range(len(expected)), 50):
+        assert ordered[rank] is expected[rank]
+        assert ordered.index(expected[rank]) == rank
+
+    assert ordered[-1] is expected[-1]
+
+
+def test_replace_keeps_the_rank():
+    entries = [make_entry(entry_id, entry_id * 10) for entry_id in range(5)]
+    ordered = OrderedTriggers(entries)
+
+    new_entry = make_entry(2, 20)
+    ordered.replace(entries[2], new_entry)
+
+    assert ordered[2] is new_entry
+    assert ordered.index(new_entry) == 2
+
+
+def test_rank_out_of_range():
+    with pytest.raises(IndexError):
+        OrderedTriggers([make_entry(0, 0)])[1]
@@ -0,0 +1,23 @@
+import re
+
+from triggers.profiler import PatternProfile, profile_patterns
+
+
+def test_everyday_patterns_are_accepted_and_catastrophic_ones_rejected():
+    patterns = [r"(?i)(\w+)ing", r"\bcats?\b", r"(a|aa)+$", r"^(\d+)+$"]
+    profiles = profile_patterns([re.compile(pattern) for pattern in patterns])
+
+    assert [profile.rejected for profile in profiles] == [False, False, True, True]
+    assert not profiles[0].slow
+
+
+def test_limits_are_relative_to_the_calibration():
+    assert not PatternProfile(0.15, "input", False, calibration=0.1).slow
+    assert PatternProfile(0.25, "input", False, calibration=0.1).slow
+    assert not PatternProfile(0.25, "input", False, calibration=0.1).rejected
+    assert PatternProfile(0.25, "input", False, calibration=0.01).rejected
+
+
+def test_superquadratic_growth_is_rejected():
+    assert PatternProfile(0.001, "input", False, calibration=0.1, growth=3).rejected
+    assert not PatternProfile(0.001, "input", False, calibration=0.1, growth=2).rejected
@@ -0,0 +1,67 @@
+import re
+import asyncio
+
+import pytest
+
+from triggers.sandbox import RegexSandbox, SandboxTimeout
+from triggers.matching import TriggerMatcher
+
+from conftest import make_trigger
+
+CATASTROPHIC = re.compile("(?:a|a)*$")
+SLOW_CONTENT = "a" * 40 + "!"
+
+
+async def search_with(sandbox, patterns, content):
+    sandbox.start()
+    try:
+        return await sandbox.search_many(patterns, content)
+    finally:
+        sandbox.stop()
+
+
+def test_search_many_returns_matches():
+    matches = asyncio.run(search_with(RegexSandbox(worker_count=1), [re.compile("b+"), re.compile("z")], "abbc"))
+
+    assert matches[0].span() == (1, 3)
+    assert matches[1] is None
+
+
+def test_timeout_blames_the_pattern_which_ran_too_long():
+    sandbox = RegexSandbox(worker_count=1, time_budget=0.3, pattern_time_limit=0.1)
+
+    with pytest.raises(SandboxTimeout) as info:
+        asyncio.run(search_with(sandbox, [re.compile("a"), CATASTROPHIC], SLOW_CONTENT))
+
+    assert info.value.index == 1
+
+
+def test_timeout_blames_nobody_when_no_pattern_ran_long_enough():
+    sandbox = RegexSandbox(worker_count=1, time_budget=0.3, pattern_time_limit=10)
+
+    with pytest.raises(SandboxTimeout) as info:
+        asyncio.run(search_with(sandbox, [re.compile("a"), CATASTROPHIC], SLOW_CONTENT))
+
+    assert info.value.index is None
+
+
+def test_sandboxed_matching_runs_no_regex_inline():
+    class Unsearchable:
+        def search(self, content):
+            raise AssertionError("a user regex ran on the event loop")
+
+    triggers = [make_trigger(1, "regex", "(?:a|a)*$"), make_trigger(2, "plain", "hello")]
+    matcher = TriggerMatcher(triggers)
+    for chunk in matcher.chunks:
+        chunk[1] = Unsearchable()
+
+    async def find():
+        sandbox = RegexSandbox(worker_count=1)
+        sandbox.start()
+        try:
+            return await matcher.find_sandboxed("hello", lambda match, trigger: match is not None, sandbox)
+        finally:
+            sandbox.stop()
+
+    result = asyncio.run(find())
+    assert result[0].id == 1
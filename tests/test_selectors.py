@@ -0,0 +1,30 @@
+import pytest
+
+from triggers.selectors import InvalidSelector, parse_selector, describe_selection
+
+
+def test_ids_and_ranges():
+    assert parse_selector("3-5, 1,4", 10) == [0, 2, 3, 4]
+
+
+@pytest.mark.parametrize("selector", ["", "1,,2", "a", "5-3", "0", "1-11", "-2"])
+def test_invalid_selectors(selector):
+    with pytest.raises(InvalidSelector):
+        parse_selector(selector, 10)
+
+
+@pytest.mark.parametrize("ranks, expected", [([], ""), ([0], "1"), ([0, 1, 2, 4, 6, 7], "1-3,5,7-8")])
+def test_describe_selection(ranks, expected):
+    assert describe_selection(ranks) == expected
+
+
+def test_description_selects_the_same_ranks():
+    ranks = [0, 1, 2, 9, 11, 12, 13, 19]
+    assert parse_selector(describe_selection(ranks), 20) == ranks
+
+
+def test_huge_ids_are_invalid_selectors():
+    with pytest.raises(InvalidSelector) as error:
+        parse_selector("1" * 5000, 10)
+
+    assert len(str(error.value)) < 100
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+
+from triggers.shadow import ShadowEvaluator, reference_find
+from triggers.sandbox import SandboxTimeout
+
+from conftest import make_trigger
+
+
+def always_valid(match, trigger):
+    return match is not None
+
+
+TRIGGERS = [make_trigger(1, "word", "cat"), make_trigger(2, "plain", "ca")]
+
+
+def compare(shadow, result, content="a cat", sandbox=None):
+    # given in any order, the reference loop sorts them by position
+    triggers = list(reversed(TRIGGERS))
+    asyncio.run(shadow.compare(1, triggers, content, always_valid, result, 0.001, sandbox))
+
+
+def test_agreeing_engine():
+    shadow = ShadowEvaluator()
+    compare(shadow, reference_find(TRIGGERS, "a cat", always_valid))
+
+    assert shadow.stats()["compared"] == 1
+    assert shadow.stats()["mismatches"] == 0
+
+
+def test_mismatches_are_counted_and_logged(caplog):
+    shadow = ShadowEvaluator()
+    second = TRIGGERS[1]
+
+    with caplog.at_level(logging.WARNING, logger="triggers.shadow"):
+        compare(shadow, (second, second.pattern.search("a cat")))
+        compare(shadow, None)
+
+    assert shadow.stats()["mismatches"] == 2
+    assert len(caplog.records) == 2
+    assert "a cat" not in caplog.text  # only a fingerprint of the message is logged
+
+
+def test_agreement_compares_the_spans():
+    first = TRIGGERS[0]
+    match = first.pattern.search("a cat")
+
+    assert ShadowEvaluator.agree((first, match), (first, match))
+    assert not ShadowEvaluator.agree((first, match), (first, first.pattern.search("cat a cat", 3)))
+    assert ShadowEvaluator.agree(None, None)
+    assert not ShadowEvaluator.agree(None, (first, match))
+
+
+def test_sandbox_timeouts_abort_the_comparison():
+    class TimingOutSandbox:
+        async def search_many(self, patterns, content):
+            raise SandboxTimeout(None)
+
+    shadow = ShadowEvaluator()
+    compare(shadow, None, sandbox=TimingOutSandbox())
+
+    assert shadow.stats()["aborted"] == 1
+    assert shadow.stats()["compared"] == 0
+
+
+def test_sampling():
+    assert not ShadowEvaluator(sample_rate=0).sampled()
+    assert ShadowEvaluator(sample_rate=1).sampled()
@@ -0,0 +1,42 @@
+import re
+from types import SimpleNamespace
+
+from triggers.templates import compile_responses
+
+MESSAGE = SimpleNamespace(
+    author=SimpleNamespace(mention="<@1>", name="duck", display_name="Duck", nick=None, id=1)
+)
+
+
+def render(response, pattern=r"(\w+) (\w+)", content="hello world"):
+    match = re.search(pattern, content)
+    templates, unknown = compile_responses(response, match.re.groups)
+    return [template.render(MESSAGE, match) for template in templates], unknown
+
+
+def test_responses_are_split_on_unescaped_semicolons():
+    assert render(r"a;b\;c;d") == (["a", "b;c", "d"], [])
+
+
+def test_author_variables():
+    assert render("{author_username} {author_display} {author_nickname} {author_id} @{author_id}") == (
+        ["duck Duck Duck 1 <@1>"], []
+    )
+
+
+def test_match_variables():
+    assert render("{match2}, {match1}!") == (["world, hello!"], [])
+
+
+def test_unknown_variables_are_kept_as_text():
+    assert render("{match3} {nothing}") == (["{match3} {nothing}"], ["{match3}", "{nothing}"])
+
+
+def test_template_sources():
+    templates, _ = compile_responses(r"first;second {match1}", 1)
+    assert [template.source for template in templates] == ["first", "second {match1}"]
+
+
+def test_huge_match_variables_are_unknown():
+    variable = "{match" + "9" * 5000 + "}"
+    assert render(variable) == ([variable], [variable])
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from triggers.entities import TriggerEntity, TriggerSettingsEntity
+from triggers.transfer import InvalidImport, TRIGGER_FIELDS, export_guild, parse_import
+
+TRIGGERS = [
+    dict(mode="plain", user_pattern="hello", response="hi;hey", cooldown=5, cooldown_scope="user",
+         case_sensitive=True, avoid_links=None, avoid_emotes=False, start=True, end=False, disabled=False),
+    dict(mode="regex", user_pattern=r"a,\"b\"", response="{match0}\n", cooldown=None, cooldown_scope=None,
+         case_sensitive=None, avoid_links=True, avoid_emotes=None, start=False, end=False, disabled=True),
+]
+
+
+@pytest.mark.parametrize("format_", ["jsonl", "csv"])
+def test_export_round_trip(database, format_):
+    TriggerSettingsEntity.create(guild_id=1, cooldown=3, cooldown_scope="channel", case_sensitive=True)
+    for position, fields in reversed(list(enumerate(TRIGGERS))):
+        TriggerEntity.create(guild_id=1, position=position, regex_pattern="", **fields)
+    TriggerEntity.create(guild_id=2, position=0, regex_pattern="", **TRIGGERS[0])
+
+    settings, triggers = parse_import(export_guild(1, format_).read(), format_)
+
+    assert settings == dict(cooldown=3, cooldown_scope="channel", case_sensitive=True, avoid_links=False,
+                            avoid_emotes=False)
+    assert [fields for _, fields in triggers] == [{field: trigger[field] for field in TRIGGER_FIELDS}
+                                                  for trigger in TRIGGERS]
+
+
+@pytest.mark.parametrize("record, line", [
+    ({"mode": "plain", "pattern": "a"}, 2),
+    ({"mode": "fuzzy", "pattern": "a", "response": "b"}, 2),
+    ({"mode": "plain", "pattern": "a", "response": "b", "cooldown": -1}, 2),
+    ({"mode": "plain", "pattern": "a", "response": "b", "start": "maybe"}, 2),
+    ({"kind": "other"}, 2),
+])
+def test_invalid_lines_are_reported(record, line):
+    data = "\n".join([json.dumps({"mode": "plain", "pattern": "a", "response": "b"}), json.dumps(record)])
+
+    with pytest.raises(InvalidImport) as error:
+        parse_import(data.encode(), "jsonl")
+
+    assert error.value.line == line
+
+
+def test_settings_are_given_once():
+    data = "\n".join([json.dumps({"kind": "settings", "cooldown": 1})] * 2)
+
+    with pytest.raises(InvalidImport):
+        parse_import(data.encode(), "jsonl")
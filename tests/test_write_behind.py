@@ -0,0 +1,23 @@
+from cofdb import WriteBehindBuffer
+from triggers.entities import TriggerEntity
+
+
+def test_updates_of_a_row_are_coalesced(database):
+    entities = [
+        TriggerEntity.create(
+            guild_id=1, mode="plain", user_pattern=pattern, response="response", start=False, end=False,
+            regex_pattern=pattern, position=position
+        )
+        for position, pattern in enumerate(["a", "b"])
+    ]
+    buffer = WriteBehindBuffer(TriggerEntity, TriggerEntity.disabled)
+
+    buffer.mark(entities[0].id, True)
+    buffer.mark(entities[0].id, False)
+    buffer.mark(entities[1].id, True)
+
+    assert buffer.stats() == {"pending": 2, "written": 0, "coalesced": 1}
+    assert buffer.flush() == 2
+    assert buffer.stats() == {"pending": 0, "written": 2, "coalesced": 1}
+
+    assert [TriggerEntity.get_by_id(entity.id).disabled for entity in entities] == [False, True]
@@ -0,0 +1,170 @@
+import re
+from typing import Optional
+
+from .templates import compile_responses
+from .matching import fold_ascii
+from .sandbox import SandboxMatch
+from .patterns import PATTERNS
+
+# the stored fields of a trigger, as declared on `TriggerEntity`, kept on its compiled form
+FIELDS = (
+    "id", "position", "mode", "user_pattern", "response", "cooldown", "cooldown_scope", "case_sensitive",
+    "avoid_links", "avoid_emotes", "start", "end", "regex_pattern", "disabled"
+)
+
+# the fields which fall back to the guild's global value when `None`
+INHERITED_FIELDS = ("cooldown", "cooldown_scope", "case_sensitive", "avoid_links", "avoid_emotes")
+
+
+class CompiledTrigger:
+    """
+    Immutable in-memory form of a trigger, used to match messages and to display it.
+
+    The stored settings are kept as they are, `None` meaning the guild's global value, while the `effective_*`
+    settings have the global values merged in. The `TriggerEntity` the record is built from is only used to write.
+    """
+
+    # `regex_pattern` is the source of the compiled pattern, which is shared with the triggers using the same one
+    __slots__ = FIELDS + (
+        "pattern", "folded_pattern", "templates", "effective_cooldown", "effective_cooldown_scope",
+        "effective_avoid_links", "effective_avoid_emotes"
+    )
+
+    def __init__(self, fields: dict, settings, previous: Optional["CompiledTrigger"] = None):
+        """
+        Builds the record from the given stored fields and the guild's global settings. The pattern and responses
+        of the previous record are reused when they did not change.
+        """
+        assign = object.__setattr__
+        for name in FIELDS:
+            assign(self, name, fields[name])
+
+        regex_pattern = str(fields["regex_pattern"])
+        assign(self, "regex_pattern", regex_pattern)
+
+        if previous is not None and previous.regex_pattern == regex_pattern:
+            pattern = previous.pattern
+        else:
+            pattern = PATTERNS.compile(regex_pattern)
+
+        if previous is not None and previous.regex_pattern == regex_pattern and previous.mode == fields["mode"] \
+                and previous.user_pattern == fields["user_pattern"]:
+            folded_pattern = previous.folded_pattern
+        else:
+            folded_pattern = fold_literal_pattern(fields["mode"], fields["user_pattern"], regex_pattern)
+
+        if previous is not None and previous.pattern is pattern and previous.response == fields["response"]:
+            templates = previous.templates
+        else:
+            templates, _ = compile_responses(str(fields["response"]), pattern.groups)
+            templates = tuple(templates)
+
+        assign(self, "pattern", pattern)
+        assign(self, "folded_pattern", folded_pattern)
+        assign(self, "templates", templates)
+
+        cooldown = fields["cooldown"]
+        cooldown_scope = fields["cooldown_scope"]
+        avoid_links = fields["avoid_links"]
+        avoid_emotes = fields["avoid_emotes"]
+        assign(self, "effective_cooldown", cooldown if cooldown is not None else settings.cooldown)
+        assign(
+            self, "effective_cooldown_scope", cooldown_scope if cooldown_scope is not None else settings.cooldown_scope
+        )
+        assign(self, "effective_avoid_links", avoid_links if avoid_links is not None else settings.avoid_links)
+        assign(self, "effective_avoid_emotes", avoid_emotes if avoid_emotes is not None else settings.avoid_emotes)
+
+    def search(self, content: str, folded: str):
+        """
+        Searches the message, given both as it was sent and folded by `fold_ascii`. A pre-folded pattern is
+        matched against the folded text, and its match is returned over the original one.
+        """
+        if self.folded_pattern is None:
+            return self.pattern.search(content)
+
+        match = self.folded_pattern.search(folded)
+        return None if match is None else SandboxMatch(content, match.regs)
+
+    @classmethod
+    def from_entity(cls, entity, settings) -> "CompiledTrigger":
+        return cls({name: getattr(entity, name) for name in FIELDS}, settings)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable, use `replace` instead")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"<CompiledTrigger id={self.id} position={self.position} mode={self.mode}>"
+
+    @property
+    def inherited(self) -> tuple:
+        """
+        The global settings the trigger depends on.
+        """
+        return tuple(name for name in INHERITED_FIELDS if getattr(self, name) is None)
+
+    def fields(self) -> dict:
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def replace(self, settings, **changes) -> "CompiledTrigger":
+        """
+        Returns a new record with the given stored fields changed, resolved against the given global settings.
+        """
+        unknown = changes.keys() - set(FIELDS)
+        if unknown:
+            raise TypeError(f"Unknown trigger fields: {', '.join(sorted(unknown))}")
+
+        fields = self.fields()
+        fields.update(changes)
+        return CompiledTrigger(fields, settings, self)
+
+
+def compute_regex_pattern(
+        mode: str, pattern: str, case_sensitive: Optional[bool], start: bool, end: bool, default_case_sensitive: bool
+) -> str:
+    """
+    Builds the source of the pattern matching messages, `default_case_sensitive` being the guild's global value.
+    """
+    # non regex patterns need to be escaped
+    regex_builder = pattern if mode == "regex" else re.escape(pattern)
+
+    # "plain" and "word" with both start and end are simply "full"
+    if mode in ["plain", "word"] and start and end:
+        mode = "full"
+
+    if mode == "full":
+        start = True
+        end = True
+
+    if mode == "word":
+        regex_builder = f"\\b{regex_builder}\\b"
+
+    if start:
+        regex_builder = f"^{regex_builder}"
+
+    if end:
+        regex_builder = f"{regex_builder}$"
+
+    used_case_sensitive = case_sensitive if case_sensitive is not None else default_case_sensitive
+
+    if not used_case_sensitive:
+        regex_builder = f"(?i){regex_builder}"
+
+    return regex_builder
+
+
+def fold_literal_pattern(mode: str, user_pattern: str, regex_pattern: str) -> Optional[re.Pattern]:
+    """
+    Returns the case-sensitive equivalent of a case-insensitive literal pattern, to be searched in text folded by
+    `fold_ascii`, or `None` if the pattern is case-sensitive, a `regex` or not ASCII.
+
+    For ASCII patterns, comparing folded characters is exactly what case-insensitive matching does, and the folding
+    keeps every character in place, so the spans found in the folded text are those of the original one.
+    """
+    if mode == "regex" or not regex_pattern.startswith("(?i)") or not str(user_pattern).isascii():
+        return None
+
+    # the rest of the source is the escaped pattern and its anchors, none of which are changed by folding
+    return PATTERNS.compile(fold_ascii(regex_pattern[4:]))
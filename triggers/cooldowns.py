@@ -0,0 +1,113 @@
+import time
+from itertools import count
+from heapq import heappush, heappop, heapify
+
+# most cooldowns tracked at once, the ones closest to expiring are dropped first once exceeded
+MAX_COOLDOWN_ENTRIES = 100_000
+
+# the heap is rebuilt once it holds this many times more entries than there are cooldowns
+HEAP_COMPACTION_RATIO = 4
+
+COOLDOWN_SCOPES = ("trigger", "channel", "user")
+
+
+def cooldown_key(trigger, message):
+    """
+    Returns the key of the cooldown the message would start, or `None` if the trigger has no cooldown.
+    Channel and user IDs are snowflakes, so they never collide with one another.
+    """
+    if not trigger.effective_cooldown:
+        return None
+
+    scope = trigger.effective_cooldown_scope
+    if scope == "channel":
+        return trigger.id, message.channel.id
+
+    if scope == "user":
+        return trigger.id, message.author.id
+
+    return trigger.id, None
+
+
+class CooldownTracker:
+    """
+    Expiry times of the active cooldowns, on the monotonic clock. Expired cooldowns are freed as new ones start,
+    using a heap ordered by expiry, and the number of cooldowns is bounded.
+    """
+
+    def __init__(self, max_entries: int = MAX_COOLDOWN_ENTRIES, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+
+        self.expiries = {}  # key -> expiry
+        # (expiry, sequence, key), including the entries of restarted or discarded cooldowns
+        self.heap = []
+        self.sequence = count()
+
+        self.expirations = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.expiries)
+
+    def is_active(self, key) -> bool:
+        expiry = self.expiries.get(key)
+        return expiry is not None and expiry > self.clock()
+
+    def start(self, key, duration: float):
+        now = self.clock()
+        expiry = now + duration
+
+        self.expiries[key] = expiry
+        heappush(self.heap, (expiry, next(self.sequence), key))
+
+        self.expire(now)
+        while len(self.expiries) > self.max_entries:
+            if self.pop():
+                self.evictions += 1
+
+        if len(self.heap) > HEAP_COMPACTION_RATIO * len(self.expiries) + self.max_entries // 100:
+            self.heap = [(expiry, next(self.sequence), key) for key, expiry in self.expiries.items()]
+            heapify(self.heap)
+
+    def extend(self, key, duration: float):
+        """
+        Same as `start`, except that a cooldown already running past the new expiry is left as it is.
+        """
+        expiry = self.expiries.get(key)
+        if expiry is None or expiry < self.clock() + duration:
+            self.start(key, duration)
+
+    def expire(self, now: float):
+        while self.heap and self.heap[0][0] <= now:
+            if self.pop():
+                self.expirations += 1
+
+    def pop(self) -> bool:
+        """
+        Removes the cooldown closest to expiring, returning whether the heap entry was still current.
+        """
+        expiry, _, key = heappop(self.heap)
+        if self.expiries.get(key) != expiry:
+            return False
+
+        del self.expiries[key]
+        return True
+
+    def discard_trigger(self, trigger_id: int):
+        """
+        Drops every cooldown of the given trigger, in all scopes.
+        """
+        self.discard_triggers({trigger_id})
+
+    def discard_triggers(self, trigger_ids: set):
+        for key in [key for key in self.expiries if key[0] in trigger_ids]:
+            del self.expiries[key]
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.expiries),
+            "heap_size": len(self.heap),
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+        }
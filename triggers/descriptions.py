@@ -9,13 +9,18 @@ desc = dict_to_simple_namespace({
         "edit": "Edit an existing trigger",
         "remove": "Remove an existing trigger",
         "setglobal": "Manage global values for optional properties",
-        "reset": "Reset a trigger's optional properties to their default values"
+        "reset": "Reset a trigger's optional properties to their default values",
+        "set": "Set optional properties of several triggers at once",
+        "test": "Show which triggers would respond to a message, without sending anything",
+        "export": "Export all triggers and global values to a file",
+        "import_": "Import triggers and global values from an exported file"
     },
     "argument": {
         "mode": "The matching logic to use",
         "pattern": "The pattern to match",
         "response": "The response to send",
         "cooldown": "The cooldown in seconds",
+        "cooldown_scope": "Whether the cooldown applies to the whole server, to each channel or to each user",
         "case_sensitive": "Whether the pattern should be case sensitive",
         "avoid_links": "Whether the trigger should avoid searching inside links",
         "avoid_emotes": "Whether the trigger should avoid searching inside emotes",
@@ -29,11 +34,23 @@ desc = dict_to_simple_namespace({
             "new_id": "The new ID (position) of the trigger"
         },
         "remove": {
-            "id": "The ID of the trigger to remove"
+            "ids": "The IDs of the triggers to remove, such as `3` or `3-40,52`"
         },
         "reset": {
-            "id": "The ID of the trigger to whose property to reset",
+            "ids": "The IDs of the triggers whose property to reset, such as `3` or `3-40,52`",
             "property": "The property to reset"
+        },
+        "set": {
+            "ids": "The IDs of the triggers to change, such as `3` or `3-40,52`"
+        },
+        "test": {
+            "message": "The sample message to match against the triggers"
+        },
+        "export": {
+            "format": "The format of the file"
+        },
+        "import_": {
+            "file": "A `.jsonl` or `.csv` file created by `/triggers export`"
         }
     }
 })
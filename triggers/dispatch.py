@@ -0,0 +1,206 @@
+import time
+import asyncio
+import logging
+from itertools import count
+from collections import OrderedDict, deque
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+# responses a channel may receive per period, Discord allows about 5 messages every 5 seconds per channel
+CHANNEL_RATE = 5
+CHANNEL_PERIOD = 5.0
+
+# most responses waiting in a channel, the oldest ones are dropped once exceeded
+MAX_QUEUED_RESPONSES = 10
+
+# seconds after which a queued response is no longer relevant to the conversation and is dropped unsent
+RESPONSE_MAX_AGE = 15.0
+
+# seconds a channel's worker waits for new responses before exiting
+WORKER_IDLE_TIMEOUT = 30.0
+
+# number of most recent responses kept to compute the latency percentiles
+LATENCY_SAMPLE_SIZE = 1024
+
+
+class TokenBucket:
+    """
+    Allows `rate` sends per `period`, in bursts of at most `rate`.
+    """
+
+    def __init__(self, rate: int = CHANNEL_RATE, period: float = CHANNEL_PERIOD, clock=time.monotonic):
+        self.capacity = rate
+        self.refill_rate = rate / period
+        self.clock = clock
+
+        self.tokens = float(rate)
+        self.updated = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """
+        Returns the seconds to wait until a send is allowed.
+        """
+        self.refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.refill_rate
+
+    def take(self):
+        self.refill()
+        self.tokens -= 1
+
+    def block(self, seconds: float):
+        """
+        Allows no sends for the given seconds, after Discord reported the channel as rate limited.
+        """
+        self.refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.refill_rate)
+
+
+class ChannelQueue:
+    def __init__(self, channel):
+        self.channel = channel
+        self.bucket = TokenBucket()
+
+        # key -> (content, time queued), in sending order
+        self.pending = OrderedDict()
+        self.wakeup = asyncio.Event()
+        self.worker = None
+
+
+class ResponseDispatcher:
+    """
+    Sends the trigger responses from one background worker per active channel, so that handling messages never
+    waits on Discord. Each channel has its own token bucket, and under overload its queued responses are
+    coalesced per trigger, the oldest are dropped and the stale ones are never sent.
+    """
+
+    def __init__(self, max_queued: int = MAX_QUEUED_RESPONSES, max_age: float = RESPONSE_MAX_AGE):
+        self.max_queued = max_queued
+        self.max_age = max_age
+
+        self.queues = {}  # channel ID -> ChannelQueue
+        self.keys = count()  # for the responses which are never coalesced
+
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.stale = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLE_SIZE)
+
+    @property
+    def queue_depth(self):
+        return sum(len(queue.pending) for queue in self.queues.values())
+
+    def submit(self, channel, content: str, key=None):
+        """
+        Queues a response for the channel without waiting for it to be sent.
+        A response with the same key as one still waiting in the channel replaces it, keeping its place.
+        """
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = ChannelQueue(channel)
+
+        if key is None:
+            key = ("unique", next(self.keys))
+        elif key in queue.pending:
+            self.coalesced += 1
+
+        queue.pending[key] = (content, time.monotonic())
+        while len(queue.pending) > self.max_queued:
+            queue.pending.popitem(last=False)
+            self.dropped += 1
+
+        if queue.worker is None:
+            queue.worker = asyncio.ensure_future(self.work(queue))
+
+        queue.wakeup.set()
+
+    async def stop(self):
+        """
+        Stops the workers, dropping the responses which were not sent yet.
+        """
+        workers = [queue.worker for queue in self.queues.values() if queue.worker is not None]
+        for worker in workers:
+            worker.cancel()
+
+        await asyncio.gather(*workers, return_exceptions=True)
+        self.queues.clear()
+
+    async def work(self, queue: ChannelQueue):
+        try:
+            while True:
+                if not queue.pending:
+                    queue.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(queue.wakeup.wait(), WORKER_IDLE_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        if not queue.pending:
+                            break
+
+                    continue
+
+                delay = queue.bucket.delay()
+                if delay:
+                    await asyncio.sleep(delay)
+                    continue
+
+                key, (content, queued) = queue.pending.popitem(last=False)
+                if time.monotonic() - queued > self.max_age:
+                    self.stale += 1
+                    continue
+
+                queue.bucket.take()
+                await self.send(queue, key, content, queued)
+        finally:
+            if self.queues.get(queue.channel.id) is queue:
+                del self.queues[queue.channel.id]
+
+    async def send(self, queue: ChannelQueue, key, content: str, queued: float):
+        try:
+            await queue.channel.send(content)
+        except discord.RateLimited as e:
+            # only raised for rate limits longer than the client's `max_ratelimit_timeout`, the library waiting out
+            # the shorter ones, so the response is sent again once the channel is available, unless it became stale
+            # or was replaced in the meantime
+            queue.bucket.block(e.retry_after)
+            if key not in queue.pending:
+                queue.pending[key] = (content, queued)
+                queue.pending.move_to_end(key, last=False)
+
+            return
+        except discord.HTTPException as e:
+            self.failures += 1
+            logger.warning("Failed to send a response to channel %d: %s", queue.channel.id, e)
+            return
+        except Exception:
+            self.failures += 1
+            logger.exception("Failed to send a response to channel %d", queue.channel.id)
+            return
+
+        self.sent += 1
+        self.latencies.append(time.monotonic() - queued)
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        stats = {
+            "queue_depth": self.queue_depth,
+            "channels": len(self.queues),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "stale": self.stale,
+            "failures": self.failures,
+        }
+
+        for name, fraction in [("p50_latency", 0.5), ("p99_latency", 0.99)]:
+            stats[name] = latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] if latencies else 0.0
+
+        return stats
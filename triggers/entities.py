@@ -3,6 +3,9 @@ from cofdb import BaseModel
 
 
 class TriggerEntity(BaseModel):
+    # the guild owning the trigger, indexed as the leading column of the ordering index
+    guild_id = BigIntegerField(null=True)
+
     # mandatory fields
     mode = TextField()
     user_pattern = TextField()
@@ -10,6 +13,7 @@ class TriggerEntity(BaseModel):
 
     # optional fields (with global defaults)
     cooldown = IntegerField(null=True)
+    cooldown_scope = TextField(null=True)
     case_sensitive = BooleanField(null=True)
     avoid_links = BooleanField(null=True)
     avoid_emotes = BooleanField(null=True)
@@ -25,10 +29,20 @@ class TriggerEntity(BaseModel):
     # self-managed fields
     position = IntegerField()
     last_triggered = DateTimeField(null=True)
+    disabled = BooleanField(default=False)
+
+    class Meta:
+        # a guild's triggers are always loaded in order
+        indexes = (
+            (("guild_id", "position"), False),
+        )
 
 
 class TriggerSettingsEntity(BaseModel):
+    guild_id = BigIntegerField(null=True, unique=True)
+
     cooldown = IntegerField(default=0)
+    cooldown_scope = TextField(default="trigger")
     case_sensitive = BooleanField(default=False)
     avoid_links = BooleanField(default=False)
     avoid_emotes = BooleanField(default=False)
@@ -0,0 +1,412 @@
+import re
+import asyncio
+import logging
+from collections import OrderedDict
+
+from peewee import fn
+
+from .entities import TriggerEntity, TriggerSettingsEntity
+from .compiled import CompiledTrigger, INHERITED_FIELDS, compute_regex_pattern
+from .matching import TriggerMatcher
+from .ordering import OrderedTriggers, POSITION_GAP
+from cofdb import db, bulk_update_field, async_db
+
+logger = logging.getLogger(__name__)
+
+# budgets of the guild cache, the least recently used guilds are evicted once either one is exceeded
+MAX_CACHED_GUILDS = 1000
+MAX_CACHED_TRIGGERS = 100_000
+
+
+class GuildTriggers:
+    """
+    The compiled triggers and global settings of a single guild, along with their matching engine.
+    """
+
+    def __init__(self, guild_id: int):
+        """
+        Loads the guild's triggers. Blocking, meant to be run on the database thread.
+        """
+        self.guild_id = guild_id
+
+        self.globals, _ = TriggerSettingsEntity.get_or_create(guild_id=guild_id)
+
+        entities = TriggerEntity.select() \
+            .where(TriggerEntity.guild_id == guild_id) \
+            .order_by(TriggerEntity.position, TriggerEntity.id)
+
+        # trigger id -> when it last sent a response, the only trigger state changed by messages
+        self.last_triggered = {}
+
+        # ids of the stored triggers which no longer compile, left as they are in the database
+        self.invalid = []
+
+        triggers = []
+        stale = {}
+        for entity in entities:
+            # the patterns of triggers inheriting `case_sensitive` were not recomputed by older global changes
+            pattern = self.inherited_pattern(entity)
+            if pattern != entity.regex_pattern:
+                entity.regex_pattern = pattern
+                stale[entity.id] = pattern
+
+            try:
+                triggers.append(self.check(CompiledTrigger.from_entity(entity, self.globals)))
+            except (re.error, RecursionError, ValueError) as e:
+                # such as a pattern rejected by a newer Python, which must not prevent the guild from loading
+                logger.warning("Skipping trigger %d of guild %d, which no longer compiles: %s", entity.id, guild_id, e)
+                self.invalid.append(entity.id)
+                stale.pop(entity.id, None)
+                continue
+
+            if entity.last_triggered is not None:
+                self.last_triggered[entity.id] = entity.last_triggered
+
+        if stale:
+            bulk_update_field(TriggerEntity, TriggerEntity.regex_pattern, stale)
+
+        # positions are sparse keys which only determine the order, the IDs shown to users are the ranks
+        if any(previous.position >= current.position for previous, current in zip(triggers, triggers[1:])):
+            positions = {trigger.id: rank * POSITION_GAP for rank, trigger in enumerate(triggers)}
+            bulk_update_field(TriggerEntity, TriggerEntity.position, positions)
+            triggers = [trigger.replace(self.globals, position=positions[trigger.id]) for trigger in triggers]
+
+        self.set_triggers(triggers)
+
+        # bumped whenever the triggers change, to know when derived data is stale
+        self.version = 0
+        self.snapshot = None
+        self.snapshot_version = None
+        self.ranks = None
+        self.ranks_version = None
+
+    def __len__(self):
+        return len(self.triggers)
+
+    def set_triggers(self, triggers):
+        self.triggers = OrderedTriggers(triggers)
+        self.matcher = TriggerMatcher(trigger for trigger in triggers if not trigger.disabled)
+
+        # global setting -> ids of the triggers inheriting it
+        self.dependents = {name: set() for name in INHERITED_FIELDS}
+        for trigger in triggers:
+            self.track(trigger)
+
+    def track(self, trigger: CompiledTrigger):
+        for name in trigger.inherited:
+            self.dependents[name].add(trigger.id)
+
+    def untrack(self, trigger: CompiledTrigger):
+        for name in trigger.inherited:
+            self.dependents[name].discard(trigger.id)
+
+    def touch(self):
+        self.version += 1
+
+    def get_snapshot(self) -> tuple:
+        """
+        Returns an immutable, ordered view of the triggers, shared until they change.
+        """
+        if self.snapshot_version != self.version:
+            self.snapshot = tuple(self.triggers)
+            self.snapshot_version = self.version
+
+        return self.snapshot
+
+    def get_ranks(self) -> dict:
+        """
+        Returns the rank of each trigger by id, the IDs shown to users being the ranks plus one, shared until the
+        triggers change. A trigger removed in the meantime has no rank.
+        """
+        if self.ranks_version != self.version:
+            self.ranks = {trigger.id: rank for rank, trigger in enumerate(self.get_snapshot())}
+            self.ranks_version = self.version
+
+        return self.ranks
+
+    def compile(self, fields: dict) -> CompiledTrigger:
+        return self.check(CompiledTrigger(fields, self.globals))
+
+    @staticmethod
+    def check(trigger: CompiledTrigger) -> CompiledTrigger:
+        """
+        Builds the matcher entry of the trigger, so that a trigger which cannot be added fails before being saved.
+        """
+        TriggerMatcher.index_entry(trigger)
+        return trigger
+
+    def add(self, trigger: CompiledTrigger):
+        self.triggers.add(trigger)
+        self.track(trigger)
+        if not trigger.disabled:
+            self.matcher.add(trigger)
+
+        self.touch()
+
+    def remove_many(self, triggers):
+        """
+        Removes several triggers, rebuilding the order and the matcher once.
+        """
+        ids = {trigger.id for trigger in triggers}
+        self.set_triggers([trigger for trigger in self.triggers if trigger.id not in ids])
+
+        for trigger_id in ids:
+            self.last_triggered.pop(trigger_id, None)
+
+        self.touch()
+
+    def replace_many(self, replacements):
+        """
+        Swaps several triggers for their new versions, given as `(trigger, new_trigger)` pairs keeping the same
+        positions, all at once. The matcher is rebuilt once if any of them is matched differently, otherwise the
+        records are swapped in place.
+        """
+        if any(
+            new_trigger.pattern is not trigger.pattern or new_trigger.disabled != trigger.disabled
+            for trigger, new_trigger in replacements
+        ):
+            new_triggers = {trigger.id: new_trigger for trigger, new_trigger in replacements}
+            self.set_triggers([new_triggers.get(trigger.id, trigger) for trigger in self.triggers])
+        else:
+            for trigger, new_trigger in replacements:
+                self.triggers.replace(trigger, new_trigger)
+                self.untrack(trigger)
+                self.track(new_trigger)
+                if not new_trigger.disabled:
+                    self.matcher.swap(new_trigger)
+
+        self.touch()
+
+    def replace(self, trigger: CompiledTrigger, new_trigger: CompiledTrigger):
+        if new_trigger.position == trigger.position:
+            self.triggers.replace(trigger, new_trigger)
+        else:
+            self.triggers.remove(trigger)
+            self.triggers.add(new_trigger)
+
+        self.untrack(trigger)
+        self.track(new_trigger)
+        self.matcher.remove(trigger)
+        if not new_trigger.disabled:
+            self.matcher.add(new_trigger)
+
+        self.touch()
+
+    def add_many(self, triggers, replacements=()):
+        """
+        Adds triggers placed after the existing ones, along with the replacements of existing triggers given by
+        `recompile_dependents`, rebuilding the order and the matcher once.
+        """
+        new_triggers = {trigger.id: new_trigger for trigger, new_trigger in replacements}
+        existing = [new_triggers.get(trigger.id, trigger) for trigger in self.triggers]
+
+        self.set_triggers(existing + list(triggers))
+        self.touch()
+
+    def recompile_dependents(self, names, settings=None) -> list:
+        """
+        Resolves again the triggers inheriting any of the given global settings, against the given values (by default
+        the guild's own), returning `(trigger, new_trigger)` pairs to be applied with `replace_many` or `add_many`.
+        The other triggers are not affected, and nothing is changed until the pairs are applied.
+        """
+        settings = settings if settings is not None else self.globals
+
+        ids = set()
+        for name in names:
+            ids |= self.dependents[name]
+
+        replacements = []
+        for trigger in self.triggers:
+            if trigger.id not in ids:
+                continue
+
+            changes = {}
+            if "case_sensitive" in names:
+                changes["regex_pattern"] = self.inherited_pattern(trigger, settings)
+
+            replacements.append((trigger, trigger.replace(settings, **changes)))
+
+        return replacements
+
+    def inherited_pattern(self, trigger: CompiledTrigger, settings=None) -> str:
+        """
+        Returns the pattern source of the trigger, compiled or stored, resolving an inherited `case_sensitive` against
+        the given settings.
+        """
+        if trigger.case_sensitive is not None:
+            return trigger.regex_pattern
+
+        settings = settings if settings is not None else self.globals
+        return compute_regex_pattern(
+            trigger.mode, trigger.user_pattern, None, trigger.start, trigger.end, settings.case_sensitive
+        )
+
+    def next_position(self):
+        return self.triggers[-1].position + POSITION_GAP if self.triggers else 0
+
+    @staticmethod
+    def position_between(before, after):
+        """
+        Returns a position key between the given ones (`None` meaning no bound), or `None` if there is no room left.
+        """
+        if before is None:
+            return 0 if after is None else after - POSITION_GAP
+
+        if after is None:
+            return before + POSITION_GAP
+
+        return (before + after) // 2 if after - before > 1 else None
+
+    def plan_move(self, trigger: CompiledTrigger, rank: int):
+        """
+        Returns the position key which moves the trigger to the given rank, only changing its own key unless the
+        neighbouring keys are too close. The other triggers then need to be renumbered, and their new positions
+        are returned as well, to be persisted along with the moved trigger before calling `set_positions`.
+        """
+        current = self.triggers.index(trigger)
+
+        def other_position(other_rank):
+            # ranks of the other triggers, once the moved one is taken out
+            return self.triggers[other_rank if other_rank < current else other_rank + 1].position
+
+        before = other_position(rank - 1) if rank > 0 else None
+        after = other_position(rank) if rank < len(self.triggers) - 1 else None
+
+        position = self.position_between(before, after)
+        if position is not None:
+            return position, {}
+
+        order = [other for other in self.triggers if other.id != trigger.id]
+        order.insert(rank, trigger)
+        positions = {other.id: other_rank * POSITION_GAP for other_rank, other in enumerate(order)}
+
+        return positions.pop(trigger.id), positions
+
+    def set_positions(self, positions: dict):
+        """
+        Applies renumbered position keys, given by trigger id.
+        """
+        self.set_triggers([
+            trigger.replace(self.globals, position=positions[trigger.id]) if trigger.id in positions else trigger
+            for trigger in self.triggers
+        ])
+        self.touch()
+
+
+def count_unassigned() -> int:
+    """
+    Counts the triggers and global settings stored before guilds were told apart, which no guild loads until they
+    are adopted. Blocking, meant to be run on the database thread.
+    """
+    return TriggerEntity.select().where(TriggerEntity.guild_id.is_null()).count() \
+        + TriggerSettingsEntity.select().where(TriggerSettingsEntity.guild_id.is_null()).count()
+
+
+def adopt_unassigned(guild_id: int) -> tuple:
+    """
+    Assigns the triggers and global settings stored before guilds were told apart to the given guild, returning
+    the number of adopted triggers and whether the settings were adopted too. The adopted triggers are placed
+    after the guild's own ones, and the guild keeps its settings if it already has some, the adopted triggers
+    then inheriting them once loaded. Blocking, meant to be run on the database thread.
+    """
+    with db.atomic():
+        settings = TriggerSettingsEntity.get_or_none(TriggerSettingsEntity.guild_id == guild_id)
+        legacy_settings = TriggerSettingsEntity.get_or_none(TriggerSettingsEntity.guild_id.is_null())
+
+        adopt_settings = settings is None and legacy_settings is not None
+        if adopt_settings:
+            legacy_settings.guild_id = guild_id
+            legacy_settings.save()
+
+        last = TriggerEntity.select(fn.MAX(TriggerEntity.position)).where(TriggerEntity.guild_id == guild_id).scalar()
+        offset = 0 if last is None else last + POSITION_GAP
+
+        adopted = TriggerEntity.update(guild_id=guild_id, position=TriggerEntity.position + offset) \
+            .where(TriggerEntity.guild_id.is_null()) \
+            .execute()
+
+    return adopted, adopt_settings
+
+
+class GuildTriggerCache:
+    """
+    Loads the trigger set of a guild when it is first needed and keeps the most recently used ones in memory,
+    within a budget of guilds and triggers.
+    """
+
+    def __init__(self, max_guilds: int = MAX_CACHED_GUILDS, max_triggers: int = MAX_CACHED_TRIGGERS, on_load=None):
+        self.max_guilds = max_guilds
+        self.max_triggers = max_triggers
+
+        # called with each newly loaded guild
+        self.on_load = on_load
+        self.guilds = OrderedDict()
+
+        # guild id -> task loading its triggers, shared by everyone asking for the guild in the meantime
+        self.loading = {}
+
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.guilds)
+
+    def __contains__(self, guild_id):
+        return guild_id in self.guilds
+
+    async def get(self, guild_id: int) -> GuildTriggers:
+        guild_triggers = self.guilds.get(guild_id)
+
+        if guild_triggers is not None:
+            self.guilds.move_to_end(guild_id)
+            return guild_triggers
+
+        task = self.loading.get(guild_id)
+        if task is None:
+            task = self.loading[guild_id] = asyncio.ensure_future(self.load(guild_id))
+
+        # a cancelled caller must not cancel the load the other callers are waiting for
+        return await asyncio.shield(task)
+
+    async def load(self, guild_id: int) -> GuildTriggers:
+        try:
+            guild_triggers = await async_db.run(GuildTriggers, guild_id)
+        finally:
+            del self.loading[guild_id]
+
+        self.guilds[guild_id] = guild_triggers
+        self.loads += 1
+        self.trim()
+
+        if self.on_load is not None:
+            self.on_load(guild_triggers)
+
+        return guild_triggers
+
+    def evict(self, guild_id: int):
+        if self.guilds.pop(guild_id, None) is not None:
+            self.evictions += 1
+
+    def trigger_count(self):
+        return sum(len(guild_triggers) for guild_triggers in self.guilds.values())
+
+    def stats(self) -> dict:
+        return {
+            "guilds": len(self.guilds),
+            "triggers": self.trigger_count(),
+            "loading": len(self.loading),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "invalid_triggers": sum(len(guild_triggers.invalid) for guild_triggers in self.guilds.values()),
+        }
+
+    def trim(self):
+        """
+        Evicts the least recently used guilds until the cache fits its budget, always keeping the most recent one.
+        """
+        trigger_count = self.trigger_count()
+
+        while len(self.guilds) > 1 and (len(self.guilds) > self.max_guilds or trigger_count > self.max_triggers):
+            _, guild_triggers = self.guilds.popitem(last=False)
+            trigger_count -= len(guild_triggers)
+            self.evictions += 1
@@ -5,6 +5,25 @@ BLANK = "\u200b"
 USE_LEGACY_INLINE_SPLITS = True
 
 
+class HelpPagesCache:
+    """
+    The help pages are static, so they are built once and shared by every paginator.
+    Paginators only read their pages, which must not be modified after being built.
+    """
+
+    def __init__(self):
+        self.pages = None
+
+    def build(self):
+        self.pages = tuple(get())
+
+    def get(self):
+        if self.pages is None:
+            self.build()
+
+        return list(self.pages)
+
+
 def get():
     embed_infos = [
         get_preface(),
@@ -17,6 +36,10 @@ def get():
         get_command_remove(),
         get_command_setglobal(),
         get_command_reset(),
+        get_command_set(),
+        get_command_test(),
+        get_command_export(),
+        get_command_import(),
         get_property_mode_1(),
         get_property_mode_2(),
         get_property_response_1(),
@@ -113,7 +136,11 @@ def get_commands():
             ("`/triggers edit`", desc.command.edit),
             ("`/triggers remove`", desc.command.remove),
             ("`/triggers setglobal`", desc.command.setglobal),
-            ("`/triggers reset`", desc.command.reset)
+            ("`/triggers reset`", desc.command.reset),
+            ("`/triggers set`", desc.command.set),
+            ("`/triggers test`", desc.command.test),
+            ("`/triggers export`", desc.command.export),
+            ("`/triggers import`", desc.command.import_)
         ]
     )
 
@@ -213,6 +240,12 @@ def get_command_add_2():
                 "trigger if they are sent within the cooldown period.\n"
                 "Defaults to its global value."
             ),
+            (
+                "[_Optional_] `cooldown_scope`",
+                "What the cooldown applies to. One of `trigger` (the whole server), `channel` (each channel "
+                "separately) or `user` (each user separately).\n"
+                "Defaults to its global value."
+            ),
             (
                 "[_Optional_] `case_sensitive`",
                 "Whether to treat uppercase and lowercase letters the same. If set to `false`, the bot "
@@ -284,21 +317,21 @@ def get_command_remove():
 
     embed.add_field(
         inline=False, name="✏️ Usage",
-        value="`/triggers remove <id>`"
+        value="`/triggers remove <ids>`"
     )
     embed.add_field(
         inline=False, name="📄 Description", value=(
-            "This command allows you to remove an existing trigger.\n"
+            "This command allows you to remove one or more existing triggers.\n"
             "\n"
-            "The trigger will be removed immediately."
+            "The triggers will be removed immediately."
         )
     )
     add_split_fields(
         embed, ["🔣 Argument", "📄 Description"], "🔣 Arguments", [
             (
-                "[**Required**] `id`",
-                "The ID of the trigger to remove. You can view each trigger's ID "
-                "using the `/triggers list` command."
+                "[**Required**] `ids`",
+                "The IDs of the triggers to remove, separated by commas, where `3-40` stands for all the IDs "
+                "from `3` to `40`. You can view each trigger's ID using the `/triggers list` command."
             )
         ]
     )
@@ -327,6 +360,10 @@ def get_command_setglobal():
                 "`cooldown`",
                 "Defaults to `0`."
             ),
+            (
+                "`cooldown_scope`",
+                "Defaults to `trigger`."
+            ),
             (
                 "`case_sensitive`",
                 "Defaults to `false`."
@@ -350,24 +387,26 @@ def get_command_reset():
 
     embed.add_field(
         inline=False, name="✏️ Usage",
-        value="`/triggers reset <id> <property>`"
+        value="`/triggers reset <ids> <property>`"
     )
     embed.add_field(
         inline=False, name="📄 Description", value=(
-            "This command allows you to reset a trigger's optional property to its global value, "
+            "This command allows you to reset an optional property of one or more triggers to its global value, "
             "as set by the `/triggers setglobal` command.\n"
         )
     )
     add_split_fields(
         embed, ["🔣 Argument", "📄 Description"], "🔣 Arguments", [
             (
-                "[**Required**] `id`",
-                "The ID of the trigger whose property should be reset. You can view each trigger's ID "
+                "[**Required**] `ids`",
+                "The IDs of the triggers whose property should be reset, separated by commas, where `3-40` "
+                "stands for all the IDs from `3` to `40`. You can view each trigger's ID "
                 "using the `/triggers list` command."
             ),
             (
                 "[**Required**] `property`",
-                "The property to reset. One of `cooldown`, `case_sensitive`, `avoid_links`, `avoid_emotes`."
+                "The property to reset. One of `cooldown`, `cooldown_scope`, `case_sensitive`, `avoid_links`, "
+                "`avoid_emotes`."
             )
         ]
     )
@@ -375,6 +414,120 @@ def get_command_reset():
     return embed, "Command: `reset`", "Command: reset"
 
 
+def get_command_set():
+    embed = discord.Embed()
+
+    embed.add_field(
+        inline=False, name="✏️ Usage",
+        value="`/triggers set <ids> [options]`"
+    )
+    embed.add_field(
+        inline=False, name="📄 Description", value=(
+            "This command allows you to set optional properties of one or more triggers at once.\n"
+            "\n"
+            "Only the given properties are changed. Use the `/triggers reset` command to go back to the "
+            "global values."
+        )
+    )
+    add_split_fields(
+        embed, ["🔣 Argument", "📄 Description"], "🔣 Arguments", [
+            (
+                "[**Required**] `ids`",
+                "The IDs of the triggers to change, separated by commas, where `3-40` stands for all the IDs "
+                "from `3` to `40`."
+            ),
+            (
+                "[_Optional_] `cooldown`, `cooldown_scope`, `case_sensitive`, `avoid_links`, `avoid_emotes`",
+                "The same as for the `/triggers add` command."
+            )
+        ]
+    )
+
+    return embed, "Command: `set`", "Command: set"
+
+
+def get_command_test():
+    embed = discord.Embed()
+
+    embed.add_field(
+        inline=False, name="✏️ Usage",
+        value="`/triggers test <message>`"
+    )
+    embed.add_field(
+        inline=False, name="📄 Description", value=(
+            "This command allows you to check how the triggers react to a message, without sending any response "
+            "or starting any cooldown.\n"
+            "\n"
+            "It lists every trigger that matches, the one that would respond, the matches ignored for being inside "
+            "a link or an emote, and the time each pattern took."
+        )
+    )
+    add_split_fields(
+        embed, ["🔣 Argument", "📄 Description"], "🔣 Arguments", [
+            (
+                "[**Required**] `message`",
+                "The sample message, matched exactly as if it had been sent in this channel."
+            )
+        ]
+    )
+
+    return embed, "Command: `test`", "Command: test"
+
+
+def get_command_export():
+    embed = discord.Embed()
+
+    embed.add_field(
+        inline=False, name="✏️ Usage",
+        value="`/triggers export [format]`"
+    )
+    embed.add_field(
+        inline=False, name="📄 Description", value=(
+            "This command allows you to download all triggers, in order, along with the global values.\n"
+            "\n"
+            "The file can be imported in another server using the `/triggers import` command."
+        )
+    )
+    add_split_fields(
+        embed, ["🔣 Argument", "📄 Description"], "🔣 Arguments", [
+            (
+                "[_Optional_] `format`",
+                "Either `jsonl`, with one JSON object per line, or `csv`. Defaults to `jsonl`."
+            )
+        ]
+    )
+
+    return embed, "Command: `export`", "Command: export"
+
+
+def get_command_import():
+    embed = discord.Embed()
+
+    embed.add_field(
+        inline=False, name="✏️ Usage",
+        value="`/triggers import <file>`"
+    )
+    embed.add_field(
+        inline=False, name="📄 Description", value=(
+            "This command allows you to add all the triggers of a file created by the `/triggers export` command, "
+            "after the existing ones. The global values of the file, if any, replace the current ones.\n"
+            "\n"
+            "Nothing is imported if any line of the file is invalid."
+        )
+    )
+    add_split_fields(
+        embed, ["🔣 Argument", "📄 Description"], "🔣 Arguments", [
+            (
+                "[**Required**] `file`",
+                "A `.jsonl` or `.csv` file. Each line holds either the global values, with `kind` set to "
+                "`settings`, or a trigger, with the same properties as the `/triggers add` command."
+            )
+        ]
+    )
+
+    return embed, "Command: `import`", "Command: import"
+
+
 def get_property_mode_1():
     embed = discord.Embed()
 
@@ -0,0 +1,35 @@
+import discord
+
+import utils
+
+TRIGGERS_PER_PAGE = 10
+MAX_PATTERN_LENGTH = 50
+
+
+class TriggerListSource(utils.PageSource):
+    """
+    Renders the pages of `/triggers list` from a snapshot of a guild's triggers, one page at a time.
+    """
+
+    def __init__(self, snapshot: tuple):
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return (len(self.snapshot) + TRIGGERS_PER_PAGE - 1) // TRIGGERS_PER_PAGE
+
+    def get_page(self, index: int) -> discord.Embed:
+        embed = discord.Embed(title="Triggers", description="_List of all available triggers_")
+
+        start = index * TRIGGERS_PER_PAGE
+        for position, trigger in enumerate(self.snapshot[start:start + TRIGGERS_PER_PAGE], start):
+            pattern = discord.utils.escape_mentions(trigger.user_pattern)
+            if len(pattern) > MAX_PATTERN_LENGTH:
+                pattern = pattern[:MAX_PATTERN_LENGTH] + "..."
+
+            embed.add_field(
+                name=f"{position + 1}. `{pattern}`",
+                value=f"Mode: **{trigger.mode}**" + (" (⛔ disabled)" if trigger.disabled else ""),
+                inline=False
+            )
+
+        return embed
@@ -0,0 +1,531 @@
+import re
+import time
+from collections import deque
+from typing import Optional
+
+from .ordering import position_of
+from .sandbox import SandboxTimeout
+from .patterns import PATTERNS, LEADING_FLAGS_REGEX
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # python < 3.11
+    import sre_parse
+    import sre_constants
+
+# maximum number of regex triggers folded into a single alternation
+REGEX_CHUNK_SIZE = 32
+
+# shortest required literal worth indexing for a regex trigger
+MIN_LITERAL_LENGTH = 2
+
+# global flags which can be scoped to a single alternative without changing how the others are parsed
+SCOPABLE_FLAGS = frozenset("ims")
+
+# characters which python's case-insensitive matching considers equal to an ascii letter,
+# but which do not lowercase to it
+ASCII_FOLD_FIXES = str.maketrans({"İ": "i", "ı": "i", "ſ": "s"})
+
+
+def fold_ascii(text: str) -> str:
+    return text.translate(ASCII_FOLD_FIXES).lower()
+
+
+def required_literal(pattern: re.Pattern) -> Optional[str]:
+    """
+    Returns the longest literal that any match of the pattern must contain, folded if the pattern
+    is case-insensitive, or `None` if no usable literal could be extracted.
+    """
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except (re.error, RecursionError):
+        return None
+
+    folded = bool(pattern.flags & re.IGNORECASE)
+    runs = []
+    collect_literal_runs(parsed, runs)
+
+    best = None
+    for run in runs:
+        if folded:
+            if not run.isascii():
+                continue
+
+            run = fold_ascii(run)
+
+        if len(run) >= MIN_LITERAL_LENGTH and (best is None or len(run) > len(best)):
+            best = run
+
+    return best
+
+
+def collect_literal_runs(items, runs, run=""):
+    """
+    Walks a required sequence of parsed regex items, appending every contiguous literal run to `runs`.
+    Returns the run still open at the end of the sequence, so groups can extend the enclosing one.
+    """
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run += chr(av)
+        elif op is sre_constants.AT:
+            continue  # anchors do not consume characters
+        elif op is sre_constants.SUBPATTERN and not av[1] and not av[2]:
+            # a group without scoped flags is simply part of the sequence
+            run = collect_literal_runs(av[-1], runs, run)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+            # the first repetition is required, but nothing after it is adjacent
+            run = collect_literal_runs(av[2], runs, run)
+            runs.append(run)
+            run = ""
+        else:
+            runs.append(run)
+            run = ""
+
+    runs.append(run)
+    return run
+
+
+class AhoCorasick:
+    """
+    Multi-literal automaton, reporting every key present in a text with a single scan.
+    """
+
+    def __init__(self, keys=()):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+
+        for key in keys:
+            self.add(key)
+
+        self.build()
+
+    def add(self, key: str):
+        node = 0
+        for char in key:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+
+            node = next_node
+
+        self.out[node] = self.out[node] + (key,)
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+
+                fallback = self.goto[state].get(char, 0)
+                self.fail[child] = fallback if fallback != child else 0
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def search(self, text: str) -> set:
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set()
+        node = 0
+
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.update(out[node])
+
+        return found
+
+
+class MessageSearch:
+    """
+    Searches a single message for many triggers, running each distinct pattern only once and sharing its match
+    between the triggers using it. Optionally keeps the seconds each pattern took.
+    """
+
+    __slots__ = ("content", "folded", "matches", "times", "searches")
+
+    def __init__(self, content: str, folded: str, timed: bool = False):
+        self.content = content
+        self.folded = folded
+
+        self.matches = {}  # search key -> match
+        self.times = {} if timed else None  # search key -> seconds
+        self.searches = 0
+
+    @staticmethod
+    def key_of(trigger):
+        # a pre-folded pattern may be the very object another trigger searches in the original text
+        if trigger.folded_pattern is None:
+            return trigger.pattern, False
+
+        return trigger.folded_pattern, True
+
+    def __contains__(self, trigger):
+        return self.key_of(trigger) in self.matches
+
+    def search(self, trigger):
+        self.searches += 1
+
+        key = self.key_of(trigger)
+        try:
+            return self.matches[key]
+        except KeyError:
+            pass
+
+        if self.times is None:
+            match = self.matches[key] = trigger.search(self.content, self.folded)
+            return match
+
+        start = time.perf_counter()
+        match = self.matches[key] = trigger.search(self.content, self.folded)
+        self.times[key] = time.perf_counter() - start
+        return match
+
+    def match_of(self, trigger):
+        return self.matches[self.key_of(trigger)]
+
+    def time_of(self, trigger) -> float:
+        return self.times[self.key_of(trigger)]
+
+    async def search_sandboxed(self, triggers: list, sandbox):
+        """
+        Searches the distinct patterns of the given `regex` triggers which were not searched yet with the sandbox,
+        their matches being then returned by `match_of`. Raises `SandboxTimeout` with the offending trigger, if any.
+        """
+        self.searches += len(triggers)
+
+        patterns = list(dict.fromkeys(trigger.pattern for trigger in triggers if trigger not in self))
+        if not patterns:
+            return
+
+        try:
+            results = await sandbox.search_many(patterns, self.content, timed=self.times is not None)
+        except SandboxTimeout as e:
+            e.trigger = None if e.index is None else \
+                next(trigger for trigger in triggers if trigger.pattern == patterns[e.index])
+            raise
+
+        for pattern, result in zip(patterns, results):
+            key = pattern, False
+            if self.times is None:
+                self.matches[key] = result
+            else:
+                self.matches[key], self.times[key] = result
+
+    def close(self):
+        PATTERNS.count_searches(self.searches, len(self.matches))
+
+
+class TriggerMatcher:
+    """
+    Combined matching engine over a whole trigger set.
+
+    Literal triggers (`plain`, `word` and `full`) are indexed by their pattern in an Aho-Corasick automaton,
+    as are `regex` triggers with a required literal. The remaining `regex` triggers are folded into grouped
+    alternations. A single pass over the message yields the candidate triggers, which are then confirmed in
+    position order using their own patterns, so the first valid match is the same one the triggers would
+    produce if they were tried one by one.
+
+    The message is folded once, for both the case-insensitive index and the case-insensitive literal triggers,
+    which are confirmed with their pre-folded patterns instead of matching case-insensitively one by one.
+    The candidates sharing a pattern are confirmed with a single search.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = {}  # trigger id -> compiled trigger
+
+        # literal index, one automaton for the original text and one for the folded text
+        self.literal_keys = {False: {}, True: {}}  # folded -> key -> set of trigger ids
+        self.automata = {False: None, True: None}
+
+        # regex chunks, each one a list of trigger ids and the combined pattern
+        self.chunks = []
+        self.chunk_of = {}
+        self.alternatives = {}  # trigger id -> its part of the combined pattern
+
+        # triggers which are always candidates (empty or unindexable patterns)
+        self.unindexed = set()
+
+        # triggers confirmed against the folded message
+        self.folded_ids = set()
+
+        for trigger in entries:
+            self.add(trigger)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, trigger):
+        self.entries[trigger.id] = trigger
+
+        if trigger.folded_pattern is not None:
+            self.folded_ids.add(trigger.id)
+
+        kind, folded, key = self.index_entry(trigger)
+
+        if kind == "literal":
+            self.literal_keys[folded].setdefault(key, set()).add(trigger.id)
+            self.automata[folded] = None
+        elif kind == "regex":
+            self.add_regex(trigger.id, key)
+        else:
+            self.unindexed.add(trigger.id)
+
+    @classmethod
+    def index_entry(cls, trigger) -> tuple:
+        """
+        Returns how the trigger is indexed, as a `(kind, folded, key)` triple: `literal` with the key searched by the
+        automaton of the original or folded text, `regex` with its alternative in the combined patterns, or
+        `unindexed` if it is always a candidate. Cheap enough to be used to check a trigger before it is saved.
+        """
+        pattern = trigger.pattern
+        folded = bool(pattern.flags & re.IGNORECASE)
+
+        if trigger.mode == "regex":
+            key = required_literal(pattern)
+            if key is not None:
+                return "literal", folded, key
+
+            alternative = cls.to_alternative(pattern)
+            return ("unindexed", False, None) if alternative is None else ("regex", False, alternative)
+
+        key = str(trigger.user_pattern)
+        if folded:
+            if not key.isascii():
+                return "unindexed", False, None
+
+            key = fold_ascii(key)
+
+        if not key:
+            return "unindexed", False, None
+
+        return "literal", folded, key
+
+    def remove(self, trigger):
+        if self.entries.pop(trigger.id, None) is None:
+            return
+
+        self.unindexed.discard(trigger.id)
+        self.folded_ids.discard(trigger.id)
+        self.alternatives.pop(trigger.id, None)
+
+        chunk_index = self.chunk_of.pop(trigger.id, None)
+        if chunk_index is not None:
+            chunk = self.chunks[chunk_index]
+            chunk[0].remove(trigger.id)
+            chunk[1] = self.combine(chunk[0])
+            return
+
+        for folded, keys in self.literal_keys.items():
+            for key, ids in keys.items():
+                if trigger.id in ids:
+                    ids.discard(trigger.id)
+                    if not ids:
+                        del keys[key]
+                        self.automata[folded] = None
+
+                    return
+
+    def swap(self, trigger):
+        """
+        Replaces the record of an indexed trigger whose pattern did not change, leaving the index as it is.
+        """
+        assert self.entries[trigger.id].pattern is trigger.pattern, "The pattern must not change"
+        self.entries[trigger.id] = trigger
+
+    def add_regex(self, trigger_id, alternative: str):
+        self.alternatives[trigger_id] = alternative
+
+        for index, chunk in enumerate(self.chunks):
+            if len(chunk[0]) < REGEX_CHUNK_SIZE:
+                break
+        else:
+            index = len(self.chunks)
+            self.chunks.append([[], None])
+
+        chunk = self.chunks[index]
+        chunk[0].append(trigger_id)
+        chunk[1] = self.combine(chunk[0])
+        self.chunk_of[trigger_id] = index
+
+    def combine(self, trigger_ids):
+        if not trigger_ids:
+            return None
+
+        # the triggers sharing a pattern need a single alternative
+        alternatives = dict.fromkeys(self.alternatives[trigger_id] for trigger_id in trigger_ids)
+
+        try:
+            return re.compile("|".join(alternatives))
+        except (re.error, RecursionError):
+            return None  # every trigger of the chunk is then a candidate
+
+    @staticmethod
+    def to_alternative(pattern: re.Pattern):
+        """
+        Returns the pattern as one alternative of a combined pattern, its global flags being scoped to it, or `None`
+        if it cannot be combined with others.
+        """
+        # groups would be renumbered
+        if pattern.groups:
+            return None
+
+        source = pattern.pattern
+        flags = set()
+
+        match = LEADING_FLAGS_REGEX.match(source)
+        if match is not None:
+            flags.update(re.findall(r"[aiLmsux]", match.group()))
+            source = source[match.end():]
+
+        flags.discard("u")  # the default of text patterns
+        if not flags <= SCOPABLE_FLAGS:
+            return None
+
+        flags = "".join(sorted(flags))
+
+        # flags set anywhere else would leak into the other alternatives
+        if pattern.flags != re.compile(f"(?{flags})" if flags else "").flags:
+            return None
+
+        alternative = f"(?{flags}:{source})"
+        try:
+            re.compile(alternative)
+        except (re.error, RecursionError):
+            return None
+
+        return alternative
+
+    def get_automaton(self, folded: bool):
+        automaton = self.automata[folded]
+        if automaton is None:
+            automaton = self.automata[folded] = AhoCorasick(self.literal_keys[folded])
+
+        return automaton
+
+    def fold(self, content: str) -> str:
+        """
+        Returns the message folded by `fold_ascii`, unless no trigger needs it.
+        """
+        return fold_ascii(content) if self.literal_keys[True] or self.folded_ids else content
+
+    def candidates(self, content: str, folded: str, search_chunks: bool = True):
+        """
+        Returns the triggers which may match the message, in position order. Without `search_chunks`, the combined
+        regex patterns, which run user patterns, are not searched and all their triggers are candidates.
+        """
+        candidate_ids = set(self.unindexed)
+
+        for is_folded, keys in self.literal_keys.items():
+            if not keys:
+                continue
+
+            text = folded if is_folded else content
+            for key in self.get_automaton(is_folded).search(text):
+                candidate_ids.update(keys[key])
+
+        for trigger_ids, combined in self.chunks:
+            if not search_chunks or combined is None or combined.search(content):
+                candidate_ids.update(trigger_ids)
+
+        candidates = [self.entries[trigger_id] for trigger_id in candidate_ids]
+        candidates.sort(key=position_of)
+        return candidates
+
+    def find(self, content: str, is_valid):
+        """
+        Returns the `(trigger, match)` pair of the lowest positioned trigger whose match passes `is_valid`.
+        """
+        folded = self.fold(content)
+        search = MessageSearch(content, folded)
+
+        try:
+            for trigger in self.candidates(content, folded):
+                match = search.search(trigger)
+                if is_valid(match, trigger):
+                    return trigger, match
+
+            return None
+        finally:
+            search.close()
+
+    async def find_sandboxed(self, content: str, is_valid, sandbox):
+        """
+        Same as `find`, except that `regex` triggers are searched by the given `RegexSandbox`.
+        Literal triggers are still searched inline, and only the `regex` triggers positioned before
+        the first valid literal match are sent to the sandbox. No user pattern runs on the event loop, so the
+        combined regex patterns are not used to narrow the candidates.
+        """
+        folded = self.fold(content)
+        search = MessageSearch(content, folded)
+        pending = []
+        result = None
+
+        try:
+            for trigger in self.candidates(content, folded, search_chunks=False):
+                if trigger.mode == "regex":
+                    pending.append(trigger)
+                    continue
+
+                match = search.search(trigger)
+                if is_valid(match, trigger):
+                    result = trigger, match
+                    break
+
+            if not pending:
+                return result
+
+            await search.search_sandboxed(pending, sandbox)
+
+            for trigger in pending:
+                match = search.match_of(trigger)
+                if is_valid(match, trigger):
+                    return trigger, match
+
+            return result
+        finally:
+            search.close()
+
+    def search_candidates(self, content: str) -> list:
+        """
+        Searches the content with every candidate trigger, in position order, returning `(trigger, match, seconds)`
+        triples. Unlike `find`, it does not stop at the first match, so that it can explain how a message is handled.
+        """
+        folded = self.fold(content)
+        search = MessageSearch(content, folded, timed=True)
+        results = []
+
+        for trigger in self.candidates(content, folded):
+            match = search.search(trigger)
+            results.append((trigger, match, search.time_of(trigger)))
+
+        return results
+
+    async def search_candidates_sandboxed(self, content: str, sandbox) -> list:
+        """
+        Same as `search_candidates`, except that `regex` triggers are searched by the given `RegexSandbox`.
+        """
+        folded = self.fold(content)
+        search = MessageSearch(content, folded, timed=True)
+        candidates = self.candidates(content, folded, search_chunks=False)
+
+        # the literal triggers first, so that the regex triggers sharing their pattern are not sent to the sandbox
+        for trigger in candidates:
+            if trigger.mode != "regex":
+                search.search(trigger)
+
+        await search.search_sandboxed([trigger for trigger in candidates if trigger.mode == "regex"], sandbox)
+
+        return [(trigger, search.match_of(trigger), search.time_of(trigger)) for trigger in candidates]
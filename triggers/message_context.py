@@ -0,0 +1,49 @@
+from bisect import bisect_right
+
+import utils
+
+
+class SpanIndex:
+    """
+    Sorted, non-overlapping spans, answering whether a range lies inside one of them in O(log n).
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, spans):
+        self.starts = [start for start, _ in spans]
+        self.ends = [end for _, end in spans]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def contains(self, start: int, end: int) -> bool:
+        index = bisect_right(self.starts, start) - 1
+        return index >= 0 and end <= self.ends[index]
+
+
+class MessageContext:
+    """
+    Data about a message shared by every trigger evaluated against it, each part computed on first use.
+    """
+
+    __slots__ = ("content", "_link_spans", "_emote_spans")
+
+    def __init__(self, content: str):
+        self.content = content
+        self._link_spans = None
+        self._emote_spans = None
+
+    @property
+    def link_spans(self) -> SpanIndex:
+        if self._link_spans is None:
+            self._link_spans = SpanIndex([link.span() for link in utils.URL_REGEX.finditer(self.content)])
+
+        return self._link_spans
+
+    @property
+    def emote_spans(self) -> SpanIndex:
+        if self._emote_spans is None:
+            self._emote_spans = SpanIndex([emote.span() for emote in utils.EMOTE_REGEX.finditer(self.content)])
+
+        return self._emote_spans
@@ -0,0 +1,142 @@
+from bisect import bisect_left
+
+# distance between the position keys of consecutive triggers after renumbering, leaving room for moves
+POSITION_GAP = 1 << 20
+
+# number of entries per block when built, blocks are split once they grow twice as large
+BLOCK_SIZE = 256
+
+
+def position_of(trigger):
+    return trigger.position
+
+
+class OrderedTriggers:
+    """
+    Order-statistic list of compiled triggers, sorted by their position key.
+
+    Entries are kept in blocks of bounded size, so looking up an entry by its rank, finding the rank of an entry,
+    inserting and removing all take `O(log n + sqrt n)` instead of shifting the whole list.
+    """
+
+    def __init__(self, entries=()):
+        entries = sorted(entries, key=position_of)
+        self.blocks = [entries[index:index + BLOCK_SIZE] for index in range(0, len(entries), BLOCK_SIZE)]
+        self.refresh()
+
+    def refresh(self):
+        """
+        Rebuilds the block summaries, needed whenever the position keys were changed in place.
+        """
+        self.maxes = [position_of(block[-1]) for block in self.blocks]
+        self.length = sum(len(block) for block in self.blocks)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for block in self.blocks:
+            yield from block
+
+    def __getitem__(self, rank: int):
+        block_index, offset = self.locate(rank)
+        return self.blocks[block_index][offset]
+
+    def __setitem__(self, rank: int, entry):
+        block_index, offset = self.locate(rank)
+        assert position_of(self.blocks[block_index][offset]) == position_of(entry), "Entries must keep their position"
+        self.blocks[block_index][offset] = entry
+
+    def locate(self, rank: int):
+        if rank < 0:
+            rank += self.length
+
+        if not 0 <= rank < self.length:
+            raise IndexError("trigger rank out of range")
+
+        for block_index, block in enumerate(self.blocks):
+            if rank < len(block):
+                return block_index, rank
+
+            rank -= len(block)
+
+        raise IndexError("trigger rank out of range")
+
+    def find(self, trigger):
+        """
+        Returns the block index and offset of the given trigger.
+        """
+        position = trigger.position
+        block_index = bisect_left(self.maxes, position)
+
+        while block_index < len(self.blocks):
+            block = self.blocks[block_index]
+            for offset in range(self.bisect_block(block, position), len(block)):
+                if block[offset].id == trigger.id:
+                    return block_index, offset
+
+                if position_of(block[offset]) != position:
+                    break
+
+            block_index += 1
+
+        raise ValueError("trigger is not in the list")
+
+    @staticmethod
+    def bisect_block(block, position):
+        # `bisect` only accepts a key function from python 3.10 onwards
+        low, high = 0, len(block)
+        while low < high:
+            middle = (low + high) // 2
+            if position_of(block[middle]) < position:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def replace(self, trigger, new_trigger):
+        """
+        Swaps the given trigger for another one with the same position.
+        """
+        block_index, offset = self.find(trigger)
+        assert trigger.position == new_trigger.position, "Entries must keep their position"
+        self.blocks[block_index][offset] = new_trigger
+
+    def index(self, trigger) -> int:
+        block_index, offset = self.find(trigger)
+        return sum(len(block) for block in self.blocks[:block_index]) + offset
+
+    def add(self, entry):
+        position = position_of(entry)
+
+        if not self.blocks:
+            self.blocks.append([entry])
+            self.maxes.append(position)
+            self.length = 1
+            return
+
+        block_index = min(bisect_left(self.maxes, position), len(self.blocks) - 1)
+        block = self.blocks[block_index]
+        block.insert(self.bisect_block(block, position), entry)
+        self.maxes[block_index] = position_of(block[-1])
+        self.length += 1
+
+        if len(block) > BLOCK_SIZE * 2:
+            half = len(block) // 2
+            self.blocks[block_index:block_index + 1] = [block[:half], block[half:]]
+            self.maxes[block_index:block_index + 1] = [position_of(block[half - 1]), position_of(block[-1])]
+
+    def remove(self, trigger):
+        block_index, offset = self.find(trigger)
+        block = self.blocks[block_index]
+        entry = block.pop(offset)
+        self.length -= 1
+
+        if block:
+            self.maxes[block_index] = position_of(block[-1])
+        else:
+            del self.blocks[block_index]
+            del self.maxes[block_index]
+
+        return entry
@@ -0,0 +1,112 @@
+import re
+import threading
+from collections import OrderedDict
+from weakref import WeakValueDictionary
+
+# compiled patterns kept after the last trigger using them is gone, so that reloading a guild does not compile
+# them again, the least recently used ones being released first
+MAX_RETAINED_PATTERNS = 4096
+
+# the global inline flags opening a pattern, such as `(?i)`
+LEADING_FLAGS_REGEX = re.compile(r"(?:\(\?([aiLmsux]+)\))+")
+
+
+def normalize(source: str) -> str:
+    """
+    Merges the global inline flags opening the pattern into a single group with the flags in a fixed order,
+    so that `(?i)(?s)a`, `(?si)a` and `(?is)a` share a compiled pattern.
+    """
+    match = LEADING_FLAGS_REGEX.match(source)
+    if match is None:
+        return source
+
+    flags = "".join(sorted(set(re.findall(r"[aiLmsux]", match.group()))))
+    return f"(?{flags}){source[match.end():]}"
+
+
+class PatternCache:
+    """
+    Process-wide cache of compiled patterns, keyed by their normalized source, so that the triggers of every guild
+    sharing a pattern share a single compiled object.
+
+    The patterns in use are referenced by their triggers and found through weak references, so they are dropped
+    once no trigger uses them anymore, unless they are among the most recently requested ones.
+    """
+
+    def __init__(self, max_retained: int = MAX_RETAINED_PATTERNS):
+        self.max_retained = max_retained
+
+        self.patterns = WeakValueDictionary()  # normalized source -> compiled pattern
+        self.retained = OrderedDict()  # normalized source -> compiled pattern, in order of use
+
+        # the guild triggers are also compiled on the database thread and by imports
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # searches the triggers asked for, and the ones actually run once the shared patterns were deduplicated
+        self.searches = 0
+        self.evaluations = 0
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def compile(self, source: str) -> re.Pattern:
+        """
+        Returns the compiled pattern, shared with every other caller of an equivalent source.
+        Raises `re.error` if the pattern is invalid, which is not cached.
+        """
+        key = normalize(source)
+
+        with self.lock:
+            pattern = self.patterns.get(key)
+            if pattern is not None:
+                self.hits += 1
+                self.retain(key, pattern)
+                return pattern
+
+        # compiled outside the lock, a concurrent compilation of the same pattern being resolved below
+        compiled = re.compile(key)
+
+        with self.lock:
+            pattern = self.patterns.setdefault(key, compiled)
+            if pattern is compiled:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            self.retain(key, pattern)
+            return pattern
+
+    def retain(self, key: str, pattern: re.Pattern):
+        self.retained[key] = pattern
+        self.retained.move_to_end(key)
+
+        while len(self.retained) > self.max_retained:
+            self.retained.popitem(last=False)
+            self.evictions += 1
+
+    def count_searches(self, searches: int, evaluations: int):
+        self.searches += searches
+        self.evaluations += evaluations
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+
+        return {
+            "size": len(self.patterns),
+            "retained": len(self.retained),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "searches": self.searches,
+            "evaluations": self.evaluations,
+            "dedupe_ratio": 1 - self.evaluations / self.searches if self.searches else 0.0
+        }
+
+
+# shared by every guild of the process
+PATTERNS = PatternCache()
@@ -0,0 +1,201 @@
+import re
+import math
+from typing import Optional
+
+from .matching import sre_parse, sre_constants, required_literal
+from .sandbox import SandboxWorker
+
+# the limits are relative to the time this host takes to run an everyday pattern, quadratic on a run of word
+# characters, over a maximum length message, so that they hold on slower or busier hosts
+CALIBRATION_PATTERN = r"(?i)(\w+)ing"
+
+# times the calibration a single search over the adversarial corpus may take before the pattern is reported as slow
+REDOS_WARN_FACTOR = 2
+
+# times the calibration a single search over the adversarial corpus may take before the pattern is rejected
+REDOS_REJECT_FACTOR = 8
+
+# lowest time limit of a search, in seconds, for hosts fast enough to make the calibration negligible
+MIN_TIME_LIMIT = 0.1
+
+# highest polynomial degree of the search time as the message grows, beyond which the pattern is rejected
+REDOS_MAX_GROWTH = 2.8
+
+# the growth is only measured over searches taking at least this share of the calibration, shorter ones being noise
+GROWTH_NOISE_FLOOR = 0.1
+
+MAX_MESSAGE_LENGTH = 2000
+
+# characters always used to build repeated inputs, on top of the ones used by the pattern itself
+BASE_CHARACTERS = "a0 .\n"
+MAX_PATTERN_CHARACTERS = 8
+
+PROSE = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et "
+    "dolore magna aliqua. https://example.com/some/path?with=query <:emote:123456789012345678> "
+)
+
+
+def time_limit(calibration: float) -> float:
+    return max(REDOS_REJECT_FACTOR * calibration, MIN_TIME_LIMIT)
+
+
+class PatternProfile:
+    """
+    The worst time a pattern took over the adversarial corpus, compared to the calibration of the host, along with
+    the degree of its growth between a quarter and the whole maximum message length.
+    """
+
+    def __init__(self, worst_time: float, worst_input: Optional[str], exceeded: bool, calibration: float,
+                 growth: float = 1.0):
+        self.worst_time = worst_time
+        self.worst_input = worst_input
+        self.exceeded = exceeded
+        self.calibration = calibration
+        self.growth = growth
+
+    @property
+    def time_limit(self):
+        return time_limit(self.calibration)
+
+    @property
+    def rejected(self):
+        return self.exceeded or self.worst_time >= self.time_limit or self.growth > REDOS_MAX_GROWTH
+
+    @property
+    def slow(self):
+        return self.worst_time >= REDOS_WARN_FACTOR * self.calibration
+
+    def describe(self):
+        if self.exceeded:
+            return f"more than {self.time_limit * 1000:.0f} ms on {self.worst_input}"
+
+        description = f"{self.worst_time * 1000:.2f} ms on {self.worst_input}"
+        if self.growth > REDOS_MAX_GROWTH:
+            description += ", growing faster than quadratically with the length of the message"
+
+        return description
+
+
+def collect_characters(items, chars):
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            chars.append(chr(av))
+        elif op is sre_constants.IN:
+            collect_characters(av, chars)
+        else:
+            for value in av if isinstance(av, (tuple, list)) else (av,):
+                for nested in value if isinstance(value, list) else (value,):
+                    if isinstance(nested, sre_parse.SubPattern):
+                        collect_characters(nested, chars)
+
+
+def adversarial_corpus(pattern: re.Pattern, length: int = MAX_MESSAGE_LENGTH):
+    """
+    Returns `(description, text)` pairs of the given length known to trigger the worst case of backtracking patterns:
+    long runs of a single character followed by a mismatch, repeated near-matches of the pattern's
+    literal and a maximum length message.
+    """
+    pattern_characters = []
+    try:
+        collect_characters(sre_parse.parse(pattern.pattern, pattern.flags), pattern_characters)
+    except (re.error, RecursionError):
+        pass
+
+    characters = list(dict.fromkeys(pattern_characters))[:MAX_PATTERN_CHARACTERS]
+    characters += [char for char in BASE_CHARACTERS if char not in characters]
+
+    corpus = []
+    for char in characters:
+        mismatch = "!" if char != "!" else "?"
+        corpus.append((f"`{char!r}` repeated", char * length))
+        corpus.append((f"`{char!r}` repeated with a mismatch", char * (length - 1) + mismatch))
+
+    literal = required_literal(pattern)
+    if literal is not None and len(literal) > 1:
+        count = length // len(literal)
+        corpus.append(("near-matches of the pattern", literal[:-1] * (count + 1)))
+        corpus.append(("repeated matches of the pattern", literal * count))
+
+    corpus.append(("a maximum length message", (PROSE * (length // len(PROSE) + 1))[:length]))
+
+    return corpus
+
+
+def profile_pattern(pattern: re.Pattern) -> PatternProfile:
+    """
+    Times the pattern over the adversarial corpus in a separate process, stopping at the first search that
+    exceeds the time limit. Blocking, meant to be run outside the event loop.
+    """
+    return profile_patterns([pattern])[0]
+
+
+def profile_patterns(patterns) -> list:
+    """
+    Same as `profile_pattern` for several patterns, which share a worker process and its calibration until one of
+    them exceeds the time limit.
+    """
+    worker = None
+    calibration = None
+    profiles = []
+
+    try:
+        for pattern in patterns:
+            if worker is None:
+                worker = SandboxWorker()
+                calibration = calibrate(worker) if calibration is None else calibration
+
+            profile = measure(worker, pattern, calibration)
+            if profile.exceeded:
+                # still busy with the slow search
+                worker.stop()
+                worker = None
+
+            profiles.append(profile)
+    finally:
+        if worker is not None:
+            worker.stop()
+
+    return profiles
+
+
+def search(worker: SandboxWorker, source: str, text: str, limit: float) -> Optional[float]:
+    """
+    Returns the seconds the search took in the worker, or `None` if it exceeded the limit.
+    """
+    worker.connection.send(([source], text))
+    if not worker.connection.poll(limit):
+        return None
+
+    [(_, elapsed)] = worker.connection.recv()
+    return elapsed
+
+
+def calibrate(worker: SandboxWorker) -> float:
+    """
+    Returns the seconds the calibration pattern takes on this host, the fastest of two searches so that a single
+    interruption does not loosen the limits.
+    """
+    text = "a" * MAX_MESSAGE_LENGTH
+    return min(search(worker, CALIBRATION_PATTERN, text, None) for _ in range(2))
+
+
+def measure(worker: SandboxWorker, pattern: re.Pattern, calibration: float) -> PatternProfile:
+    worst_time, worst_input, growth = 0.0, None, 1.0
+    limit = time_limit(calibration)
+
+    corpus = zip(adversarial_corpus(pattern, MAX_MESSAGE_LENGTH // 4), adversarial_corpus(pattern))
+    for (_, short_text), (description, text) in corpus:
+        # the short text first, on which catastrophic patterns already exceed the limit
+        short_elapsed = search(worker, pattern.pattern, short_text, limit)
+        elapsed = None if short_elapsed is None else search(worker, pattern.pattern, text, limit)
+        if elapsed is None:
+            return PatternProfile(limit, description, True, calibration)
+
+        if worst_input is None or elapsed > worst_time:
+            worst_time, worst_input = elapsed, description
+
+        if elapsed >= GROWTH_NOISE_FLOOR * calibration and short_elapsed > 0:
+            growth = max(growth, math.log(elapsed / short_elapsed, 4))
+
+    return PatternProfile(worst_time, worst_input, False, calibration, growth)
@@ -0,0 +1,202 @@
+import re
+import time
+import asyncio
+import multiprocessing
+from typing import Optional
+
+# seconds all the regex searches of a single message may take in total
+REGEX_TIME_BUDGET = 0.25
+
+# seconds after which a single search is counted as slow
+REGEX_SLOW_THRESHOLD = 0.05
+
+# seconds a single search must have run by itself to be blamed for exceeding the time budget
+REGEX_PATTERN_TIME_LIMIT = 0.1
+
+# compiled patterns kept by each worker process
+WORKER_PATTERN_CACHE_SIZE = 1024
+
+# workers are started by a clean server process instead of being forked from the bot, whose sockets, database
+# connections and thread locks they would inherit, with this module already imported so restarts stay fast
+if "forkserver" in multiprocessing.get_all_start_methods():
+    CONTEXT = multiprocessing.get_context("forkserver")
+    CONTEXT.set_forkserver_preload([__name__])
+else:
+    CONTEXT = multiprocessing.get_context("spawn")
+
+
+class SandboxTimeout(Exception):
+    """
+    Raised when the searches of a message exceed the time budget. `index` is the search to blame, or `None` if no
+    single search ran long enough to be the cause.
+    """
+
+    def __init__(self, index: Optional[int]):
+        super().__init__(
+            "The searches exceeded the time budget together" if index is None
+            else f"Search #{index} exceeded the time budget"
+        )
+        self.index = index
+
+
+class SandboxMatch:
+    """
+    The subset of `re.Match` used by triggers, rebuilt from the spans reported by a worker process or found in the
+    folded text of a message.
+    """
+
+    __slots__ = ("string", "regs")
+
+    def __init__(self, string: str, regs: tuple):
+        self.string = string
+        self.regs = regs
+
+    def start(self, group: int = 0):
+        return self.regs[group][0]
+
+    def end(self, group: int = 0):
+        return self.regs[group][1]
+
+    def span(self, group: int = 0):
+        return self.regs[group]
+
+    def group(self, group: int = 0):
+        start, end = self.regs[group]
+        return None if start == -1 else self.string[start:end]
+
+    def groups(self):
+        return tuple(self.group(index) for index in range(1, len(self.regs)))
+
+
+def worker_main(connection, progress, started):
+    patterns = {}
+
+    while True:
+        try:
+            sources, content = connection.recv()
+        except EOFError:
+            return
+
+        results = []
+        for index, source in enumerate(sources):
+            progress.value = index
+            started.value = time.monotonic()
+
+            pattern = patterns.get(source)
+            if pattern is None:
+                if len(patterns) >= WORKER_PATTERN_CACHE_SIZE:
+                    patterns.clear()
+
+                pattern = patterns[source] = re.compile(source)
+
+            start = time.perf_counter()
+            match = pattern.search(content)
+            elapsed = time.perf_counter() - start
+
+            results.append((None if match is None else match.regs, elapsed))
+
+        connection.send(results)
+
+
+class SandboxWorker:
+    def __init__(self):
+        self.connection, child_connection = CONTEXT.Pipe()
+        self.progress = CONTEXT.Value("i", -1, lock=False)
+        self.started = CONTEXT.Value("d", 0.0, lock=False)  # monotonic time the current search started at
+        self.process = CONTEXT.Process(
+            target=worker_main, args=(child_connection, self.progress, self.started), daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+
+    def stop(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class RegexSandbox:
+    """
+    Runs regex searches in a pool of worker processes, so a catastrophically backtracking pattern can neither
+    block the event loop nor hold the GIL. A worker exceeding the time budget of a message is killed and replaced.
+    """
+
+    def __init__(
+            self, worker_count: int = 2,
+            time_budget: float = REGEX_TIME_BUDGET, slow_threshold: float = REGEX_SLOW_THRESHOLD,
+            pattern_time_limit: float = REGEX_PATTERN_TIME_LIMIT
+    ):
+        self.worker_count = worker_count
+        self.time_budget = time_budget
+        self.slow_threshold = slow_threshold
+        self.pattern_time_limit = pattern_time_limit
+        self.idle_workers = None
+
+        self.searches = 0
+        self.slow_searches = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def start(self):
+        self.idle_workers = asyncio.Queue()
+        for _ in range(self.worker_count):
+            self.idle_workers.put_nowait(SandboxWorker())
+
+    def stop(self):
+        while self.idle_workers is not None and not self.idle_workers.empty():
+            self.idle_workers.get_nowait().stop()
+
+    def stats(self):
+        return {
+            "searches": self.searches,
+            "slow_searches": self.slow_searches,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts
+        }
+
+    async def search_many(self, patterns: list, content: str, timed: bool = False) -> list:
+        """
+        Searches the content with every pattern, returning a `SandboxMatch` or `None` for each one, paired with the
+        seconds the search took if `timed` is set.
+        Raises `SandboxTimeout` if the time budget is exceeded, with the index of the pattern which was running
+        unless it had not run for `pattern_time_limit` by itself, the budget being then spent by several patterns.
+        """
+        worker = await self.idle_workers.get()
+
+        try:
+            worker.connection.send(([pattern.pattern for pattern in patterns], content))
+            ready = await asyncio.to_thread(worker.connection.poll, self.time_budget)
+
+            if not ready:
+                self.timeouts += 1
+                index = worker.progress.value
+                if time.monotonic() - worker.started.value < self.pattern_time_limit:
+                    index = None
+
+                worker = self.restart(worker)
+                raise SandboxTimeout(index)
+
+            try:
+                results = worker.connection.recv()
+            except EOFError:
+                worker = self.restart(worker)
+                raise
+        finally:
+            self.idle_workers.put_nowait(worker)
+
+        self.searches += len(results)
+
+        matches = []
+        for regs, elapsed in results:
+            if elapsed >= self.slow_threshold:
+                self.slow_searches += 1
+
+            match = None if regs is None else SandboxMatch(content, regs)
+            matches.append((match, elapsed) if timed else match)
+
+        return matches
+
+    def restart(self, worker: SandboxWorker) -> SandboxWorker:
+        worker.stop()
+        self.restarts += 1
+        return SandboxWorker()
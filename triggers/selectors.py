@@ -0,0 +1,66 @@
+import re
+
+# IDs are bounded, so that converting them never exceeds the digit limit of `int`
+SELECTOR_ITEM_REGEX = re.compile(r"\s*(\d{1,9})\s*(?:-\s*(\d{1,9})\s*)?")
+
+
+# characters of an invalid part quoted back to the user
+MAX_QUOTED_LENGTH = 20
+
+
+class InvalidSelector(ValueError):
+    pass
+
+
+def quote(item: str) -> str:
+    item = item.strip()
+    return f"`{item if len(item) <= MAX_QUOTED_LENGTH else item[:MAX_QUOTED_LENGTH - 1] + '…'}`"
+
+
+def parse_selector(selector: str, count: int) -> list:
+    """
+    Returns the sorted, 0-indexed ranks selected by a comma separated list of 1-indexed IDs and inclusive ranges,
+    such as `3-40,52`. Raises `InvalidSelector` if any part is malformed or out of bounds.
+    """
+    ranks = set()
+
+    for item in selector.split(","):
+        if not item.strip():
+            raise InvalidSelector("The selection contains an empty ID.")
+
+        match = SELECTOR_ITEM_REGEX.fullmatch(item)
+        if match is None:
+            raise InvalidSelector(f"{quote(item)} is neither an ID nor a range of IDs such as `3-40`.")
+
+        first = int(match.group(1))
+        last = int(match.group(2)) if match.group(2) is not None else first
+
+        if first > last:
+            raise InvalidSelector(f"The range {quote(item)} is reversed.")
+
+        if first < 1 or last > count:
+            raise InvalidSelector(f"Invalid ID in {quote(item)}, must be between 1 and {count}.")
+
+        ranks.update(range(first - 1, last))
+
+    return sorted(ranks)
+
+
+def describe_selection(ranks: list) -> str:
+    """
+    Formats 0-indexed ranks back as a selector of 1-indexed IDs, merging consecutive ones into ranges.
+    """
+    parts = []
+    start = previous = None
+
+    for rank in ranks + [None]:
+        if previous is not None and rank == previous + 1:
+            previous = rank
+            continue
+
+        if start is not None:
+            parts.append(f"{start + 1}" if start == previous else f"{start + 1}-{previous + 1}")
+
+        start = previous = rank
+
+    return ",".join(parts)
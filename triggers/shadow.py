@@ -0,0 +1,142 @@
+import time
+import random
+import hashlib
+import logging
+
+from .ordering import position_of
+from .sandbox import SandboxTimeout
+
+logger = logging.getLogger(__name__)
+
+# share of the messages also searched by the reference loop while shadow evaluation is enabled
+SHADOW_SAMPLE_RATE = 0.01
+
+# number of compared messages between two summaries in the log
+SHADOW_REPORT_INTERVAL = 1000
+
+
+def fingerprint(content: str) -> str:
+    """
+    Identifies a message in the logs without revealing its content.
+    """
+    return hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=8).hexdigest()
+
+
+def describe_result(result) -> str:
+    if result is None:
+        return "no match"
+
+    trigger, match = result
+    return f"trigger {trigger.id} at {match.span()}"
+
+
+def reference_find(triggers: list, content: str, is_valid):
+    """
+    The original way of matching a message: every trigger is searched one by one, in position order, until the
+    first valid match. Slow, but free of any index, so it serves as the reference for the faster engines.
+    """
+    for trigger in triggers:
+        match = trigger.pattern.search(content)
+        if is_valid(match, trigger):
+            return trigger, match
+
+    return None
+
+
+async def reference_find_sandboxed(triggers: list, content: str, is_valid, sandbox):
+    """
+    Same as `reference_find`, except that the `regex` triggers are all searched by the given `RegexSandbox`.
+    """
+    regex_triggers = [trigger for trigger in triggers if trigger.mode == "regex"]
+    matches = await sandbox.search_many([trigger.pattern for trigger in regex_triggers], content)
+    regex_matches = {trigger.id: match for trigger, match in zip(regex_triggers, matches)}
+
+    for trigger in triggers:
+        if trigger.mode == "regex":
+            match = regex_matches[trigger.id]
+        else:
+            match = trigger.pattern.search(content)
+
+        if is_valid(match, trigger):
+            return trigger, match
+
+    return None
+
+
+class ShadowEvaluator:
+    """
+    Checks, on a sample of the live messages, that the matching engine in use picks the same trigger and span as
+    the reference loop, so that a new engine can be rolled out without risking wrong responses.
+    Only the engine's result is ever acted upon, the reference one is logged and counted.
+    """
+
+    def __init__(self, sample_rate: float = SHADOW_SAMPLE_RATE, report_interval: int = SHADOW_REPORT_INTERVAL):
+        self.sample_rate = sample_rate
+        self.report_interval = report_interval
+
+        self.compared = 0
+        self.mismatches = 0
+        self.aborted = 0
+
+        # summed over the compared messages only
+        self.engine_time = 0.0
+        self.reference_time = 0.0
+
+    def sampled(self) -> bool:
+        return random.random() < self.sample_rate
+
+    async def compare(self, guild_id: int, triggers, content: str, is_valid, result, engine_time: float,
+                      sandbox=None):
+        """
+        Searches the content with the reference loop over the given triggers, as they were when the engine
+        produced `result` in `engine_time` seconds, and records whether both agree.
+        """
+        triggers = sorted(triggers, key=position_of)
+
+        start = time.perf_counter()
+        try:
+            if sandbox is None:
+                expected = reference_find(triggers, content, is_valid)
+            else:
+                expected = await reference_find_sandboxed(triggers, content, is_valid, sandbox)
+        except SandboxTimeout:
+            self.aborted += 1  # the engine has already handled the timeout of this message
+            return
+
+        reference_time = time.perf_counter() - start
+
+        self.compared += 1
+        self.engine_time += engine_time
+        self.reference_time += reference_time
+
+        if not self.agree(result, expected):
+            self.mismatches += 1
+            logger.warning(
+                "Shadow mismatch in guild %d for message %s (%d characters): the engine chose %s, "
+                "the reference loop %s",
+                guild_id, fingerprint(content), len(content), describe_result(result), describe_result(expected)
+            )
+
+        if self.compared % self.report_interval == 0:
+            stats = self.stats()
+            logger.info(
+                "Shadow evaluation: %d messages compared, %d mismatches, %d aborted, "
+                "the engine taking %.1f%% of the reference time",
+                stats["compared"], stats["mismatches"], stats["aborted"], stats["relative_latency"] * 100
+            )
+
+    @staticmethod
+    def agree(result, expected) -> bool:
+        if result is None or expected is None:
+            return result is expected
+
+        (trigger, match), (expected_trigger, expected_match) = result, expected
+        return trigger.id == expected_trigger.id and match.span() == expected_match.span()
+
+    def stats(self) -> dict:
+        return {
+            "compared": self.compared,
+            "mismatches": self.mismatches,
+            "aborted": self.aborted,
+            "relative_latency": self.engine_time / self.reference_time if self.reference_time else 0.0
+        }
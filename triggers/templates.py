@@ -0,0 +1,107 @@
+import re
+from functools import partial
+
+# escapes, response separators and variables, optionally preceded by "@" to mention the author instead
+TOKEN_REGEX = re.compile(r"\\[\\;]|;|(@?)\{(\w+)}")
+# group numbers are bounded, so that converting them never exceeds the digit limit of `int`
+MATCH_VARIABLE_REGEX = re.compile(r"match(\d{1,9})")
+
+
+def author_mention(message, _):
+    return message.author.mention
+
+
+def author_username(message, _):
+    return message.author.name
+
+
+def author_display(message, _):
+    return message.author.display_name
+
+
+def author_nickname(message, _):
+    # members without a server nickname fall back to their display name
+    return message.author.nick or message.author.display_name
+
+
+def author_id(message, _):
+    return str(message.author.id)
+
+
+def match_group(index, _, match):
+    return match.group(index) or ""
+
+
+AUTHOR_VARIABLES = {
+    "author_username": author_username,
+    "author_display": author_display,
+    "author_nickname": author_nickname,
+    "author_id": author_id
+}
+
+
+class ResponseTemplate:
+    """
+    A single response, parsed into literal chunks and variable slots, rendered with a single join.
+    """
+
+    __slots__ = ("source", "chunks")
+
+    def __init__(self, source: str, chunks: list):
+        self.source = source
+        self.chunks = tuple(chunks)
+
+    def render(self, message, match) -> str:
+        return "".join([chunk if chunk.__class__ is str else chunk(message, match) for chunk in self.chunks])
+
+
+def compile_responses(response: str, group_count: int):
+    """
+    Parses a trigger's raw response into one template per `;`-separated response.
+    Returns the templates, along with the placeholders which are not known variables and are kept as text.
+    """
+    templates = []
+    unknown = []
+
+    chunks = []
+    literal = []
+    source_start = 0
+    position = 0
+
+    def close_literal():
+        if literal:
+            chunks.append("".join(literal))
+            literal.clear()
+
+    for token in TOKEN_REGEX.finditer(response):
+        literal.append(response[position:token.start()])
+        position = token.end()
+        text = token.group()
+
+        if text == ";":
+            close_literal()
+            templates.append(ResponseTemplate(response[source_start:token.start()], chunks))
+            chunks = []
+            source_start = position
+        elif text.startswith("\\"):
+            literal.append(text[1])
+        else:
+            mention, name = token.groups()
+            match_variable = MATCH_VARIABLE_REGEX.fullmatch(name)
+
+            if name in AUTHOR_VARIABLES:
+                close_literal()
+                chunks.append(author_mention if mention else AUTHOR_VARIABLES[name])
+            elif match_variable is not None and int(match_variable.group(1)) <= group_count:
+                literal.append(mention)
+                close_literal()
+                chunks.append(partial(match_group, int(match_variable.group(1))))
+            else:
+                literal.append(text)
+                unknown.append(text)
+
+    literal.append(response[position:])
+    close_literal()
+    templates.append(ResponseTemplate(response[source_start:], chunks))
+
+    return templates, unknown
@@ -0,0 +1,211 @@
+import io
+import csv
+import json
+import tempfile
+
+from .entities import TriggerEntity, TriggerSettingsEntity
+from .cooldowns import COOLDOWN_SCOPES
+
+MODES = ("plain", "word", "full", "regex")
+FORMATS = ("jsonl", "csv")
+
+# the fields of a trigger which are exported, its ID and position being given by its line
+TRIGGER_FIELDS = (
+    "mode", "user_pattern", "response", "cooldown", "cooldown_scope", "case_sensitive", "avoid_links",
+    "avoid_emotes", "start", "end", "disabled"
+)
+SETTINGS_FIELDS = ("cooldown", "cooldown_scope", "case_sensitive", "avoid_links", "avoid_emotes")
+
+# every line is either the guild's settings or a trigger, the settings using a subset of the trigger columns,
+# which are named after the arguments of `/triggers add`
+COLUMNS = ("kind",) + tuple("pattern" if field == "user_pattern" else field for field in TRIGGER_FIELDS)
+
+# bytes of an export kept in memory before it spills to a temporary file
+EXPORT_MEMORY_LIMIT = 1024 * 1024
+
+# budgets of an imported file
+MAX_IMPORT_SIZE = 8 * 1024 * 1024
+MAX_IMPORTED_TRIGGERS = 10_000
+
+# number of rows per `INSERT` statement, within SQLite's limit of bound variables
+INSERT_BATCH_SIZE = 50
+
+
+class InvalidImport(ValueError):
+    def __init__(self, line: int, reason: str):
+        super().__init__(f"Line {line}: {reason}")
+        self.line = line
+        self.reason = reason
+
+
+def export_guild(guild_id: int, format_: str):
+    """
+    Writes the guild's settings and triggers, in order, to a binary file which is returned rewound.
+    The triggers are streamed from the database rather than loaded at once. Blocking, meant to be run on the
+    database thread.
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_MEMORY_LIMIT)
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+
+    if format_ == "csv":
+        writer = csv.writer(text)
+        writer.writerow(COLUMNS)
+
+        def write(row):
+            writer.writerow(["" if value is None else value for value in row])
+    else:
+        def write(row):
+            text.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n")
+
+    settings = TriggerSettingsEntity.get_or_none(TriggerSettingsEntity.guild_id == guild_id)
+    if settings is not None:
+        write(["settings"] + [
+            getattr(settings, field) if field in SETTINGS_FIELDS else None for field in TRIGGER_FIELDS
+        ])
+
+    fields = [getattr(TriggerEntity, field) for field in TRIGGER_FIELDS]
+    rows = TriggerEntity.select(*fields) \
+        .where(TriggerEntity.guild_id == guild_id) \
+        .order_by(TriggerEntity.position, TriggerEntity.id) \
+        .tuples() \
+        .iterator()
+
+    for row in rows:
+        write(["trigger"] + list(row))
+
+    text.flush()
+    text.detach()
+    output.seek(0)
+
+    return output
+
+
+def parse_import(data: bytes, format_: str):
+    """
+    Reads and validates an exported file, returning the settings it sets (empty if it has none) and its triggers,
+    as dictionaries of stored fields. Raises `InvalidImport` on the first invalid line.
+    """
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise InvalidImport(1, "the file is not UTF-8 encoded")
+
+    settings = {}
+    triggers = []
+
+    for line, record in read_records(text, format_):
+        kind = record.get("kind") or "trigger"
+
+        if kind == "settings":
+            if settings:
+                raise InvalidImport(line, "the settings are given more than once")
+
+            settings = {
+                field: value for field, value in validate_settings(line, record).items() if value is not None
+            }
+            continue
+
+        if kind != "trigger":
+            raise InvalidImport(line, f"unknown kind `{kind}`")
+
+        if len(triggers) >= MAX_IMPORTED_TRIGGERS:
+            raise InvalidImport(line, f"at most {MAX_IMPORTED_TRIGGERS} triggers can be imported at once")
+
+        triggers.append((line, validate_trigger(line, record)))
+
+    return settings, triggers
+
+
+def read_records(text: str, format_: str):
+    if format_ == "csv":
+        reader = csv.DictReader(io.StringIO(text, newline=""))
+        for record in reader:
+            # empty cells stand for missing values
+            yield reader.line_num, {key: value for key, value in record.items() if value not in ("", None)}
+
+        return
+
+    for line, content in enumerate(text.splitlines(), 1):
+        if not content.strip():
+            continue
+
+        try:
+            record = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise InvalidImport(line, f"invalid JSON ({e.msg})")
+
+        if not isinstance(record, dict):
+            raise InvalidImport(line, "expected a JSON object")
+
+        yield line, {key: value for key, value in record.items() if value is not None}
+
+
+def validate_trigger(line: int, record: dict) -> dict:
+    fields = {
+        "mode": parse_choice(line, record, "mode", MODES),
+        "user_pattern": parse_text(line, record, "pattern"),
+        "response": parse_text(line, record, "response"),
+        "start": parse_bool(line, record, "start", False),
+        "end": parse_bool(line, record, "end", False),
+        "disabled": parse_bool(line, record, "disabled", False),
+    }
+    fields.update(validate_settings(line, record))
+
+    if fields["mode"] is None or fields["user_pattern"] is None or fields["response"] is None:
+        raise InvalidImport(line, "`mode`, `pattern` and `response` are required")
+
+    return fields
+
+
+def validate_settings(line: int, record: dict) -> dict:
+    return {
+        "cooldown": parse_cooldown(line, record),
+        "cooldown_scope": parse_choice(line, record, "cooldown_scope", COOLDOWN_SCOPES),
+        "case_sensitive": parse_bool(line, record, "case_sensitive"),
+        "avoid_links": parse_bool(line, record, "avoid_links"),
+        "avoid_emotes": parse_bool(line, record, "avoid_emotes"),
+    }
+
+
+def parse_text(line, record, field):
+    value = record.get(field)
+    if value is not None and (not isinstance(value, str) or not value):
+        raise InvalidImport(line, f"`{field}` must be a non-empty string")
+
+    return value
+
+
+def parse_choice(line, record, field, choices):
+    value = record.get(field)
+    if value is not None and value not in choices:
+        raise InvalidImport(line, f"`{field}` must be one of {', '.join(f'`{choice}`' for choice in choices)}")
+
+    return value
+
+
+def parse_bool(line, record, field, default=None):
+    value = record.get(field)
+    if value is None:
+        return default
+
+    if isinstance(value, str):
+        value = {"true": True, "false": False}.get(value.strip().lower(), value)
+
+    if not isinstance(value, bool):
+        raise InvalidImport(line, f"`{field}` must be `true` or `false`")
+
+    return value
+
+
+def parse_cooldown(line, record):
+    value = record.get("cooldown")
+    if value is None:
+        return None
+
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise InvalidImport(line, "`cooldown` must be a non-negative integer")
+
+    return value
@@ -1,75 +1,189 @@
 import re
+import time
+import asyncio
+import logging
 import random
+from types import SimpleNamespace
+from collections import Counter
+from weakref import WeakValueDictionary
 from datetime import datetime
 from typing import Literal, Optional, Any
 
 import discord.app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord.app_commands import Range
+from peewee import chunked
 
 import utils
 from . import help_pages
 from .descriptions import desc
 from .entities import TriggerEntity, TriggerSettingsEntity
-from cofdb import db
+from .compiled import CompiledTrigger, compute_regex_pattern
+from .cooldowns import CooldownTracker, cooldown_key
+from .dispatch import ResponseDispatcher
+from .shadow import ShadowEvaluator
+from .patterns import PATTERNS
+from .guild_triggers import GuildTriggers, GuildTriggerCache, count_unassigned, adopt_unassigned
+from .sandbox import RegexSandbox, SandboxTimeout
+from .profiler import PatternProfile, profile_pattern, profile_patterns
+from .message_context import MessageContext
+from .list_pages import TriggerListSource
+from .templates import compile_responses
+from .ordering import POSITION_GAP
+from .transfer import (
+    FORMATS, SETTINGS_FIELDS, MAX_IMPORT_SIZE, INSERT_BATCH_SIZE, InvalidImport, export_guild, parse_import
+)
+from .selectors import InvalidSelector, parse_selector, describe_selection
+from cofdb import create_schema, bulk_update_field, bulk_update_rows, bulk_delete, WriteBehindBuffer, async_db
+
+logger = logging.getLogger(__name__)
+
+# seconds between two writes of the buffered `last_triggered` values
+LAST_TRIGGERED_FLUSH_INTERVAL = 30
+
+# whether `last_triggered` is saved, so that server-wide cooldowns survive restarts and guild cache evictions
+PERSIST_COOLDOWNS = True
+
+# whether `regex` triggers are searched in worker processes, with a time budget per message
+USE_REGEX_SANDBOX = True
+
+# number of times a trigger may exceed the time budget before being disabled
+REGEX_MAX_TIMEOUTS = 3
+
+# whether a sample of the messages is also matched by the reference loop, to validate the matching engine
+SHADOW_EVALUATION = False
+
+# seconds between two reports of the matching, cooldown, dispatch and database statistics in the log
+STATS_REPORT_INTERVAL = 3600
+
+# triggers listed per section of a `/triggers test` report, and the characters shown of their patterns
+MAX_TEST_RESULTS = 10
+MAX_TEST_PATTERN_LENGTH = 40
+
+
+def format_stats(stats: dict) -> str:
+    return ", ".join(
+        f"{name}={value:.4g}" if isinstance(value, float) else f"{name}={value}" for name, value in stats.items()
+    )
 
 
 class TriggerCog(commands.Cog):
-    group = discord.app_commands.Group(name="triggers", description="Manage this server's triggers")
+    group = discord.app_commands.Group(name="triggers", description="Manage this server's triggers", guild_only=True)
 
     def __init__(self, bot):
         self.bot = bot
-        if not db.is_connection_usable():
-            db.connect()
-            db.create_tables([TriggerEntity, TriggerSettingsEntity])
 
-        # ensure there is only one row in the settings table
-        settings_entities = TriggerSettingsEntity.select()
+        # each guild's triggers are loaded upon first use
+        self.guild_cache = GuildTriggerCache(on_load=self.restore_cooldowns if PERSIST_COOLDOWNS else None)
+        self.cooldowns = CooldownTracker()
+        self.dispatcher = ResponseDispatcher()
 
-        with db.atomic() as transaction:
-            try:
-                if len(settings_entities) == 0:
-                    settings_entity = TriggerSettingsEntity()
-                    settings_entity.save()
-                elif len(settings_entities) > 1:
-                    settings_entities[1:].delete_instance()
-            except Exception as e:
-                transaction.rollback()
-                raise RuntimeError("Failed to sanitize the settings table.") from e
+        # serializes the commands modifying a guild's triggers, now that they wait on the database
+        self.guild_locks = WeakValueDictionary()
+        self.last_triggered_buffer = WriteBehindBuffer(TriggerEntity, TriggerEntity.last_triggered)
+
+        self.regex_sandbox = RegexSandbox() if USE_REGEX_SANDBOX else None
+        self.regex_timeouts = Counter()
+
+        self.shadow = ShadowEvaluator() if SHADOW_EVALUATION else None
+        self.shadow_tasks = set()
+
+        self.help_pages = help_pages.HelpPagesCache()
+
+        # whether the rows belonging to no guild were looked for, once the bot first connected
+        self.unassigned_checked = False
 
-        raw_triggers = TriggerEntity.select().order_by(TriggerEntity.position)
-        self.triggers = [(trigger, re.compile(str(trigger.regex_pattern))) for trigger in raw_triggers]
-        self.globals = settings_entities.select().get()
+    async def cog_load(self):
+        await async_db.run(self.create_tables)
+
+        self.help_pages.build()
+        self.flush_last_triggered.start()
+        self.report_stats.start()
+        if self.regex_sandbox is not None:
+            self.regex_sandbox.start()
+
+    async def cog_unload(self):
+        self.flush_last_triggered.cancel()
+        self.report_stats.cancel()
+
+        for task in self.shadow_tasks:
+            task.cancel()
+
+        await asyncio.gather(*self.shadow_tasks, return_exceptions=True)
+
+        if self.regex_sandbox is not None:
+            self.regex_sandbox.stop()
+
+        await self.dispatcher.stop()
+
+        await async_db.run(self.last_triggered_buffer.flush)
+
+    @staticmethod
+    def create_tables():
+        create_schema(TriggerEntity, TriggerSettingsEntity)
+
+    def guild_lock(self, guild_id: int) -> asyncio.Lock:
+        lock = self.guild_locks.get(guild_id)
+        if lock is None:
+            lock = self.guild_locks[guild_id] = asyncio.Lock()
+
+        return lock
+
+    @tasks.loop(seconds=LAST_TRIGGERED_FLUSH_INTERVAL)
+    async def flush_last_triggered(self):
+        try:
+            await async_db.run(self.last_triggered_buffer.flush)
+        except Exception:
+            # the rows stay buffered until the next attempt
+            logger.exception("Failed to flush the last triggered times")
+
+    def stats(self) -> dict:
+        """
+        Returns the statistics of every component, by name.
+        """
+        stats = {
+            "guild cache": self.guild_cache.stats(),
+            "patterns": PATTERNS.stats(),
+            "cooldowns": self.cooldowns.stats(),
+            "dispatch": self.dispatcher.stats(),
+            "database": async_db.stats(),
+            "last triggered buffer": self.last_triggered_buffer.stats(),
+        }
+
+        if self.regex_sandbox is not None:
+            stats["regex sandbox"] = self.regex_sandbox.stats()
+
+        if self.shadow is not None:
+            stats["shadow evaluation"] = self.shadow.stats()
+
+        return stats
+
+    @tasks.loop(seconds=STATS_REPORT_INTERVAL)
+    async def report_stats(self):
+        if self.report_stats.current_loop == 0:
+            return  # nothing happened yet
+
+        for name, values in self.stats().items():
+            logger.info("Statistics of the %s: %s", name, format_stats(values))
+
+    @commands.command(name="triggerstats")
+    @commands.is_owner()
+    async def trigger_stats(self, ctx: commands.Context):
+        lines = [f"{name}: {format_stats(values)}" for name, values in self.stats().items()]
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
 
     @group.command(description=desc.command.help)
     async def help(self, interaction: discord.Interaction):
-        pages = utils.Pages(help_pages.get())
+        pages = utils.Pages(self.help_pages.get())
         await pages.show(interaction)
 
     @group.command(description=desc.command.list)
     async def list(self, interaction: discord.Interaction):
-        embeds = []
-
-        if not await self.check_trigger_count(interaction):
+        guild_triggers = await self.guild_cache.get(interaction.guild_id)
+        if not await self.check_trigger_count(guild_triggers, interaction):
             return
 
-        for index in range(0, len(self.triggers), 10):
-            embed = discord.Embed(title="Triggers", description="_List of all available triggers_")
-
-            for trigger, _ in self.triggers[index:index + 10]:
-                pattern = discord.utils.escape_mentions(trigger.user_pattern)
-                if len(pattern) > 50:
-                    pattern = pattern[:50] + "..."
-
-                embed.add_field(
-                    name=f"{trigger.position + 1}. `{pattern}`",
-                    value=f"Mode: **{trigger.mode}**",
-                    inline=False
-                )
-
-            embeds.append(embed)
-
-        pages = utils.Pages(embeds)
+        pages = utils.Pages(TriggerListSource(guild_triggers.get_snapshot()))
         await pages.show(interaction)
 
     @group.command(description=desc.command.help)
@@ -77,12 +191,13 @@ class TriggerCog(commands.Cog):
     @discord.app_commands.describe(id_=desc.argument.inspect.id)
     async def inspect(self, interaction: discord.Interaction, id_: Range[int, 1]):
         id_ -= 1  # user inputs it as 1-indexed
-        if not await self.check_id(id_, interaction):
+        guild_triggers = await self.guild_cache.get(interaction.guild_id)
+        if not await self.check_id(guild_triggers, id_, interaction):
             return
 
-        trigger, _ = self.triggers[id_]
+        trigger = guild_triggers.triggers[id_]
 
-        embed = self.trigger_to_embed(trigger, "_Information about the selected trigger_")
+        embed = self.trigger_to_embed(guild_triggers, trigger, "_Information about the selected trigger_")
 
         await interaction.response.send_message(embed=embed)  # type: ignore
 
@@ -91,6 +206,7 @@ class TriggerCog(commands.Cog):
     @discord.app_commands.describe(pattern=desc.argument.pattern)
     @discord.app_commands.describe(response=desc.argument.response)
     @discord.app_commands.describe(cooldown=desc.argument.cooldown)
+    @discord.app_commands.describe(cooldown_scope=desc.argument.cooldown_scope)
     @discord.app_commands.describe(case_sensitive=desc.argument.case_sensitive)
     @discord.app_commands.describe(avoid_links=desc.argument.avoid_links)
     @discord.app_commands.describe(avoid_emotes=desc.argument.avoid_emotes)
@@ -102,38 +218,59 @@ class TriggerCog(commands.Cog):
             pattern: str,
             response: str,
             cooldown: Optional[Range[int, 0]] = None,
+            cooldown_scope: Optional[Literal["trigger", "channel", "user"]] = None,
             case_sensitive: Optional[bool] = None,
             avoid_links: Optional[bool] = None,
             avoid_emotes: Optional[bool] = None,
             start: Optional[bool] = False,
             end: Optional[bool] = False
     ):
-        with db.atomic() as transaction:
+        async with self.guild_lock(interaction.guild_id):
+            # fetched under the lock, since the guild may be evicted and its global settings changed meanwhile
+            guild_triggers = await self.guild_cache.get(interaction.guild_id)
+            regex_pattern = self.compute(
+                mode, pattern, case_sensitive, start, end, guild_triggers.globals.case_sensitive
+            )
+
+            profile = await self.profile(interaction, mode, regex_pattern)
+            if profile is not None and profile.rejected:
+                return await self.reply(interaction, self.rejection_message(profile))
+
             try:
-                # create a new entity
-                new_trigger = TriggerEntity(
+                fields = dict(
                     mode=mode,
                     user_pattern=pattern,
                     response=self.unescape_response(response),
                     cooldown=cooldown,
+                    cooldown_scope=cooldown_scope,
                     case_sensitive=case_sensitive,
                     avoid_links=avoid_links,
                     avoid_emotes=avoid_emotes,
                     start=start,
                     end=end,
-                    regex_pattern=self.compute(mode, pattern, case_sensitive, start, end),
-                    position=len(self.triggers),
-                    last_used=None
+                    regex_pattern=regex_pattern,
+                    position=guild_triggers.next_position(),
+                    disabled=False
                 )
 
-                new_trigger.save()
-                self.triggers.append((new_trigger, re.compile(str(new_trigger.regex_pattern))))
+                # compiled and indexed before anything is written, so that unusable patterns are never saved
+                new_trigger = guild_triggers.compile(dict(fields, id=None))
+
+                insert = TriggerEntity.insert(guild_id=interaction.guild_id, **fields)
+                new_trigger = new_trigger.replace(guild_triggers.globals, id=await async_db.atomic(insert.execute))
+
+                guild_triggers.add(new_trigger)
+                self.guild_cache.trim()
+                self.triggers_changed(interaction.guild_id)
 
-                await interaction.response.send_message("Trigger added!")  # type: ignore
+                embed = self.trigger_to_embed(
+                    guild_triggers, new_trigger, "_Trigger added successfully_", profile,
+                    self.unknown_variables(new_trigger)
+                )
+                await self.reply(interaction, embed=embed)
             except Exception as e:
-                transaction.rollback()
                 message = "Failed to add the trigger."
-                await interaction.response.send_message(message)  # type: ignore
+                await self.reply(interaction, message)
                 raise RuntimeError(message) from e
 
     @group.command(description=desc.command.edit)
@@ -143,6 +280,7 @@ class TriggerCog(commands.Cog):
     @discord.app_commands.describe(pattern=desc.argument.pattern)
     @discord.app_commands.describe(response=desc.argument.response)
     @discord.app_commands.describe(cooldown=desc.argument.cooldown)
+    @discord.app_commands.describe(cooldown_scope=desc.argument.cooldown_scope)
     @discord.app_commands.describe(case_sensitive=desc.argument.case_sensitive)
     @discord.app_commands.describe(avoid_links=desc.argument.avoid_links)
     @discord.app_commands.describe(avoid_emotes=desc.argument.avoid_emotes)
@@ -156,6 +294,7 @@ class TriggerCog(commands.Cog):
             pattern: Optional[str] = None,
             response: Optional[str] = None,
             cooldown: Optional[Range[int, 0]] = None,
+            cooldown_scope: Optional[Literal["trigger", "channel", "user"]] = None,
             case_sensitive: Optional[bool] = None,
             avoid_links: Optional[bool] = None,
             avoid_emotes: Optional[bool] = None,
@@ -163,20 +302,38 @@ class TriggerCog(commands.Cog):
             end: Optional[bool] = None,
             new_id: Optional[Range[int, 1]] = None
     ):
-        with db.atomic() as transaction:
+        async with self.guild_lock(interaction.guild_id):
             try:
                 has_modifications = any(param is not None for param in [
-                    mode, pattern, response, cooldown, case_sensitive, avoid_links, avoid_emotes, start, end, new_id
+                    mode, pattern, response, cooldown, cooldown_scope, case_sensitive, avoid_links, avoid_emotes,
+                    start, end, new_id
                 ])
 
                 if not has_modifications:
                     return await interaction.response.send_message("Nothing to change.")  # type: ignore
 
                 id_ -= 1  # user inputs it as 1-indexed
-                if not await self.check_id(id_, interaction):
+                guild_triggers = await self.guild_cache.get(interaction.guild_id)
+                if not await self.check_id(guild_triggers, id_, interaction):
                     return
 
-                trigger, _ = self.triggers[id_]
+                trigger = guild_triggers.triggers[id_]
+
+                # profile the pattern the trigger would end up with before modifying anything
+                new_mode = mode if mode is not None else trigger.mode
+                new_regex_pattern = self.compute(
+                    new_mode, pattern if pattern is not None else trigger.user_pattern, case_sensitive,
+                    start if start is not None else trigger.start, end if end is not None else trigger.end,
+                    guild_triggers.globals.case_sensitive
+                )
+
+                profile = None
+                if new_regex_pattern != trigger.regex_pattern:
+                    profile = await self.profile(interaction, new_mode, new_regex_pattern)
+                    if profile is not None and profile.rejected:
+                        return await self.reply(interaction, self.rejection_message(profile))
+
+                changes = {}
 
                 def test_and_update(field: str, value: Any, has_default: bool = False):
                     if value is None and not has_default:
@@ -185,33 +342,20 @@ class TriggerCog(commands.Cog):
                     if getattr(trigger, field) == value:
                         return False
 
-                    setattr(trigger, field, value)
+                    changes[field] = value
                     return True
 
-                has_modifications = False
-                used_id = id_
+                renumbered = {}
 
-                if new_id is not None and new_id != trigger.position:
+                if new_id is not None and new_id - 1 != id_:
                     new_id -= 1  # user inputs it as 1-indexed
-                    if new_id >= len(self.triggers):
-                        return await interaction.response.send_message(  # type: ignore
-                            f"Invalid new ID, must be between 1 and {len(self.triggers)}."
+                    if new_id >= len(guild_triggers):
+                        return await self.reply(
+                            interaction, f"Invalid new ID, must be between 1 and {len(guild_triggers)}."
                         )
 
-                    old_position = trigger.position
-                    trigger.position = new_id
-                    has_modifications = True
-
-                    if old_position < new_id:
-                        for i in range(old_position + 1, new_id + 1):
-                            self.triggers[i][0].position -= 1
-                    else:
-                        for i in range(new_id, old_position):
-                            self.triggers[i][0].position += 1
-
-                    self.triggers.sort(key=lambda t: t[0].position)
-
-                    used_id = new_id
+                    # only the moved trigger gets a new position, unless the others need to be renumbered
+                    changes["position"], renumbered = guild_triggers.plan_move(trigger, new_id)
 
                 needs_recompute = False
                 needs_recompute |= test_and_update("mode", mode)
@@ -220,53 +364,56 @@ class TriggerCog(commands.Cog):
                 needs_recompute |= test_and_update("start", start)
                 needs_recompute |= test_and_update("end", end)
 
-                has_modifications |= needs_recompute
-
                 cooldown_modified = test_and_update("cooldown", cooldown, True)
-                has_modifications |= cooldown_modified
+                cooldown_modified |= test_and_update("cooldown_scope", cooldown_scope, True)
 
-                has_modifications |= test_and_update("response", self.unescape_response(response))
-                has_modifications |= test_and_update("avoid_links", avoid_links, True)
-                has_modifications |= test_and_update("avoid_emotes", avoid_emotes, True)
+                test_and_update("response", self.unescape_response(response))
+                test_and_update("avoid_links", avoid_links, True)
+                test_and_update("avoid_emotes", avoid_emotes, True)
 
-                if not has_modifications:
-                    return await interaction.response.send_message("Nothing changed.")  # type: ignore
+                if not changes:
+                    return await self.reply(interaction, "Nothing changed.")
 
                 if needs_recompute:
-                    trigger.regex_pattern = self.compute(
-                        trigger.mode, trigger.user_pattern, trigger.case_sensitive,
-                        trigger.start, trigger.end
+                    fields = dict(trigger.fields(), **changes)
+                    changes["regex_pattern"] = self.compute(
+                        fields["mode"], fields["user_pattern"], fields["case_sensitive"],
+                        fields["start"], fields["end"], guild_triggers.globals.case_sensitive
                     )
 
-                    self.triggers[used_id] = (trigger, re.compile(trigger.regex_pattern))
-
-                if cooldown_modified:
-                    trigger.last_triggered = None
+                    # a new pattern gets a new chance
+                    changes["disabled"] = False
+                    self.regex_timeouts.pop(trigger.id, None)
 
-                trigger.save()
+                trigger = await self.save_changes(
+                    guild_triggers, trigger, changes, renumbered, reset_last_triggered=cooldown_modified
+                )
 
-                embed = self.trigger_to_embed(trigger, "_Trigger edited successfully_")
-                await interaction.response.send_message(embed=embed)  # type: ignore
+                embed = self.trigger_to_embed(
+                    guild_triggers, trigger, "_Trigger edited successfully_", profile, self.unknown_variables(trigger)
+                )
+                await self.reply(interaction, embed=embed)
             except Exception as e:
-                transaction.rollback()
+                # the cached triggers might have been modified before failing, so they are loaded again
+                self.guild_cache.evict(interaction.guild_id)
                 message = "Failed to edit the trigger."
-                await interaction.response.send_message(message)  # type: ignore
+                await self.reply(interaction, message)
                 raise RuntimeError(message) from e
 
     @group.command(description=desc.command.remove)
-    @discord.app_commands.rename(id_="id")
-    @discord.app_commands.describe(id_=desc.argument.remove.id)
-    async def remove(self, interaction: discord.Interaction, id_: Range[int, 1]):
-        id_ -= 1  # user inputs it as 1-indexed
-        if not await self.check_id(id_, interaction):
+    @discord.app_commands.describe(ids=desc.argument.remove.ids)
+    async def remove(self, interaction: discord.Interaction, ids: str):
+        guild_triggers = await self.guild_cache.get(interaction.guild_id)
+        ranks = await self.check_selector(guild_triggers, ids, interaction)
+        if ranks is None:
             return
 
-        trigger, _ = self.triggers[id_]
+        selected = [guild_triggers.triggers[rank] for rank in ranks]
 
         confirmation = utils.ConfirmationView(interaction.user)
 
         await interaction.response.send_message(  # type: ignore
-            f"Are you sure you want to remove the trigger with **ID `{id_ + 1}`**?",
+            f"Are you sure you want to remove {self.describe_targets(ranks)}?",
             view=confirmation
         )
         original_response = await interaction.original_response()
@@ -275,108 +422,673 @@ class TriggerCog(commands.Cog):
         if not confirmation.value:
             return  # nothing to do
 
-        with db.atomic() as transaction:
+        async with self.guild_lock(interaction.guild_id):
+            # the guild's triggers might have been changed or evicted while waiting
+            guild_triggers = await self.guild_cache.get(interaction.guild_id)
+            if any(
+                rank >= len(guild_triggers) or guild_triggers.triggers[rank].id != trigger.id
+                for rank, trigger in zip(ranks, selected)
+            ):
+                return await interaction.followup.send("The triggers have changed in the meantime, please try again.")
+
             try:
-                trigger.delete_instance()
+                selected = [guild_triggers.triggers[rank] for rank in ranks]
+                trigger_ids = {trigger.id for trigger in selected}
 
-                for i in range(trigger.position + 1, len(self.triggers)):
-                    self.triggers[i][0].position -= 1
+                await async_db.atomic(bulk_delete, TriggerEntity, trigger_ids)
+                for trigger_id in trigger_ids:
+                    self.last_triggered_buffer.discard(trigger_id)
+                    self.regex_timeouts.pop(trigger_id, None)
 
-                self.triggers.pop(id_)
+                self.cooldowns.discard_triggers(trigger_ids)
 
-                await interaction.followup.send("Trigger removed successfully.")
+                # the positions of the other triggers are only keys, so they stay the same
+                guild_triggers.remove_many(selected)
+                self.triggers_changed(interaction.guild_id)
+
+                await interaction.followup.send(
+                    "Trigger removed successfully." if len(selected) == 1
+                    else f"{len(selected)} triggers removed successfully."
+                )
             except Exception as e:
-                transaction.rollback()
-                message = "Failed to remove the trigger."
+                message = "Failed to remove the triggers."
                 await interaction.followup.send(message)
                 raise RuntimeError(message) from e
 
     @group.command(description=desc.command.setglobal)
     @discord.app_commands.describe(cooldown=desc.argument.cooldown)
+    @discord.app_commands.describe(cooldown_scope=desc.argument.cooldown_scope)
     @discord.app_commands.describe(case_sensitive=desc.argument.case_sensitive)
     @discord.app_commands.describe(avoid_links=desc.argument.avoid_links)
     @discord.app_commands.describe(avoid_emotes=desc.argument.avoid_emotes)
     async def setglobal(
             self, interaction: discord.Interaction,
             cooldown: Optional[Range[int, 0]] = None,
+            cooldown_scope: Optional[Literal["trigger", "channel", "user"]] = None,
             case_sensitive: Optional[bool] = None,
             avoid_links: Optional[bool] = None,
             avoid_emotes: Optional[bool] = None,
     ):
         has_modifications = any(param is not None for param in [
-            cooldown, case_sensitive, avoid_links, avoid_emotes
+            cooldown, cooldown_scope, case_sensitive, avoid_links, avoid_emotes
         ])
 
         if not has_modifications:
             return await interaction.response.send_message("Nothing to change.")  # type: ignore
 
-        with db.atomic() as transaction:
-            try:
-                if cooldown is not None:
-                    self.globals.cooldown = cooldown
-
-                if case_sensitive is not None:
-                    self.globals.case_sensitive = case_sensitive
+        async with self.guild_lock(interaction.guild_id):
+            guild_triggers = await self.guild_cache.get(interaction.guild_id)
+            guild_globals = guild_triggers.globals
+
+            values = {
+                "cooldown": cooldown,
+                "cooldown_scope": cooldown_scope,
+                "case_sensitive": case_sensitive,
+                "avoid_links": avoid_links,
+                "avoid_emotes": avoid_emotes,
+            }
+            changed = [
+                name for name, value in values.items() if value is not None and value != getattr(guild_globals, name)
+            ]
 
-                if avoid_links is not None:
-                    self.globals.avoid_links = avoid_links
-
-                if avoid_emotes is not None:
-                    self.globals.avoid_emotes = avoid_emotes
+            try:
+                for name in changed:
+                    setattr(guild_globals, name, values[name])
 
-                self.globals.save()
+                # only the triggers inheriting a changed value are resolved again, and swapped in once saved
+                replacements = guild_triggers.recompile_dependents(changed)
+                await async_db.atomic(self.save_globals, guild_globals, self.changed_patterns(replacements))
+                guild_triggers.replace_many(replacements)
+                self.triggers_changed(interaction.guild_id)
 
                 await interaction.response.send_message("Global settings updated successfully.")  # type: ignore
             except Exception as e:
-                transaction.rollback()
+                self.guild_cache.evict(interaction.guild_id)
                 message = "Failed to update global settings."
                 await interaction.response.send_message(message)  # type: ignore
                 raise RuntimeError(message) from e
 
-    @group.command(description=desc.command.setglobal)
-    @discord.app_commands.rename(id_="id")
+    @group.command(description=desc.command.reset)
     @discord.app_commands.rename(property_="property")
-    @discord.app_commands.describe(id_=desc.argument.reset.id)
+    @discord.app_commands.describe(ids=desc.argument.reset.ids)
     @discord.app_commands.describe(property_=desc.argument.reset.property)
     async def reset(
             self, interaction: discord.Interaction,
-            id_: Range[int, 1],
-            property_: Literal["cooldown", "case_sensitive", "avoid_links", "avoid_emotes"]
+            ids: str,
+            property_: Literal["cooldown", "cooldown_scope", "case_sensitive", "avoid_links", "avoid_emotes"]
     ):
-        id_ -= 1  # user inputs it as 1-indexed
-        if not await self.check_id(id_, interaction):
-            return
+        async with self.guild_lock(interaction.guild_id):
+            guild_triggers = await self.guild_cache.get(interaction.guild_id)
+            ranks = await self.check_selector(guild_triggers, ids, interaction)
+            if ranks is None:
+                return
+
+            selected = [guild_triggers.triggers[rank] for rank in ranks]
+            updates = []
+
+            for trigger in selected:
+                if getattr(trigger, property_) is None:
+                    continue
+
+                changes = {property_: None}
+                if property_ == "case_sensitive":
+                    changes["regex_pattern"] = self.compute(
+                        trigger.mode, trigger.user_pattern, None, trigger.start, trigger.end,
+                        guild_triggers.globals.case_sensitive
+                    )
+
+                updates.append((trigger, changes))
 
-        trigger, _ = self.triggers[id_]
+            if not updates:
+                return await interaction.response.send_message(  # type: ignore
+                    f"The trigger with **ID `{ranks[0] + 1}`** already has the default value for this property."
+                    if len(ranks) == 1 else "The selected triggers already have the default value for this property."
+                )
+
+            try:
+                reset_last_triggered = property_ in ["cooldown", "cooldown_scope"]
+                await self.save_batch(
+                    guild_triggers, updates, {trigger.id for trigger, _ in updates} if reset_last_triggered else ()
+                )
+            except Exception as e:
+                self.guild_cache.evict(interaction.guild_id)
+                message = "Failed to reset the property."
+                await interaction.response.send_message(message)  # type: ignore
+                raise RuntimeError(message) from e
 
-        old_value = getattr(trigger, property_)
-        if old_value is None:
+        new_value = getattr(guild_triggers.globals, property_)
+        if len(ranks) == 1:
+            old_value = getattr(selected[0], property_)
             return await interaction.response.send_message(  # type: ignore
-                f"The trigger with **ID `{id_ + 1}`** already has the default value for this property."
+                f"Successfully reset the property `{property_}` of the trigger with **ID `{ranks[0] + 1}`** "
+                f"from `{old_value}` to `{new_value}`."
             )
 
-        setattr(trigger, property_, None)
-        new_value = getattr(self.globals, property_)
         await interaction.response.send_message(  # type: ignore
-            f"Successfully reset the property `{property_}` of the trigger with **ID `{id_ + 1}`** "
-            f"from `{old_value}` to `{new_value}`."
+            f"Successfully reset the property `{property_}` of {len(updates)} triggers to `{new_value}`."
+        )
+
+    @group.command(name="set", description=desc.command.set)
+    @discord.app_commands.describe(ids=desc.argument.set.ids)
+    @discord.app_commands.describe(cooldown=desc.argument.cooldown)
+    @discord.app_commands.describe(cooldown_scope=desc.argument.cooldown_scope)
+    @discord.app_commands.describe(case_sensitive=desc.argument.case_sensitive)
+    @discord.app_commands.describe(avoid_links=desc.argument.avoid_links)
+    @discord.app_commands.describe(avoid_emotes=desc.argument.avoid_emotes)
+    async def set_(
+            self, interaction: discord.Interaction,
+            ids: str,
+            cooldown: Optional[Range[int, 0]] = None,
+            cooldown_scope: Optional[Literal["trigger", "channel", "user"]] = None,
+            case_sensitive: Optional[bool] = None,
+            avoid_links: Optional[bool] = None,
+            avoid_emotes: Optional[bool] = None,
+    ):
+        values = {
+            field: value for field, value in [
+                ("cooldown", cooldown), ("cooldown_scope", cooldown_scope), ("case_sensitive", case_sensitive),
+                ("avoid_links", avoid_links), ("avoid_emotes", avoid_emotes)
+            ] if value is not None
+        }
+
+        if not values:
+            return await interaction.response.send_message("Nothing to change.")  # type: ignore
+
+        async with self.guild_lock(interaction.guild_id):
+            guild_triggers = await self.guild_cache.get(interaction.guild_id)
+            ranks = await self.check_selector(guild_triggers, ids, interaction)
+            if ranks is None:
+                return
+
+            updates = []
+            reset_last_triggered = set()
+
+            for rank in ranks:
+                trigger = guild_triggers.triggers[rank]
+                changes = {field: value for field, value in values.items() if getattr(trigger, field) != value}
+
+                if "case_sensitive" in changes:
+                    changes["regex_pattern"] = self.compute(
+                        trigger.mode, trigger.user_pattern, case_sensitive, trigger.start, trigger.end,
+                        guild_triggers.globals.case_sensitive
+                    )
+
+                if "cooldown" in changes or "cooldown_scope" in changes:
+                    reset_last_triggered.add(trigger.id)
+
+                if changes:
+                    updates.append((trigger, changes))
+
+            if not updates:
+                return await interaction.response.send_message("Nothing changed.")  # type: ignore
+
+            try:
+                await self.save_batch(guild_triggers, updates, reset_last_triggered)
+            except Exception as e:
+                self.guild_cache.evict(interaction.guild_id)
+                message = "Failed to update the triggers."
+                await interaction.response.send_message(message)  # type: ignore
+                raise RuntimeError(message) from e
+
+        await interaction.response.send_message(  # type: ignore
+            f"Successfully updated {self.describe_targets(ranks)}."
+            if len(updates) == len(ranks) else
+            f"Successfully updated {len(updates)} of the {len(ranks)} selected triggers, "
+            f"the others already had these values."
         )
 
-    async def check_id(self, id_: Range[int, 1], interaction: discord.Interaction) -> bool:
-        if not await self.check_trigger_count(interaction):
+    @group.command(description=desc.command.test)
+    @discord.app_commands.describe(message=desc.argument.test.message)
+    async def test(self, interaction: discord.Interaction, message: str):
+        guild_triggers = await self.guild_cache.get(interaction.guild_id)
+        if not await self.check_trigger_count(guild_triggers, interaction):
+            return
+
+        # the sandbox may take longer than an interaction is allowed to wait for its response
+        await interaction.response.defer()  # type: ignore
+
+        matcher = guild_triggers.matcher
+        start = time.perf_counter()
+
+        try:
+            if self.regex_sandbox is None:
+                results = matcher.search_candidates(message)
+            else:
+                results = await matcher.search_candidates_sandboxed(message, self.regex_sandbox)
+        except SandboxTimeout as e:
+            # a dry run neither counts towards disabling the trigger nor disables it
+            rank = None if e.trigger is None else guild_triggers.get_ranks().get(e.trigger.id)
+            if rank is not None:
+                culprit = f"The trigger with **ID `{rank + 1}`**"
+            elif e.trigger is not None:
+                culprit = "A trigger removed in the meantime"
+            else:
+                culprit = "The regex triggers together"
+
+            return await self.reply(
+                interaction, f"{culprit} exceeded the time budget on this message, so no trigger would respond to it."
+            )
+
+        elapsed = time.perf_counter() - start
+
+        embed = self.test_to_embed(guild_triggers, interaction, MessageContext(message), results, elapsed)
+        await self.reply(interaction, embed=embed)
+
+    def test_to_embed(
+            self, guild_triggers: GuildTriggers, interaction: discord.Interaction, context: MessageContext,
+            results: list, elapsed: float
+    ):
+        embed = discord.Embed(title="Triggers", description="_Dry run of the sample message, nothing was sent_")
+
+        # the triggers may have changed while the message was searched, the removed ones are not listed
+        ranks = guild_triggers.get_ranks()
+        results = [result for result in results if result[0].id in ranks]
+
+        def label(trigger: CompiledTrigger):
+            pattern = discord.utils.escape_mentions(self.shorten(trigger.user_pattern, MAX_TEST_PATTERN_LENGTH))
+            return f"`{ranks[trigger.id] + 1}.` `{pattern}`"
+
+        def duration(seconds: float):
+            return f"{seconds * 1000:.3f} ms"
+
+        winner = None
+        matches = []
+        for trigger, match, seconds in results:
+            if match is None:
+                continue
+
+            exclusion = self.match_exclusion(context, match, trigger)
+            if exclusion is None and winner is None:
+                winner = trigger
+
+            if exclusion is not None:
+                status = f"ignored, {exclusion}"
+            elif trigger is winner:
+                status = "**would respond**"
+            else:
+                status = "shadowed by a lower ID"
+
+            matches.append(f"{label(trigger)} - {status} ({duration(seconds)})")
+
+        if winner is None:
+            embed.add_field(name="🏆 Response", value="No trigger would respond to this message.", inline=False)
+        else:
+            # the cooldowns are only read
+            message = SimpleNamespace(channel=SimpleNamespace(id=interaction.channel_id), author=interaction.user)
+            key = cooldown_key(winner, message)
+            cooldown = " It is currently on cooldown here." if key is not None and self.cooldowns.is_active(key) \
+                else ""
+
+            embed.add_field(name="🏆 Response", value=f"{label(winner)} would respond.{cooldown}", inline=False)
+
+        embed.add_field(
+            name="✅ Matching Triggers", value=self.limit_lines(matches) if matches else "None", inline=False
+        )
+
+        slowest = sorted(results, key=lambda result: result[2], reverse=True)
+        embed.add_field(
+            name="⏱️ Slowest Patterns",
+            value=self.limit_lines([f"{label(trigger)} - {duration(seconds)}" for trigger, _, seconds in slowest])
+            if slowest else "None",
+            inline=False
+        )
+
+        disabled = len(guild_triggers) - len(guild_triggers.matcher)
+        embed.add_field(
+            name="🔎 Searched",
+            value=(
+                f"{len(results)} of {len(guild_triggers.matcher)} enabled triggers in {duration(elapsed)}, "
+                f"the others cannot match this message."
+                + (f" {disabled} disabled triggers were skipped." if disabled else "")
+            ),
+            inline=False
+        )
+
+        return embed
+
+    @staticmethod
+    def limit_lines(lines: list) -> str:
+        shown = lines[:MAX_TEST_RESULTS]
+        if len(lines) > len(shown):
+            shown.append(f"_... and {len(lines) - len(shown)} more_")
+
+        return "\n".join(shown)
+
+    @staticmethod
+    def shorten(text: str, length: int) -> str:
+        return text if len(text) <= length else text[:length - 1] + "…"
+
+    @group.command(description=desc.command.export)
+    @discord.app_commands.rename(format_="format")
+    @discord.app_commands.describe(format_=desc.argument.export.format)
+    async def export(self, interaction: discord.Interaction, format_: Literal["jsonl", "csv"] = "jsonl"):
+        await interaction.response.defer()  # type: ignore
+
+        try:
+            output = await async_db.run(export_guild, interaction.guild_id, format_)
+        except Exception as e:
+            message = "Failed to export the triggers."
+            await self.reply(interaction, message)
+            raise RuntimeError(message) from e
+
+        await self.reply(
+            interaction, "Exported the triggers and global values.",
+            file=discord.File(output, filename=f"triggers.{format_}")
+        )
+
+    @group.command(name="import", description=desc.command.import_)
+    @discord.app_commands.describe(file=desc.argument.import_.file)
+    async def import_(self, interaction: discord.Interaction, file: discord.Attachment):
+        format_ = file.filename.rsplit(".", 1)[-1].lower()
+        if format_ not in FORMATS:
+            return await self.reply(interaction, "The file must be a `.jsonl` or `.csv` file.")
+
+        if file.size > MAX_IMPORT_SIZE:
+            return await self.reply(interaction, f"The file must be at most {MAX_IMPORT_SIZE // 1024} KiB.")
+
+        # reading, validating and profiling the file may take longer than an interaction is allowed to wait
+        await interaction.response.defer()  # type: ignore
+
+        try:
+            settings, rows = await asyncio.to_thread(parse_import, await file.read(), format_)
+        except InvalidImport as e:
+            return await self.reply(interaction, f"Invalid file. {e}")
+
+        async with self.guild_lock(interaction.guild_id):
+            guild_triggers = await self.guild_cache.get(interaction.guild_id)
+            guild_globals = guild_triggers.globals
+
+            # the triggers are resolved against the imported global values, which are only applied once saved
+            resolved_globals = SimpleNamespace(
+                **{field: settings.get(field, getattr(guild_globals, field)) for field in SETTINGS_FIELDS}
+            )
+
+            try:
+                new_triggers = await asyncio.to_thread(
+                    self.compile_imported, rows, resolved_globals, guild_triggers.next_position()
+                )
+            except InvalidImport as e:
+                return await self.reply(interaction, f"Invalid file. {e}")
+
+            # the existing triggers inheriting an imported global value are resolved again along with them
+            replacements = guild_triggers.recompile_dependents(
+                [field for field, value in settings.items() if value != getattr(guild_globals, field)], resolved_globals
+            )
+
+            try:
+                ids = await async_db.atomic(
+                    self.insert_imported, interaction.guild_id, settings, new_triggers,
+                    self.changed_patterns(replacements)
+                )
+
+                for field, value in settings.items():
+                    setattr(guild_globals, field, value)
+
+                guild_triggers.add_many(
+                    [trigger.replace(guild_globals, id=id_) for trigger, id_ in zip(new_triggers, ids)], replacements
+                )
+                self.guild_cache.trim()
+                self.triggers_changed(interaction.guild_id)
+            except Exception as e:
+                self.guild_cache.evict(interaction.guild_id)
+                message = "Failed to import the triggers."
+                await self.reply(interaction, message)
+                raise RuntimeError(message) from e
+
+        message = f"Imported {len(new_triggers)} triggers"
+        await self.reply(interaction, f"{message} and the global values." if settings else f"{message}.")
+
+    def compile_imported(self, rows: list, settings, position: int) -> list:
+        """
+        Compiles the imported triggers, placed after the given position, and profiles their regex patterns in a
+        single worker process. Raises `InvalidImport` for the first one which cannot be used. Blocking.
+        """
+        triggers = []
+        for line, fields in rows:
+            regex_pattern = self.compute(
+                fields["mode"], fields["user_pattern"], fields["case_sensitive"], fields["start"], fields["end"],
+                settings.case_sensitive
+            )
+
+            try:
+                trigger = GuildTriggers.check(CompiledTrigger(
+                    dict(fields, id=None, position=position, regex_pattern=regex_pattern), settings
+                ))
+            except re.error as e:
+                raise InvalidImport(line, f"invalid pattern ({e})")
+
+            triggers.append((line, trigger))
+            position += POSITION_GAP
+
+        regex_triggers = [(line, trigger) for line, trigger in triggers if trigger.mode == "regex"]
+        profiles = profile_patterns([trigger.pattern for _, trigger in regex_triggers])
+        for (line, _), profile in zip(regex_triggers, profiles):
+            if profile.rejected:
+                raise InvalidImport(line, self.rejection_message(profile))
+
+        return [trigger for _, trigger in triggers]
+
+    @staticmethod
+    def insert_imported(guild_id: int, settings: dict, triggers: list, patterns: dict) -> list:
+        """
+        Saves the imported global values and triggers, along with the patterns of the existing triggers changed by
+        the global values, returning the IDs of the triggers in order.
+        Blocking, meant to be run in a transaction on the database thread.
+        """
+        if settings:
+            TriggerSettingsEntity.update(**settings).where(TriggerSettingsEntity.guild_id == guild_id).execute()
+
+        if patterns:
+            bulk_update_field(TriggerEntity, TriggerEntity.regex_pattern, patterns)
+
+        rows = [
+            dict({name: value for name, value in trigger.fields().items() if name != "id"}, guild_id=guild_id)
+            for trigger in triggers
+        ]
+        for batch in chunked(rows, INSERT_BATCH_SIZE):
+            TriggerEntity.insert_many(batch).execute()
+
+        if not triggers:
+            return []
+
+        query = TriggerEntity.select(TriggerEntity.id) \
+            .where((TriggerEntity.guild_id == guild_id) & (TriggerEntity.position >= triggers[0].position)) \
+            .order_by(TriggerEntity.position)
+
+        return [row.id for row in query]
+
+    @staticmethod
+    def save_globals(guild_globals: TriggerSettingsEntity, patterns: dict):
+        """
+        Saves the global settings along with the patterns of the triggers they changed.
+        Blocking, meant to be run in a transaction on the database thread.
+        """
+        guild_globals.save()
+        if patterns:
+            bulk_update_field(TriggerEntity, TriggerEntity.regex_pattern, patterns)
+
+    @staticmethod
+    def changed_patterns(replacements: list) -> dict:
+        return {
+            new_trigger.id: new_trigger.regex_pattern for trigger, new_trigger in replacements
+            if new_trigger.regex_pattern != trigger.regex_pattern
+        }
+
+    async def save_changes(
+            self, guild_triggers: GuildTriggers, trigger: CompiledTrigger, changes: dict, renumbered=None,
+            reset_last_triggered: bool = False
+    ) -> CompiledTrigger:
+        """
+        Writes the changed fields of the trigger in one transaction, along with the renumbered positions of the
+        other triggers, then swaps the cached trigger for its new version, which is returned.
+        """
+        # an unusable pattern raises here, while nothing has been written yet
+        new_trigger = guild_triggers.check(trigger.replace(guild_triggers.globals, **changes))
+
+        stored = dict(changes)
+        if reset_last_triggered:
+            stored["last_triggered"] = None
+
+        def write():
+            if renumbered:
+                bulk_update_field(TriggerEntity, TriggerEntity.position, renumbered)
+
+            TriggerEntity.update(**stored).where(TriggerEntity.id == trigger.id).execute()
+
+        await async_db.atomic(write)
+
+        if reset_last_triggered:
+            guild_triggers.last_triggered.pop(trigger.id, None)
+            self.last_triggered_buffer.discard(trigger.id)
+            self.cooldowns.discard_trigger(trigger.id)
+
+        if renumbered:
+            guild_triggers.set_positions(renumbered)
+
+        guild_triggers.replace(trigger, new_trigger)
+        self.triggers_changed(guild_triggers.guild_id)
+        return new_trigger
+
+    def triggers_changed(self, guild_id: int):
+        """
+        Dispatches the `triggers_changed` event, which the other cluster workers use to drop the guild from their
+        caches.
+        """
+        self.bot.dispatch("triggers_changed", guild_id)
+
+    @commands.Cog.listener()
+    async def on_cluster_triggers_changed(self, guild_id: int):
+        # the guild was changed by another worker, it is loaded again upon its next use
+        self.guild_cache.evict(guild_id)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if self.unassigned_checked:
+            return  # reconnected
+
+        self.unassigned_checked = True
+
+        # rows saved before guilds were told apart are loaded by no guild, they are only guessed for a single guild
+        count = await async_db.run(count_unassigned)
+        if not count:
+            return
+
+        guilds = [guild async for guild in self.bot.fetch_guilds(limit=2)]
+        if len(guilds) == 1:
+            await self.adopt_unassigned(guilds[0].id)
+        else:
+            logger.warning(
+                "%d triggers or settings saved before servers were told apart belong to no server, "
+                "use the `adopttriggers` command in the server owning them",
+                count
+            )
+
+    @commands.command(name="adopttriggers")
+    @commands.guild_only()
+    @commands.is_owner()
+    async def adopt_triggers(self, ctx: commands.Context):
+        adopted, adopted_settings = await self.adopt_unassigned(ctx.guild.id)
+
+        settings = "along with their global settings" if adopted_settings else "keeping this server's global settings"
+        await ctx.send(f"Adopted {adopted} triggers saved before servers were told apart, {settings}.")
+
+    async def adopt_unassigned(self, guild_id: int) -> tuple:
+        """
+        Assigns the triggers and settings belonging to no guild to the given one, returning the number of adopted
+        triggers and whether the settings were adopted too.
+        """
+        async with self.guild_lock(guild_id):
+            adopted, adopted_settings = await async_db.run(adopt_unassigned, guild_id)
+
+            self.guild_cache.evict(guild_id)
+            self.triggers_changed(guild_id)
+
+        logger.info(
+            "Guild %d adopted %d triggers saved before guilds were told apart%s",
+            guild_id, adopted, ", along with their global settings" if adopted_settings else ""
+        )
+
+        return adopted, adopted_settings
+
+    async def save_batch(self, guild_triggers: GuildTriggers, updates: list, reset_last_triggered=()):
+        """
+        Writes the changed fields of several triggers, given as `(trigger, changes)` pairs which keep their positions,
+        in one transaction, then swaps the cached triggers for their new versions with a single rebuild.
+        The cooldowns of the triggers whose IDs are given in `reset_last_triggered` start over.
+        """
+        # every new version is built first, a single unusable one leaving the database untouched
+        replacements = [
+            (trigger, guild_triggers.check(trigger.replace(guild_triggers.globals, **changes)))
+            for trigger, changes in updates
+        ]
+
+        columns = {}  # field -> {trigger id -> value}
+        for trigger, changes in updates:
+            for field, value in changes.items():
+                columns.setdefault(field, {})[trigger.id] = value
+
+        for trigger_id in reset_last_triggered:
+            columns.setdefault("last_triggered", {})[trigger_id] = None
+
+        def write():
+            for field, values in columns.items():
+                distinct = set(values.values())
+                if len(distinct) == 1:
+                    bulk_update_rows(TriggerEntity, values, {getattr(TriggerEntity, field): distinct.pop()})
+                else:
+                    bulk_update_field(TriggerEntity, getattr(TriggerEntity, field), values)
+
+        await async_db.atomic(write)
+
+        for trigger_id in reset_last_triggered:
+            guild_triggers.last_triggered.pop(trigger_id, None)
+            self.last_triggered_buffer.discard(trigger_id)
+
+        self.cooldowns.discard_triggers(set(reset_last_triggered))
+
+        guild_triggers.replace_many(replacements)
+        self.triggers_changed(guild_triggers.guild_id)
+
+    async def check_selector(
+            self, guild_triggers: GuildTriggers, selector: str, interaction: discord.Interaction
+    ) -> Optional[list]:
+        """
+        Returns the ranks selected by the user, or `None` after telling them why the selection is invalid.
+        """
+        if not await self.check_trigger_count(guild_triggers, interaction):
+            return None
+
+        try:
+            return parse_selector(selector, len(guild_triggers))
+        except InvalidSelector as e:
+            await interaction.response.send_message(str(e))  # type: ignore
+            return None
+
+    @staticmethod
+    def describe_targets(ranks: list) -> str:
+        if len(ranks) == 1:
+            return f"the trigger with **ID `{ranks[0] + 1}`**"
+
+        return f"the **{len(ranks)}** triggers with **IDs `{describe_selection(ranks)}`**"
+
+    async def check_id(
+            self, guild_triggers: GuildTriggers, id_: Range[int, 1], interaction: discord.Interaction
+    ) -> bool:
+        if not await self.check_trigger_count(guild_triggers, interaction):
             return False
 
-        if id_ >= len(self.triggers):
+        if id_ >= len(guild_triggers):
             await interaction.response.send_message(  # type: ignore
-                f"Invalid ID, must be between 1 and {len(self.triggers)}."
+                f"Invalid ID, must be between 1 and {len(guild_triggers)}."
             )
 
             return False
 
         return True
 
-    async def check_trigger_count(self, interaction: discord.Interaction) -> bool:
-        if len(self.triggers) == 0:
+    @staticmethod
+    async def check_trigger_count(guild_triggers: GuildTriggers, interaction: discord.Interaction) -> bool:
+        if len(guild_triggers) == 0:
             await interaction.response.send_message(  # type: ignore
                 "There are no triggers in this server. Use `/triggers add` to add one."
             )
@@ -385,16 +1097,19 @@ class TriggerCog(commands.Cog):
 
         return True
 
-    def trigger_to_embed(self, trigger, description):
+    def trigger_to_embed(
+            self, guild_triggers: GuildTriggers, trigger: CompiledTrigger, description,
+            profile: Optional[PatternProfile] = None, unknown_variables=()
+    ):
         embed = discord.Embed(title="Triggers", description=description)
 
-        embed.add_field(name="🆔 ID", value=f"`{trigger.position + 1}`", inline=True)
+        embed.add_field(name="🆔 ID", value=f"`{guild_triggers.get_ranks()[trigger.id] + 1}`", inline=True)
         embed.add_field(name="⚙️ Mode", value=f"`{trigger.mode}`", inline=True)
         embed.add_field(
             name="🔍 Pattern", value=f"`{discord.utils.escape_mentions(trigger.user_pattern)}`", inline=False
         )
 
-        responses = self.split_responses(trigger.response)
+        responses = [template.source for template in trigger.templates]
         responses_title = "💬 Response" if len(responses) == 1 else "💬 Responses"
         for index in range(len(responses)):
             responses[index] = f"- {responses[index]}"
@@ -405,25 +1120,31 @@ class TriggerCog(commands.Cog):
 
         embed.add_field(
             name="⏲️ Cooldown",
-            value=self.get_value_or_default(trigger.cooldown, self.globals.cooldown, cooldown_mapping),
+            value=self.get_value_or_default(trigger.cooldown, guild_triggers.globals.cooldown, cooldown_mapping),
+            inline=True
+        )
+
+        embed.add_field(
+            name="👥 Cooldown Scope",
+            value=self.get_value_or_default(trigger.cooldown_scope, guild_triggers.globals.cooldown_scope),
             inline=True
         )
 
         embed.add_field(
             name="🔡 Case Sensitive",
-            value=self.get_value_or_default(trigger.case_sensitive, self.globals.case_sensitive),
+            value=self.get_value_or_default(trigger.case_sensitive, guild_triggers.globals.case_sensitive),
             inline=True
         )
 
         embed.add_field(
             name="🔗 Avoid Links",
-            value=self.get_value_or_default(trigger.avoid_links, self.globals.avoid_links),
+            value=self.get_value_or_default(trigger.avoid_links, guild_triggers.globals.avoid_links),
             inline=True
         )
 
         embed.add_field(
             name="😶 Avoid Emotes",
-            value=self.get_value_or_default(trigger.avoid_emotes, self.globals.avoid_emotes),
+            value=self.get_value_or_default(trigger.avoid_emotes, guild_triggers.globals.avoid_emotes),
             inline=True
         )
 
@@ -435,15 +1156,66 @@ class TriggerCog(commands.Cog):
             name="🛠 Computed Pattern", value=f"`{discord.utils.escape_markdown(trigger.regex_pattern)}`", inline=False
         )
 
-        last_triggered = trigger.last_triggered
+        last_triggered = guild_triggers.last_triggered.get(trigger.id)
         if last_triggered is None:
             last_triggered = "Never"
         else:
             last_triggered = utils.formatted_timestamp(int(last_triggered.timestamp()))
         embed.add_field(name="🗓 Last Triggered", value=last_triggered, inline=False)
 
+        if unknown_variables:
+            embed.add_field(
+                name="⚠️ Unknown Variables",
+                value=", ".join(f"`{variable}`" for variable in unknown_variables) + " will be sent as written.",
+                inline=False
+            )
+
+        if profile is not None:
+            profile_description = profile.describe()
+            if profile.slow:
+                profile_description = f"⚠️ {profile_description}, consider simplifying the pattern"
+
+            embed.add_field(name="⏱️ Worst-case Match Time", value=profile_description, inline=False)
+
+        if trigger.disabled:
+            embed.add_field(
+                name="⛔ Disabled",
+                value="The pattern took too long to match too many times. Edit the pattern to enable it again.",
+                inline=False
+            )
+
         return embed
 
+    @staticmethod
+    async def profile(interaction: discord.Interaction, mode: str, regex_pattern: str) -> Optional[PatternProfile]:
+        if mode != "regex":
+            return None  # escaped patterns cannot backtrack
+
+        try:
+            pattern = PATTERNS.compile(regex_pattern)
+        except re.error:
+            return None  # reported when the trigger is saved
+
+        # profiling may take longer than an interaction is allowed to wait for its response
+        await interaction.response.defer()  # type: ignore
+        return await asyncio.to_thread(profile_pattern, pattern)
+
+    @staticmethod
+    def unknown_variables(trigger: CompiledTrigger):
+        _, unknown_variables = compile_responses(trigger.response, trigger.pattern.groups)
+        return unknown_variables
+
+    @staticmethod
+    def rejection_message(profile: PatternProfile):
+        return f"The pattern is too slow to be used as a trigger: it took {profile.describe()}."
+
+    @staticmethod
+    async def reply(interaction: discord.Interaction, *args, **kwargs):
+        if interaction.response.is_done():  # type: ignore
+            return await interaction.followup.send(*args, **kwargs)
+
+        return await interaction.response.send_message(*args, **kwargs)  # type: ignore
+
     @staticmethod
     def get_value_or_default(value, global_value, extra_mapping=None):
         if value is None:
@@ -462,38 +1234,8 @@ class TriggerCog(commands.Cog):
         return value
 
     @staticmethod
-    def compute(mode: str, pattern: str, case_sensitive: bool, start: bool, end: bool):
-        # non regex patterns need to be escaped
-        regex_builder = pattern if mode == "regex" else re.escape(pattern)
-
-        # "plain" and "word" with both start and end are simply "full"
-        if mode in ["plain", "word"] and start and end:
-            mode = "full"
-
-        if mode == "full":
-            start = True
-            end = True
-
-        if mode == "word":
-            regex_builder = f"\\b{regex_builder}\\b"
-
-        if start:
-            regex_builder = f"^{regex_builder}"
-
-        if end:
-            regex_builder = f"{regex_builder}$"
-
-        used_case_sensitive = case_sensitive if case_sensitive is not None \
-            else TriggerSettingsEntity.select().get().case_sensitive
-
-        if not used_case_sensitive:
-            regex_builder = f"(?i){regex_builder}"
-
-        return regex_builder
-
-    @staticmethod
-    def split_responses(response):
-        return re.split(r"(?<!\\);", response)
+    def compute(mode: str, pattern: str, case_sensitive: bool, start: bool, end: bool, default_case_sensitive: bool):
+        return compute_regex_pattern(mode, pattern, case_sensitive, start, end, default_case_sensitive)
 
     @staticmethod
     def unescape_response(response):
@@ -505,76 +1247,130 @@ class TriggerCog(commands.Cog):
         return response.replace("\\n", "\n")
 
     @staticmethod
-    def format_response_variables(message: discord.Message, match: re.Match, response: str):
-        # replace simple variables
-        response = response.replace("@{author_username}", message.author.mention)
-        response = response.replace("@{author_display}", message.author.mention)
-        response = response.replace("@{author_nickname}", message.author.mention)
-        response = response.replace("@{author_id}", message.author.mention)
-        response = response.replace("{author_username}", message.author.name)
-        response = response.replace("{author_display}", message.author.display_name)
-        response = response.replace("{author_nickname}", message.author.nick)
-        response = response.replace("{author_id}", str(message.author.id))
-
-        # replace regex match groups
-        for group_index in range(len(match.groups())):
-            response = response.replace(f"{{match{group_index}}}", match.group(group_index))
-
-        return response
+    def test_valid_match(context: MessageContext, match: re.Match, trigger: CompiledTrigger):
+        return match is not None and TriggerCog.match_exclusion(context, match, trigger) is None
 
     @staticmethod
-    def test_valid_match(message: discord.Message, match: re.Match, trigger: TriggerEntity):
-        if match is None:
-            return False
-
-        if trigger.avoid_links:
-            links = utils.URL_REGEX.findall(message.content)
-
-            # test if the match is inside a link
-            for link in links:
-                if match.start() >= link.start() and match.end() <= link.end():
-                    return False
+    def match_exclusion(context: MessageContext, match: re.Match, trigger: CompiledTrigger) -> Optional[str]:
+        """
+        Returns why the match is ignored, or `None` if the trigger may respond to it.
+        """
+        # test if the match is inside a link
+        if trigger.effective_avoid_links and context.link_spans.contains(match.start(), match.end()):
+            return "inside a link"
 
-        if trigger.avoid_emotes:
-            emotes = utils.EMOTE_REGEX.findall(message.content)
+        # test if the match is inside an emote
+        if trigger.effective_avoid_emotes and context.emote_spans.contains(match.start(), match.end()):
+            return "inside an emote"
 
-            # test if the match is inside an emote
-            for emote in emotes:
-                if match.start() >= emote.start() and match.end() <= emote.end():
-                    return False
-
-        return True
+        return None
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if message.guild is None or message.author.bot:
             return  # ignore DMs and bots
 
-        for trigger, pattern in self.triggers:
-            match = pattern.search(message.content)
-            if self.test_valid_match(message, match, trigger):
-                if not self.is_on_cooldown(trigger):
-                    await message.channel.send(self.format_response_variables(
-                        message, match, random.choice(self.split_responses(trigger.response))
-                    ))
-
-                    with db.atomic() as transaction:
-                        try:
-                            trigger.last_triggered = datetime.now()
-                            trigger.save()
-                        except Exception as e:
-                            transaction.rollback()
-                            raise RuntimeError(f"Failed to update trigger \"{trigger.pattern}\"") from e
+        guild_triggers = await self.guild_cache.get(message.guild.id)
+        result = await self.find_match(guild_triggers, message)
+
+        if result is None:
+            return
 
+        trigger, match = result
+
+        key = cooldown_key(trigger, message)
+        if key is not None:
+            if self.cooldowns.is_active(key):
                 return
 
-    def is_on_cooldown(self, trigger):
-        trigger_cooldown = trigger.cooldown if trigger.cooldown is not None else self.globals.cooldown
+            # started before sending, so that messages handled in the meantime are already on cooldown
+            self.cooldowns.start(key, trigger.effective_cooldown)
 
-        if trigger_cooldown == 0 or trigger_cooldown is None or trigger.last_triggered is None:
-            return False
+        # sent in the background, repeated responses of the same trigger and scope being coalesced while queued
+        template = random.choice(trigger.templates)
+        self.dispatcher.submit(
+            message.channel, template.render(message, match), key if key is not None else (trigger.id, None)
+        )
+
+        now = datetime.now()
+        guild_triggers.last_triggered[trigger.id] = now
+        if PERSIST_COOLDOWNS:
+            # persisted in batches by `flush_last_triggered`
+            self.last_triggered_buffer.mark(trigger.id, now)
+
+    async def find_match(self, guild_triggers: GuildTriggers, message: discord.Message):
+        # links and emotes are only searched once per message, however many triggers need them
+        context = MessageContext(message.content)
+
+        def is_valid(match, trigger):
+            return self.test_valid_match(context, match, trigger)
+
+        matcher = guild_triggers.matcher
+        start = time.perf_counter()
+
+        try:
+            if self.regex_sandbox is None:
+                result = matcher.find(message.content, is_valid)
+            else:
+                result = await matcher.find_sandboxed(message.content, is_valid, self.regex_sandbox)
+        except SandboxTimeout as e:
+            trigger = e.trigger
+            if trigger is None:
+                # no single trigger ran long enough to be blamed
+                logger.warning(
+                    "The regex triggers of guild %d exceeded the time budget together", guild_triggers.guild_id
+                )
+                return None
+
+            self.regex_timeouts[trigger.id] += 1
+            logger.warning(
+                "Trigger %d of guild %d exceeded the regex time budget (%d/%d)",
+                trigger.id, guild_triggers.guild_id, self.regex_timeouts[trigger.id], REGEX_MAX_TIMEOUTS
+            )
+
+            if self.regex_timeouts[trigger.id] >= REGEX_MAX_TIMEOUTS:
+                await self.disable_trigger(guild_triggers, trigger)
 
-        return (datetime.now() - trigger.last_triggered).total_seconds() < trigger_cooldown
+            return None
+
+        if self.shadow is not None and self.shadow.sampled():
+            # compared in the background against the triggers the engine saw, so the response is not delayed
+            task = asyncio.ensure_future(self.shadow.compare(
+                guild_triggers.guild_id, list(matcher.entries.values()), message.content, is_valid, result,
+                time.perf_counter() - start, self.regex_sandbox
+            ))
+            self.shadow_tasks.add(task)
+            task.add_done_callback(self.shadow_tasks.discard)
+
+        return result
+
+    async def disable_trigger(self, guild_triggers: GuildTriggers, trigger: CompiledTrigger):
+        async with self.guild_lock(guild_triggers.guild_id):
+            if guild_triggers.matcher.entries.get(trigger.id) is not trigger:
+                return  # edited or removed in the meantime
+
+            try:
+                await self.save_changes(guild_triggers, trigger, {"disabled": True})
+            except Exception as e:
+                raise RuntimeError(f"Failed to disable trigger \"{trigger.user_pattern}\"") from e
+
+        self.regex_timeouts.pop(trigger.id, None)
+
+    def restore_cooldowns(self, guild_triggers: GuildTriggers):
+        """
+        Starts the server-wide cooldowns which were still running according to the saved `last_triggered` times,
+        converted once to the monotonic clock. Guilds are loaded again after evictions and changes, so the
+        cooldowns still tracked are never shortened.
+        """
+        now = datetime.now()
+        for trigger in guild_triggers.triggers:
+            last_triggered = guild_triggers.last_triggered.get(trigger.id)
+            if last_triggered is None or trigger.effective_cooldown_scope != "trigger":
+                continue
+
+            remaining = trigger.effective_cooldown - (now - last_triggered).total_seconds()
+            if remaining > 0:
+                self.cooldowns.extend((trigger.id, None), remaining)
 
 
 async def setup(bot):
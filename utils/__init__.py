@@ -1,8 +1,10 @@
-from .pages import Pages
+from .pages import Pages, PageSource, ListPageSource
 from .misc import *
 
 __all__ = [
     "Pages",
+    "PageSource",
+    "ListPageSource",
     "URL_REGEX",
     "EMOTE_REGEX",
     "ConfirmationView",
@@ -1,5 +1,37 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Union
+
 import discord
 
+# rendered pages kept by each paginator
+PAGE_CACHE_SIZE = 3
+
+
+class PageSource(ABC):
+    """
+    Provides the pages of a paginator, rendering each one only when it is shown.
+    """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def get_page(self, index: int) -> discord.Embed:
+        pass
+
+
+class ListPageSource(PageSource):
+    def __init__(self, pages: list[discord.Embed]):
+        self.pages = pages
+
+    def __len__(self):
+        return len(self.pages)
+
+    def get_page(self, index: int) -> discord.Embed:
+        return self.pages[index]
+
 
 class PageNumberModal(discord.ui.Modal, title="Enter a page number"):
     number = discord.ui.TextInput(label="Number")  # type: ignore
@@ -20,12 +52,16 @@ class PageNumberModal(discord.ui.Modal, title="Enter a page number"):
 
 
 class Pages(discord.ui.View):
-    def __init__(self, pages: list[discord.Embed], start_page: int = 0):
+    def __init__(self, pages: Union[PageSource, list[discord.Embed]], start_page: int = 0):
+        if not isinstance(pages, PageSource):
+            pages = ListPageSource(pages)
+
         assert len(pages) > 0, "You must provide at least one page"
         super().__init__()
 
-        self.pages = pages
+        self.source = pages
         self.page_count = len(pages)
+        self.page_cache = OrderedDict()
 
         if self.page_count == 1:
             self.goto.disabled = True
@@ -86,13 +122,27 @@ class Pages(discord.ui.View):
         self.last.disabled = is_last_page
         self.next.disabled = is_last_page
 
+        page = self.get_page(self.current_page)
+
         if first_interaction:
-            await interaction.response.send_message(embed=self.pages[self.current_page], view=self)  # type: ignore
+            await interaction.response.send_message(embed=page, view=self)  # type: ignore
             self.original_response = await interaction.original_response()
         else:
-            await interaction.message.edit(embed=self.pages[self.current_page], view=self)
+            await interaction.message.edit(embed=page, view=self)
             if defer_on_edit:
                 await interaction.response.defer()  # type: ignore
 
+    def get_page(self, index: int) -> discord.Embed:
+        page = self.page_cache.get(index)
+
+        if page is None:
+            page = self.page_cache[index] = self.source.get_page(index)
+            if len(self.page_cache) > PAGE_CACHE_SIZE:
+                self.page_cache.popitem(last=False)
+        else:
+            self.page_cache.move_to_end(index)
+
+        return page
+
     def clamp_index(self, index: int):
         return min(max(index, 0), self.page_count - 1)